@@ -1,149 +1,758 @@
+import atexit
+import csv
+import io
+import json
 import logging
 import os
-import tempfile
-from flask import Flask, render_template, jsonify, request
-from openai import OpenAI
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, Tuple
+from flask import Flask, Response, abort, render_template, jsonify, request, g, stream_with_context, url_for
 from flask_cors import CORS
-from utils.nlp import DialogContext
+from utils.nlp import COMMAND_PATTERNS, DialogContext, analyze_batch
+from utils.session_store import create_session_store, resolve_session_id
 from utils.command_processor import process_command
-from models import init_db
+from utils.commands import registry as command_registry
+from utils.bulk import FORMATS, entities_cli, export_entities, import_entities, read_rows
+from utils.audio import AudioRequest, AudioUpload, DEFAULT_SPOOL_THRESHOLD
+from utils.entities import EntityRecord
+from utils.metrics import REQUEST_SECONDS, finish_breakdown, registry, server_timing, span, start_breakdown
+from utils.logs import configure_logging, logging_stats, sample_request
+from utils.listing import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ensure_version_tracking, fetch_page,
+                           listing_etag, parse_datetime, table_version)
+from utils.jobs import JobError, JobQueue, QueueFullError, SessionLimitError
+from utils.persistence import WriteBehindQueue
+from utils.search import search_index
+from utils.storage import configure_storage
+from utils.streaming import ChunkOrderError, StreamLimitError, create_stream_store
+from utils.stt import FallbackTranscript, STTTimeoutError, STTUnavailableError, create_stt_backend
+from utils.transcription_cache import TranscriptionCache
+from utils.warmup import warm_up
+from models import BusinessEntity, Command, Task, create_tables, db, init_db
 
 # Настройка логирования для внешних библиотек
 logging.getLogger('werkzeug').setLevel(logging.INFO)
 logging.getLogger('sqlalchemy').setLevel(logging.WARNING)
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Настройка OpenAI API
-client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
+    # Загрузки до AUDIO_SPOOL_THRESHOLD не попадают на диск
+    app.request_class = AudioRequest
     
     try:
+        # Логирование: уровень, формат (text или json), файл, запись из отдельного потока
+        # и доля запросов, для которых пишутся DEBUG-детали
+        app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO')
+        app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'text')
+        app.config['LOG_FILE'] = os.environ.get('LOG_FILE')
+        app.config['LOG_QUEUE'] = os.environ.get('LOG_QUEUE', '1') not in ('0', 'false')
+        app.config['LOG_DEBUG_SAMPLE'] = float(os.environ.get('LOG_DEBUG_SAMPLE', 0))
+        configure_logging(app.config)
+        
         # Конфигурация приложения
         app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-1234')
         app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Ограничение размера файла: 16MB
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///instance/terra.db'
+        app.config['AUDIO_SPOOL_THRESHOLD'] = int(os.environ.get('AUDIO_SPOOL_THRESHOLD', DEFAULT_SPOOL_THRESHOLD))
+        # WAV перед распознаванием: обрезка тишины, моно, понижение частоты
+        app.config['AUDIO_PREPROCESS'] = os.environ.get('AUDIO_PREPROCESS', '1') not in ('0', 'false')
+        app.config['AUDIO_TARGET_RATE'] = int(os.environ.get('AUDIO_TARGET_RATE', 16000))
+        app.config['AUDIO_VAD_PAD_MS'] = int(os.environ.get('AUDIO_VAD_PAD_MS', 200))
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        # 0 - схема уже создана (flask init-db при развертывании), запуск ее не проверяет
+        app.config['DB_CREATE_SCHEMA'] = os.environ.get('DB_CREATE_SCHEMA', '1') not in ('0', 'false')
+        # Прогрев разбора, базы и движка распознавания до приема запросов
+        app.config['WARM_UP'] = os.environ.get('WARM_UP', '1') not in ('0', 'false')
+        # URL базы (SQLite или PostgreSQL через DATABASE_URL), пул и PRAGMA
+        configure_storage(app)
+        app.config['SESSION_HEADER'] = 'X-Session-Id'
+        app.config['SESSION_COOKIE'] = 'terra_session'
+        app.config['SESSION_MAX_COUNT'] = int(os.environ.get('SESSION_MAX_COUNT', 10000))
+        app.config['SESSION_TTL'] = int(os.environ.get('SESSION_TTL', 1800))
+        # memory - контекст в памяти процесса; sqlite - общий файл для всех воркеров
+        app.config['SESSION_STORE'] = os.environ.get('SESSION_STORE', 'memory')
+        app.config['SESSION_STORE_PATH'] = os.environ.get('SESSION_STORE_PATH', 'instance/sessions.db')
+        # Движок распознавания речи: whisper, local или stub
+        app.config['STT_BACKEND'] = os.environ.get('STT_BACKEND', 'whisper')
+        app.config['OPENAI_API_KEY'] = os.environ.get('OPENAI_API_KEY')
+        app.config['OPENAI_BASE_URL'] = os.environ.get('OPENAI_BASE_URL')
+        app.config['STT_LOCAL_ENGINE'] = os.environ.get('STT_LOCAL_ENGINE', 'sphinx')
+        app.config['STT_LOCAL_LANGUAGE'] = os.environ.get('STT_LOCAL_LANGUAGE', 'ru-RU')
+        app.config['STT_STUB_FIXTURES'] = os.environ.get('STT_STUB_FIXTURES')
+        app.config['STT_STUB_LATENCY'] = float(os.environ.get('STT_STUB_LATENCY', 0))
+        app.config['WHISPER_MODEL'] = os.environ.get('WHISPER_MODEL', 'whisper-1')
+        app.config['WHISPER_LANGUAGE'] = os.environ.get('WHISPER_LANGUAGE', 'ru')
+        # Внешнее распознавание: срок по длительности аудио, повторы, дублирующие
+        # запросы, предохранитель и резервный движок (none, local или stub)
+        app.config['STT_RESILIENCE'] = os.environ.get('STT_RESILIENCE', '1') not in ('0', 'false')
+        app.config['STT_TIMEOUT_BASE'] = float(os.environ.get('STT_TIMEOUT_BASE', 5))
+        app.config['STT_TIMEOUT_PER_SECOND'] = float(os.environ.get('STT_TIMEOUT_PER_SECOND', 1))
+        app.config['STT_TIMEOUT_MAX'] = float(os.environ.get('STT_TIMEOUT_MAX', 60))
+        app.config['STT_RETRIES'] = int(os.environ.get('STT_RETRIES', 2))
+        app.config['STT_RETRY_BACKOFF'] = float(os.environ.get('STT_RETRY_BACKOFF', 0.2))
+        app.config['STT_HEDGE'] = os.environ.get('STT_HEDGE', '0') not in ('0', 'false')
+        app.config['STT_BREAKER_WINDOW'] = int(os.environ.get('STT_BREAKER_WINDOW', 20))
+        app.config['STT_BREAKER_FAILURE_RATIO'] = float(os.environ.get('STT_BREAKER_FAILURE_RATIO', 0.5))
+        app.config['STT_BREAKER_COOLDOWN'] = float(os.environ.get('STT_BREAKER_COOLDOWN', 30))
+        app.config['STT_FALLBACK'] = os.environ.get('STT_FALLBACK', 'none')
+        app.config['TRANSCRIPTION_CACHE_SIZE'] = int(os.environ.get('TRANSCRIPTION_CACHE_SIZE', 1024))
+        app.config['TRANSCRIPTION_CACHE_TTL'] = int(os.environ.get('TRANSCRIPTION_CACHE_TTL', 86400))
+        # Путь к SQLite-файлу включает второй, постоянный уровень кэша
+        app.config['TRANSCRIPTION_CACHE_PATH'] = os.environ.get('TRANSCRIPTION_CACHE_PATH')
+        app.config['WRITE_BEHIND_BATCH_SIZE'] = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 100))
+        app.config['WRITE_BEHIND_FLUSH_MS'] = int(os.environ.get('WRITE_BEHIND_FLUSH_MS', 200))
+        app.config['WRITE_BEHIND_MAX_QUEUE'] = int(os.environ.get('WRITE_BEHIND_MAX_QUEUE', 10000))
+        # Распознавание намерений: matcher (фразы) или classifier (модель с фразами в резерве)
+        app.config['INTENT_BACKEND'] = os.environ.get('INTENT_BACKEND', 'matcher')
+        app.config['INTENT_MODEL_PATH'] = os.environ.get('INTENT_MODEL_PATH', 'instance/intent_classifier')
+        app.config['INTENT_THRESHOLD'] = float(os.environ.get('INTENT_THRESHOLD', 0.5))
+        app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 4))
+        app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 64))
+        app.config['JOB_MAX_PER_SESSION'] = int(os.environ.get('JOB_MAX_PER_SESSION', 4))
+        app.config['JOB_RESULT_TTL'] = int(os.environ.get('JOB_RESULT_TTL', 300))
+        # Результаты заданий хранятся в памяти процесса: при нескольких воркерах
+        # опрос задания может попасть на другой воркер, и ?async=1 отключается
+        app.config['JOB_ASYNC_ENABLED'] = os.environ.get('JOB_ASYNC_ENABLED', '1') not in ('0', 'false')
+        # Потоковая загрузка аудио фрагментами во время записи
+        app.config['STREAM_MAX_COUNT'] = int(os.environ.get('STREAM_MAX_COUNT', 1000))
+        app.config['STREAM_MAX_PER_SESSION'] = int(os.environ.get('STREAM_MAX_PER_SESSION', 2))
+        app.config['STREAM_MAX_BYTES'] = int(os.environ.get('STREAM_MAX_BYTES', 16 * 1024 * 1024))
+        app.config['STREAM_MAX_TOTAL_BYTES'] = int(os.environ.get('STREAM_MAX_TOTAL_BYTES', 256 * 1024 * 1024))
+        app.config['STREAM_TTL'] = int(os.environ.get('STREAM_TTL', 120))
+        # memory - буферы в памяти процесса; sqlite - общий файл для всех воркеров
+        app.config['STREAM_STORE'] = os.environ.get('STREAM_STORE', 'memory')
+        app.config['STREAM_STORE_PATH'] = os.environ.get('STREAM_STORE_PATH', 'instance/streams.db')
+        # Гистограммы этапов для /metrics; разбивка запроса - по заголовку TIMING_HEADER
+        app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false')
+        app.config['TIMING_HEADER'] = 'X-Request-Timing'
         
         # Инициализация CORS
         CORS(app)
         
         # Инициализация базы данных
-        init_db(app)
+        init_db(app, create_schema=app.config['DB_CREATE_SCHEMA'])
+        # Полнотекстовый индекс задач и бизнес-сущностей для команды поиска
+        search_index.init_app(app, lambda: db.get_engine(app), create_schema=app.config['DB_CREATE_SCHEMA'])
+        # flask entities import/export
+        app.cli.add_command(entities_cli)
+        if app.config['DB_CREATE_SCHEMA']:
+            # Счетчики версий таблиц для условных GET-запросов к спискам
+            ensure_version_tracking(db.get_engine(app))
+        
+        # Команды и задачи пишутся в базу пакетами из фонового потока
+        app.write_behind = WriteBehindQueue(
+            lambda: db.get_engine(app),
+            batch_size=app.config['WRITE_BEHIND_BATCH_SIZE'],
+            flush_interval=app.config['WRITE_BEHIND_FLUSH_MS'] / 1000,
+            max_queue=app.config['WRITE_BEHIND_MAX_QUEUE']
+        )
+        atexit.register(app.write_behind.close)
+        
+        # Модель общая для всех сессий, как и автомат фраз; numpy и scikit-learn
+        # импортируются только для этого движка
+        DialogContext.classifier = None
+        if app.config['INTENT_BACKEND'] == 'classifier':
+            from utils.classifier import load_or_train
+            DialogContext.classifier = load_or_train(
+                app.config['INTENT_MODEL_PATH'], COMMAND_PATTERNS, app.config['INTENT_THRESHOLD']
+            )
+        
+        # Контекст диалога хранится отдельно для каждой сессии
+        app.dialog_contexts = create_session_store(app.config)
+        logger.info(f"Dialog context store: {app.config['SESSION_STORE']}")
+        
+        # Клиент внешнего сервиса создается при первом распознавании
+        app.stt = create_stt_backend(app.config)
+        logger.info(f"Speech-to-text backend: {app.stt.name}")
         
-        # Создаем глобальный объект для хранения контекста диалога
-        app.dialog_context = DialogContext()
+        # Кэш распознанного текста по хэшу аудио
+        app.transcription_cache = TranscriptionCache(
+            max_entries=app.config['TRANSCRIPTION_CACHE_SIZE'],
+            ttl=app.config['TRANSCRIPTION_CACHE_TTL'],
+            path=app.config['TRANSCRIPTION_CACHE_PATH']
+        )
+        
+        # Пул потоков для асинхронной обработки аудио
+        app.jobs = JobQueue(
+            workers=app.config['JOB_WORKERS'],
+            max_queue=app.config['JOB_QUEUE_SIZE'],
+            max_per_session=app.config['JOB_MAX_PER_SESSION'],
+            result_ttl=app.config['JOB_RESULT_TTL'],
+            name='audio-jobs'
+        )
+        
+        # Буферы записей, загружаемых фрагментами
+        app.audio_streams = create_stream_store(app.config)
+        
+        registry.enabled = app.config['METRICS_ENABLED']
+        # Состояние кэшей и очередей из /status, снимаемое при каждом чтении /metrics
+        registry.gauge(
+            'terra_component_state', 'In-process cache and queue state, same as /status',
+            lambda: {(component, field): value
+                     for component, fields in component_stats().items()
+                     for field, value in fields.items()},
+            ('component', 'field')
+        )
         
         logger.info("Application initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing application: {str(e)}")
         raise
 
+    @app.before_request
+    def start_timing():
+        """Start request timing; the stage breakdown is collected only on request"""
+        g.request_started = time.perf_counter()
+        sample_request(app.config['LOG_DEBUG_SAMPLE'])
+        g.timing_token = start_breakdown(bool(request.headers.get(app.config['TIMING_HEADER'])))
+
+    @app.after_request
+    def finish_timing(response):
+        """Record request latency and attach the stage breakdown as Server-Timing"""
+        if 'timing_token' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        breakdown = finish_breakdown(g.pop('timing_token'))
+        if registry.enabled:
+            REQUEST_SECONDS.observe(elapsed, request.endpoint or 'unknown')
+        if request.headers.get(app.config['TIMING_HEADER']):
+            response.headers['Server-Timing'] = server_timing(breakdown, elapsed)
+        return response
+
+    @app.before_request
+    def load_session():
+        """Determine the dialog session of the current request"""
+        g.session_id, g.new_session = resolve_session_id(
+            request.headers, request.cookies,
+            app.config['SESSION_HEADER'], app.config['SESSION_COOKIE']
+        )
+
+    @app.after_request
+    def save_session(response):
+        """Issue the session cookie to new clients"""
+        if g.get('new_session'):
+            response.set_cookie(
+                app.config['SESSION_COOKIE'], g.session_id,
+                max_age=app.config['SESSION_TTL'], httponly=True, samesite='Lax'
+            )
+        return response
+
     @app.route('/')
     def index():
         """Render the main page"""
-        return render_template('index.html')
+        return render_template('index.html', catalog_version=command_registry.version)
+
+    @app.route('/api/commands/catalog')
+    def command_catalog():
+        """Versioned catalog of supported commands for the frontend"""
+        etag = command_registry.version
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(command_registry.catalog(), mimetype='application/json')
+        response.set_etag(etag)
+        # Адрес с версией (?v=) неизменяем и кэшируется надолго, без нее ответ сверяется по ETag
+        if request.args.get('v') == etag:
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
     
+    def error_payload(message: str) -> Dict:
+        return {
+            'status': 'error',
+            'command_type': 'error',
+            'result': message
+        }
+
+    def persist_command(text: str, command_type: str, entities: EntityRecord, result: str) -> None:
+        """Queue the command and the created task for write-behind storage"""
+        now = datetime.utcnow()
+        app.write_behind.enqueue(
+            Command.__table__,
+            text=text[:500],
+            command_type=command_type,
+            status='unknown' if command_type == 'unknown' else 'processed',
+            result=result,
+            created_at=now
+        )
+        if command_type == 'task_creation' and entities.description:
+            app.write_behind.enqueue(
+                Task.__table__,
+                title=entities.description[:200],
+                description=text,
+                status='pending',
+                category='task',
+                priority=entities.priority or 'normal',
+                due_date=entities.due,
+                created_at=now
+            )
+
+    def handle_text(session_id: str, text: str) -> Dict:
+        """Run the recognized text through the NLP and command pipeline"""
+        # Анализируем текст и получаем тип команды
+        logger.debug("Анализируем текст после распознавания: %r", text)
+        with app.dialog_contexts.session(session_id) as context, span('nlp'):
+            command_type, entities = context.analyze_text(text)
+        logger.debug("Распознан тип команды: %s, сущности: %s", command_type, entities)
+        
+        # Обрабатываем команду через процессор команд
+        with span('command'):
+            result = process_command(command_type, entities)
+        logger.debug("Результат обработки команды: %s", result)
+        logger.info("Команда обработана: %s", command_type,
+                    extra={'session_id': session_id, 'command_type': command_type})
+        
+        with span('persist'):
+            persist_command(text, command_type, entities, result)
+        
+        return {
+            'status': 'success',
+            'command_type': command_type,
+            'result': result
+        }
+
+    def transcribe_audio(upload: AudioUpload) -> str:
+        """Recognized text of the upload, served from the transcription cache when possible"""
+        # Повторная загрузка того же аудио не вызывает распознавание
+        with span('audio_hash'):
+            cache_key = TranscriptionCache.make_key(upload.stream, app.stt.cache_namespace, app.stt.language)
+        with span('transcription_cache'):
+            text = app.transcription_cache.get(cache_key)
+        if text is None:
+            if app.config['AUDIO_PREPROCESS'] and upload.is_wav:
+                # numpy загружается при первой WAV-загрузке
+                from utils.preprocessing import preprocess_audio
+                with span('preprocess'):
+                    processed = preprocess_audio(upload, app.config['AUDIO_TARGET_RATE'],
+                                                 app.config['AUDIO_VAD_PAD_MS'])
+                if processed is not None:
+                    upload = processed.upload
+            # Получаем распознанный текст
+            with span('stt'):
+                transcript = app.stt.transcribe(upload)
+            text = transcript.lower().strip()
+            logger.debug("Speech recognition result: %s", text)
+            # Ответ резервного движка не закрепляется за ключом основного
+            if not isinstance(transcript, FallbackTranscript):
+                app.transcription_cache.put(cache_key, text)
+        else:
+            logger.debug("Transcription cache hit: %s", text)
+        return text
+
+    def stt_unavailable_payload(error: STTUnavailableError) -> Tuple[Dict, int]:
+        if isinstance(error, STTTimeoutError):
+            return error_payload('Распознавание речи заняло слишком много времени, повторите попытку'), 504
+        payload = error_payload('Сервис распознавания речи временно недоступен, повторите попытку позже')
+        payload['retry_after'] = int(error.retry_after + 0.999) or 1
+        return payload, 503
+
+    def stt_response(payload: Dict, status_code: int):
+        response = jsonify(payload)
+        if 'retry_after' in payload:
+            response.headers['Retry-After'] = str(payload['retry_after'])
+        return response, status_code
+
+    def recognize_and_process(session_id: str, upload: AudioUpload) -> Tuple[Dict, int]:
+        """Transcribe the uploaded audio and process the command"""
+        try:
+            text = transcribe_audio(upload)
+            payload = handle_text(session_id, text)
+            logger.debug("Отправляем ответ клиенту: %s", payload['result'])
+            return payload, 200
+        except STTUnavailableError as e:
+            logger.warning(f"Speech-to-text unavailable: {str(e)}")
+            return stt_unavailable_payload(e)
+        except Exception as e:
+            logger.error(f"Error processing audio with {app.stt.name} backend: {str(e)}")
+            return error_payload('Ошибка при распознавании речи'), 500
+
+    def audio_job(session_id: str, upload: AudioUpload) -> Dict:
+        """Background variant of recognize_and_process that owns the upload stream.
+
+        Ответ с ошибкой переводит задание в failed вместе с HTTP-статусом,
+        который получил бы синхронный запрос.
+        """
+        try:
+            with app.app_context():
+                payload, status_code = recognize_and_process(session_id, upload)
+                if status_code != 200:
+                    raise JobError(payload, status_code)
+                return payload
+        finally:
+            upload.close()
+
     @app.route('/process_audio', methods=['POST'])
     def process_audio():
-        """Process audio file using Whisper API"""
-        tmp_file_path = None
+        """Process audio file using the configured speech-to-text backend.
+
+        With ?async=1 the upload is queued and a job id is returned immediately
+        (unless JOB_ASYNC_ENABLED is off, then the request is answered synchronously).
+        """
         try:
             logger.debug("Processing audio request")
             
-            if 'audio' not in request.files:
+            with span('upload'):
+                files = request.files
+            if 'audio' not in files:
                 logger.warning("No audio file in request")
-                return jsonify({
-                    'status': 'error',
-                    'command_type': 'error',
-                    'result': 'Аудио файл не найден'
-                }), 400
+                return jsonify(error_payload('Аудио файл не найден')), 400
             
-            audio_file = request.files['audio']
+            audio_file = files['audio']
             if not audio_file.filename:
                 logger.warning("Empty audio filename")
-                return jsonify({
-                    'status': 'error',
-                    'command_type': 'error',
-                    'result': 'Пустой аудио файл'
-                }), 400
+                return jsonify(error_payload('Пустой аудио файл')), 400
             
-            # Сохраняем временный файл
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp_file:
-                    logger.debug(f"Saving temporary file: {tmp_file.name}")
-                    audio_file.save(tmp_file.name)
-                    tmp_file_path = tmp_file.name
-            except Exception as e:
-                logger.error(f"Error saving temporary file: {str(e)}")
-                return jsonify({
-                    'status': 'error',
-                    'command_type': 'error',
-                    'result': 'Ошибка при сохранении аудио файла'
-                }), 500
-            
-            try:
-                # Отправляем файл в Whisper API
-                with open(tmp_file_path, 'rb') as audio:
-                    logger.info("Sending audio to Whisper API")
-                    transcript = client.audio.transcriptions.create(
-                        file=audio,
-                        model="whisper-1",
-                        language="ru"
-                    )
-                
-                # Получаем распознанный текст
-                text = transcript.text.lower().strip()
-                logger.info(f"Whisper API response: {text}")
-                
-                # Анализируем текст и получаем тип команды
-                logger.debug(f"Анализируем текст после распознавания: '{text}'")
-                command_type, entities = app.dialog_context.analyze_text(text)
-                logger.info(f"Распознан тип команды: {command_type}, сущности: {entities}")
-                
-                # Обрабатываем команду через процессор команд
-                result = process_command(command_type, entities)
-                logger.info(f"Результат обработки команды: {result}")
-                
-                logger.debug(f"Отправляем ответ клиенту: {result}")
-                
-                return jsonify({
-                    'status': 'success',
-                    'command_type': command_type,
-                    'result': result
-                })
+            if app.config['JOB_ASYNC_ENABLED'] and request.args.get('async') in ('1', 'true'):
+                # Поток загрузки переходит во владение фонового задания
+                upload = AudioUpload.detach(audio_file)
+                try:
+                    job = app.jobs.submit(audio_job, g.session_id, upload, session_id=g.session_id)
+                except SessionLimitError:
+                    upload.close()
+                    logger.warning("Too many pending jobs for session %s", g.session_id)
+                    return jsonify(error_payload('Слишком много запросов, подождите завершения предыдущих')), 429
+                except QueueFullError:
+                    upload.close()
+                    logger.warning("Job queue is full, rejecting audio request")
+                    response = jsonify(error_payload('Сервер перегружен, повторите попытку позже'))
+                    response.headers['Retry-After'] = '5'
+                    return response, 503
                 
-            except Exception as e:
-                logger.error(f"Error processing audio with Whisper API: {str(e)}")
+                logger.info("Audio queued as job %s", job.id)
                 return jsonify({
-                    'status': 'error',
-                    'command_type': 'error',
-                    'result': 'Ошибка при распознавании речи'
-                }), 500
+                    'status': 'accepted',
+                    'job_id': job.id,
+                    'status_url': url_for('job_status', job_id=job.id),
+                    'events_url': url_for('job_events', job_id=job.id)
+                }), 202
+            
+            upload = AudioUpload(audio_file.filename, audio_file.stream)
+            return stt_response(*recognize_and_process(g.session_id, upload))
             
         except Exception as e:
             logger.error(f"Unexpected error processing audio: {str(e)}")
-            return jsonify({
-                'status': 'error',
-                'command_type': 'error',
-                'result': 'Произошла неожиданная ошибка при обработке аудио'
-            }), 500
-            
-        finally:
-            # Удаляем временный файл
-            if tmp_file_path and os.path.exists(tmp_file_path):
+            return jsonify(error_payload('Произошла неожиданная ошибка при обработке аудио')), 500
+
+    def find_stream(stream_id: str):
+        stream = app.audio_streams.get(stream_id, g.session_id)
+        # Поток доступен только своей сессии
+        if stream is None:
+            abort(404)
+        return stream
+
+    def transcribe_segment(segment) -> str:
+        return transcribe_audio(AudioUpload.from_bytes(bytes(segment.buffer), 'segment.webm'))
+
+    def submit_segment(segment) -> None:
+        """Starts recognition of a closed segment while the user keeps talking"""
+        try:
+            segment.job = app.jobs.submit(transcribe_segment, segment)
+        except QueueFullError:
+            # Сегмент распознается при завершении записи
+            logger.debug("Job queue is full, segment %s will be transcribed on finish", segment.index)
+
+    @app.route('/process_audio/stream', methods=['POST'])
+    def start_audio_stream():
+        """Open a chunked upload; chunks are posted while the user is still speaking"""
+        data = request.get_json(silent=True) or {}
+        try:
+            stream = app.audio_streams.start(g.session_id, data.get('filename') or 'audio.webm')
+        except StreamLimitError as e:
+            logger.warning("Audio stream rejected: %s", e)
+            return jsonify(error_payload('Слишком много одновременных записей')), 429
+        return jsonify({
+            'stream_id': stream.id,
+            'chunk_url': url_for('append_audio_chunk', stream_id=stream.id),
+            'finish_url': url_for('finish_audio_stream', stream_id=stream.id)
+        }), 201
+
+    @app.route('/process_audio/stream/<stream_id>/chunks', methods=['POST'])
+    def append_audio_chunk(stream_id):
+        """Append the raw request body as chunk ?index=N; segment_end=1 closes the segment.
+
+        Закрытый сегмент - самостоятельный файл (клиент перезапустил запись
+        после паузы), его распознавание начинается сразу.
+        """
+        stream = find_stream(stream_id)
+        try:
+            index = int(request.args.get('index', ''))
+        except ValueError:
+            return jsonify(error_payload('Не указан номер фрагмента')), 400
+        segment_end = request.args.get('segment_end') in ('1', 'true')
+        with span('upload'):
+            data = request.get_data(cache=False)
+        try:
+            segment = app.audio_streams.append(stream, index, data, segment_end)
+        except ChunkOrderError as e:
+            logger.warning("Audio stream %s: %s", stream.id, e)
+            return jsonify(dict(error_payload('Фрагмент пришел не по порядку'), expected=stream.next_index)), 409
+        except StreamLimitError as e:
+            logger.warning("Audio stream %s: %s", stream.id, e)
+            app.audio_streams.discard(stream)
+            return jsonify(error_payload('Запись слишком большая')), 413
+        if segment is not None:
+            submit_segment(segment)
+        return jsonify({'received': stream.next_index, 'segments': stream.closed_segments})
+
+    @app.route('/process_audio/stream/<stream_id>/finish', methods=['POST'])
+    def finish_audio_stream(stream_id):
+        """Close the stream and answer like /process_audio with the text of all segments"""
+        stream = find_stream(stream_id)
+        segments = app.audio_streams.finish(stream)
+        if not segments:
+            return jsonify(error_payload('Пустой аудио файл')), 400
+        # Задания сегментов ждем не дольше срока распознавания, чтобы зависшее
+        # задание не занимало поток запроса
+        deadline = time.monotonic() + app.config['STT_TIMEOUT_MAX']
+        try:
+            texts = []
+            for segment in segments:
+                job = segment.job
+                if job is not None:
+                    if not job.done.wait(max(0.0, deadline - time.monotonic())):
+                        raise STTTimeoutError(f'Segment {segment.index} was not transcribed in time')
+                    if job.status == job.DONE:
+                        texts.append(job.result)
+                        continue
+                texts.append(transcribe_segment(segment))
+        except STTUnavailableError as e:
+            logger.warning(f"Speech-to-text unavailable: {str(e)}")
+            return stt_response(*stt_unavailable_payload(e))
+        except Exception as e:
+            logger.error(f"Error processing audio stream with {app.stt.name} backend: {str(e)}")
+            return jsonify(error_payload('Ошибка при распознавании речи')), 500
+        text = ' '.join(text for text in texts if text)
+        try:
+            return jsonify(handle_text(g.session_id, text))
+        except Exception as e:
+            logger.error(f"Unexpected error processing audio stream: {str(e)}")
+            return jsonify(error_payload('Произошла неожиданная ошибка при обработке аудио')), 500
+
+    @app.route('/process_audio/stream/<stream_id>', methods=['DELETE'])
+    def cancel_audio_stream(stream_id):
+        """Drop the stream buffers without processing"""
+        app.audio_streams.discard(find_stream(stream_id))
+        return '', 204
+
+    def find_job(job_id: str):
+        job = app.jobs.get(job_id)
+        # Задания доступны только своей сессии
+        if job is None or job.session_id != g.session_id:
+            abort(404)
+        return job
+
+    @app.route('/process_text', methods=['POST'])
+    def process_text():
+        """Process a single text utterance without speech recognition"""
+        data = request.get_json(silent=True) or request.form
+        text = (data.get('text') or '').lower().strip()
+        if not text:
+            return jsonify(error_payload('Текст команды не найден')), 400
+        
+        # Сессия берется только из заголовка или cookie: id в теле запроса
+        # позволял бы писать в контекст чужой сессии
+        try:
+            return jsonify(handle_text(g.session_id, text))
+        except Exception as e:
+            logger.error(f"Unexpected error processing text: {str(e)}")
+            return jsonify(error_payload('Произошла неожиданная ошибка при обработке текста')), 500
+
+    def read_batch_items() -> Iterator[Dict]:
+        """Yield batch items from a JSON array or a JSONL body"""
+        if request.mimetype == 'application/json':
+            items = request.get_json()
+            if not isinstance(items, list):
+                raise ValueError('Ожидается JSON-массив')
+            lines = items
+        else:
+            # JSONL читаем построчно, не загружая тело целиком
+            lines = (json.loads(line) for line in request.stream if line.strip())
+        for item in lines:
+            yield {'text': item} if isinstance(item, str) else item
+
+    @app.route('/process_batch', methods=['POST'])
+    def process_batch():
+        """Process many utterances and stream results as JSON lines.
+
+        Items are strings or objects with text and optional id/session_id.
+        Sessions are replayed in batch-local contexts and do not touch live dialogs.
+        """
+        if request.mimetype == 'application/json' and not isinstance(request.get_json(silent=True), list):
+            return jsonify(error_payload('Ожидается JSON-массив или JSONL')), 400
+
+        def generate():
+            contexts: Dict[str, DialogContext] = {}
+            # analyze_batch читает пары порциями и отдает результаты
+            # в том же порядке, поэтому элементы ждут своей очереди здесь
+            pending = deque()
+
+            def pairs():
+                for item in read_batch_items():
+                    pending.append(item)
+                    session_id = item.get('session_id')
+                    context = contexts.setdefault(session_id, DialogContext()) if session_id else DialogContext()
+                    yield context, (item.get('text') or '').lower().strip()
+
+            for index, (command_type, entities) in enumerate(analyze_batch(pairs())):
+                item = pending.popleft()
+                yield json.dumps({
+                    'index': index,
+                    'id': item.get('id'),
+                    'session_id': item.get('session_id'),
+                    'command_type': command_type,
+                    'entities': entities.as_dict(),
+                    'result': process_command(command_type, entities)
+                }, ensure_ascii=False, default=str) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    def component_stats() -> Dict[str, Dict[str, int]]:
+        return {
+            'sessions': app.dialog_contexts.stats(),
+            'transcription_cache': app.transcription_cache.stats(),
+            'jobs': {'queue_depth': app.jobs.depth, 'workers': app.jobs.workers},
+            'audio_streams': app.audio_streams.stats(),
+            'stt': app.stt.stats(),
+            'write_behind': app.write_behind.stats(),
+            'logging': logging_stats()
+        }
+
+    @app.route('/status')
+    def status():
+        """Report the state of in-process caches and queues"""
+        return jsonify(component_stats())
+
+    @app.route('/metrics')
+    def metrics():
+        """Stage latency histograms and counters in the Prometheus text format"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    def list_table(table, equality_filters: Dict[str, str], due_column: str = None):
+        """Paginated listing with filters; unchanged tables are answered with 304"""
+        try:
+            limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError('limit must be positive')
+            conditions = []
+            for arg, column in equality_filters.items():
+                if request.args.get(arg):
+                    # Несколько значений через запятую: status=pending,done
+                    values = request.args[arg].split(',')
+                    conditions.append(table.c[column].in_(values))
+            if due_column:
+                if request.args.get('due_from'):
+                    conditions.append(table.c[due_column] >= parse_datetime(request.args['due_from']))
+                if request.args.get('due_to'):
+                    conditions.append(table.c[due_column] <= parse_datetime(request.args['due_to']))
+        except ValueError as e:
+            return jsonify(error_payload(f'Неверные параметры запроса: {str(e)}')), 400
+
+        with db.get_engine(app).connect() as conn:
+            # Версия читается до строк: при гонке с записью клиент получит
+            # устаревший ETag и просто перечитает страницу при следующем опросе
+            version, modified = table_version(conn, table.name)
+            etag = listing_etag(table.name, version, request.query_string)
+            # При If-None-Match дата не проверяется: Last-Modified точен до
+            # секунды и пропустил бы вторую запись в ту же секунду
+            if 'If-None-Match' in request.headers:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = request.if_modified_since is not None and modified <= request.if_modified_since
+            if not_modified:
+                response = Response(status=304)
+            else:
                 try:
-                    os.unlink(tmp_file_path)
-                    logger.debug(f"Temporary file removed: {tmp_file_path}")
-                except Exception as e:
-                    logger.error(f"Error removing temporary file: {str(e)}")
+                    items, next_cursor = fetch_page(conn, table, conditions, request.args.get('cursor'), limit)
+                except ValueError as e:
+                    return jsonify(error_payload(f'Неверные параметры запроса: {str(e)}')), 400
+                response = jsonify({
+                    'items': items,
+                    'next_cursor': next_cursor,
+                    'version': version
+                })
+
+        response.set_etag(etag)
+        response.last_modified = modified
+        # Клиент хранит ответ, но перед использованием всегда сверяет версию
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @app.route('/api/tasks')
+    def list_tasks():
+        """List tasks filtered by status, category, priority and due date range"""
+        return list_table(
+            Task.__table__,
+            {'status': 'status', 'category': 'category', 'priority': 'priority'},
+            due_column='due_date'
+        )
+
+    @app.route('/api/entities')
+    def list_entities():
+        """List business entities filtered by type and status"""
+        return list_table(BusinessEntity.__table__, {'type': 'entity_type', 'status': 'status'})
+
+    def bulk_format() -> str:
+        fmt = request.args.get('format')
+        if not fmt:
+            fmt = 'jsonl' if request.mimetype in ('application/x-ndjson', 'application/jsonl') else 'csv'
+        if fmt not in FORMATS:
+            abort(400)
+        return fmt
+
+    @app.route('/api/entities/import', methods=['POST'])
+    def import_entities_route():
+        """Import business entities from a CSV or JSONL request body streamed in chunks"""
+        fmt = bulk_format()
+        # Тело читается потоком, а не целиком в память
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        try:
+            report = import_entities(db.get_engine(app), read_rows(stream, fmt))
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            logger.warning(f"Business entity import aborted: {str(e)}")
+            return jsonify(error_payload(f'Ошибка в данных импорта: {str(e)}')), 400
+        return jsonify(report.to_dict())
+
+    @app.route('/api/entities/export')
+    def export_entities_route():
+        """Stream business entities as CSV or JSONL"""
+        fmt = bulk_format()
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        chunks = export_entities(db.get_engine(app), fmt, request.args.get('type'))
+        return Response(chunks, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=business_entities.{fmt}'
+        })
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        """Poll the state of a queued audio job"""
+        return jsonify(find_job(job_id).to_dict())
+
+    @app.route('/jobs/<job_id>/events')
+    def job_events(job_id):
+        """Stream the job result as a Server-Sent Event"""
+        job = find_job(job_id)
+
+        def stream():
+            while not job.done.wait(timeout=15):
+                # Комментарий поддерживает соединение открытым
+                yield ': keepalive\n\n'
+            yield f"event: result\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+
+        return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables, full-text indexes and version triggers (for DB_CREATE_SCHEMA=0)"""
+        engine = db.get_engine(app)
+        create_tables()
+        search_index.fts_enabled = engine.dialect.name == 'sqlite' and search_index.ensure_schema(engine)
+        ensure_version_tracking(engine)
+    
+    if app.config['WARM_UP']:
+        warm_up(app)
     
     return app
@@ -0,0 +1,100 @@
+"""Сравнение старого пути загрузки через NamedTemporaryFile и передачи потока в памяти.
+
+Каждый режим запускается в отдельном процессе, чтобы пиковый RSS
+не смешивался между режимами. Распознавание заменено заглушкой,
+которая читает поток блоками, как это делает HTTP-клиент OpenAI.
+
+Запуск: python -m benchmarks.bench_audio_upload [--size-kb 2048] [--requests 200]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from flask import Flask, request
+
+from benchmarks.common import percentile, report
+from utils.audio import AudioRequest, AudioUpload
+
+
+def consume(fileobj) -> int:
+    total = 0
+    while True:
+        chunk = fileobj.read(64 * 1024)
+        if not chunk:
+            return total
+        total += len(chunk)
+
+
+def make_app(mode: str) -> Flask:
+    app = Flask(__name__)
+    if mode == 'memory':
+        app.request_class = AudioRequest
+        app.config['AUDIO_SPOOL_THRESHOLD'] = 16 * 1024 * 1024
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        audio_file = request.files['audio']
+        if mode == 'tempfile':
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as tmp_file:
+                audio_file.save(tmp_file.name)
+                tmp_file_path = tmp_file.name
+            try:
+                with open(tmp_file_path, 'rb') as audio:
+                    size = consume(audio)
+            finally:
+                os.unlink(tmp_file_path)
+        else:
+            _, stream = AudioUpload(audio_file.filename, audio_file.stream).as_file()
+            size = consume(stream)
+        return str(size)
+
+    return app
+
+
+def run_mode(mode: str, size_kb: int, requests: int) -> dict:
+    client = make_app(mode).test_client()
+    payload = os.urandom(size_kb * 1024)
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.post('/upload', data={'audio': (io.BytesIO(payload), 'audio.webm')})
+        latencies.append(time.perf_counter() - started)
+        assert response.data == str(len(payload)).encode()
+    latencies.sort()
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-kb', type=int, default=2048)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--mode', choices=('tempfile', 'memory'))
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.size_kb, args.requests)))
+        return
+
+    results = {}
+    for mode in ('tempfile', 'memory'):
+        output = subprocess.check_output([
+            sys.executable, '-m', 'benchmarks.bench_audio_upload', '--mode', mode,
+            '--size-kb', str(args.size_kb), '--requests', str(args.requests)
+        ])
+        results[mode] = json.loads(output)
+    report('audio_upload', {f'{args.size_kb}kb': results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
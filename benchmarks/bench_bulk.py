@@ -0,0 +1,110 @@
+"""Импорт и экспорт бизнес-сущностей: потоковый импорт порциями против ORM по одной записи.
+
+Файл содержит около 5% дублей по (name, entity_type). Импорт через ORM
+проверяет дубль запросом и сохраняет каждую запись отдельной транзакцией;
+он выполняется на первых --baseline-rows строках.
+
+Запуск: python -m benchmarks.bench_bulk [--rows 100000] [--baseline-rows 5000]
+"""
+import argparse
+import csv
+import logging
+import os
+import random
+import resource
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from benchmarks.common import report
+from models import BusinessEntity, db
+from utils.bulk import export_entities, import_entities, read_rows
+from utils.storage import _apply_sqlite_pragmas, engine_options
+
+TYPES = ('client', 'supplier', 'partner', 'contractor')
+
+
+def make_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    db.metadata.create_all(engine, tables=[BusinessEntity.__table__])
+    return engine
+
+
+def write_csv(path: str, rows: int) -> None:
+    rng = random.Random(1)
+    with open(path, 'w', encoding='utf-8', newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(('name', 'entity_type', 'description', 'contact_info', 'status'))
+        for i in range(rows):
+            # Каждая двадцатая строка повторяет одну из предыдущих
+            number = rng.randrange(i) if i and i % 20 == 0 else i
+            writer.writerow((
+                f'ООО Компания {number}', TYPES[number % len(TYPES)],
+                f'Контрагент из выгрузки CRM, строка {i}', f'+7 900 {number:07d}', 'active',
+            ))
+
+
+def orm_import(engine, path: str, limit: int) -> dict:
+    """Прежний способ: ORM, проверка дубля и фиксация на каждую запись"""
+    started = time.perf_counter()
+    inserted = 0
+    with open(path, encoding='utf-8', newline='') as stream, Session(engine) as session:
+        for index, row in enumerate(read_rows(stream, 'csv')):
+            if index >= limit:
+                break
+            exists = session.query(BusinessEntity.id).filter_by(
+                name=row['name'], entity_type=row['entity_type']).first()
+            if exists:
+                continue
+            session.add(BusinessEntity(**row))
+            session.commit()
+            inserted += 1
+    seconds = time.perf_counter() - started
+    return {'rows': limit, 'inserted': inserted, 'rows_per_sec': round(limit / seconds, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--baseline-rows', type=int, default=5000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'entities.csv')
+        write_csv(source, args.rows)
+
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'orm.db')}")
+        results['orm_import'] = orm_import(engine, source, min(args.baseline_rows, args.rows))
+        engine.dispose()
+
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'bulk.db')}")
+        with open(source, encoding='utf-8', newline='') as stream:
+            imported = import_entities(engine, read_rows(stream, 'csv'), args.chunk_size).to_dict()
+        imported.pop('errors')
+        results['bulk_import'] = imported
+
+        # Повторный импорт того же файла: все строки - дубли
+        with open(source, encoding='utf-8', newline='') as stream:
+            results['bulk_reimport'] = import_entities(engine, read_rows(stream, 'csv'), args.chunk_size).rows_per_sec
+
+        for fmt in ('csv', 'jsonl'):
+            stats = {}
+            with open(os.path.join(tmp, f'export.{fmt}'), 'w', encoding='utf-8', newline='') as stream:
+                for part in export_entities(engine, fmt, stats=stats):
+                    stream.write(part)
+            results[f'export_{fmt}'] = stats
+        engine.dispose()
+
+    results['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    report('bulk_entities', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
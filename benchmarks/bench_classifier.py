@@ -0,0 +1,133 @@
+"""Точность и задержка распознавания намерений: фразы (IntentMatcher) против классификатора.
+
+Размеченные фразы написаны как живая речь: команда окружена лишними
+словами, поэтому порог len(фраза)/len(текст) > 0.6 часто не срабатывает.
+
+Запуск: python -m benchmarks.bench_classifier [--batch 10000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.common import measure, report
+from utils.classifier import IntentClassifier
+from utils.nlp import COMMAND_PATTERNS, DialogContext
+
+LABELED = [
+    ('привет', 'greeting'),
+    ('терра привет как дела', 'greeting'),
+    ('добрый день терра', 'greeting'),
+    ('здравствуй ассистент', 'greeting'),
+    ('доброе утро у нас сегодня много работы', 'greeting'),
+    ('hello terra', 'greeting'),
+    ('создать задачу подготовить отчет', 'task_creation'),
+    ('создать задачу подготовить квартальный отчет для отдела продаж на завтра', 'task_creation'),
+    ('пожалуйста добавить задачу позвонить клиенту в 15 часов', 'task_creation'),
+    ('новая задача купить бумагу для принтера', 'task_creation'),
+    ('запланировать встречу с поставщиком в пятницу', 'task_creation'),
+    ('поставить задачу проверить договор с подрядчиком', 'task_creation'),
+    ('нужно поставить задачу обновить сайт до конца недели', 'task_creation'),
+    ('бюджет', 'finance'),
+    ('покажи расходы за прошлый месяц', 'finance'),
+    ('внести расходы на рекламу десять тысяч рублей', 'finance'),
+    ('нужно оплатить счет поставщику', 'finance'),
+    ('какие доходы у нас за квартал', 'finance'),
+    ('провести платеж по договору аренды', 'finance'),
+    ('статус проекта разработка сайта', 'project'),
+    ('создать проект мобильное приложение', 'project'),
+    ('обновить проект строительство склада', 'project'),
+    ('завершить проект редизайн логотипа на этой неделе', 'project'),
+    ('как дела с проектом автоматизации', 'project'),
+    ('найди отчет по продажам', 'search'),
+    ('найди клиента ромашка', 'search'),
+    ('поищи договор с поставщиком бумаги', 'search'),
+    ('где находится презентация для инвесторов', 'search'),
+    ('покажи информацию о компании вектор', 'search'),
+    ('как погода сегодня', 'unknown'),
+    ('спасибо большое', 'unknown'),
+    ('что ты умеешь', 'unknown'),
+    ('ну ладно давай потом', 'unknown'),
+    ('включи музыку', 'unknown'),
+]
+
+
+def matcher_intent(context: DialogContext, text: str) -> str:
+    return context._detect_intent(context._clean_text(text))[0]
+
+
+def accuracy(predict) -> dict:
+    correct = 0
+    misses = []
+    for text, label in LABELED:
+        predicted = predict(text)
+        if predicted == label:
+            correct += 1
+        else:
+            misses.append(f'{text} -> {predicted} (ожидалось {label})')
+    return {'accuracy': round(correct / len(LABELED), 3), 'misses': misses}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    started = time.perf_counter()
+    classifier = IntentClassifier.train(COMMAND_PATTERNS)
+    train_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'intent_classifier')
+        classifier.save(path)
+        started = time.perf_counter()
+        classifier = IntentClassifier.load(path)
+        load_seconds = time.perf_counter() - started
+
+        matcher_context = DialogContext()
+        classifier_context = DialogContext()
+
+        def with_classifier(text: str) -> str:
+            # Классификатор с фразами в резерве, как в analyze_text
+            DialogContext.classifier = classifier
+            try:
+                return matcher_intent(classifier_context, text)
+            finally:
+                DialogContext.classifier = None
+
+        texts = [text for text, _ in LABELED]
+        batch = [texts[i % len(texts)] for i in range(args.batch)]
+        sample = texts[7]
+
+        started = time.perf_counter()
+        classifier.predict_batch(batch)
+        batch_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for text in batch:
+            matcher_intent(matcher_context, text)
+        matcher_batch_seconds = time.perf_counter() - started
+
+        results = {
+            'train_seconds': round(train_seconds, 3),
+            'load_seconds': round(load_seconds, 4),
+            'matcher': accuracy(lambda text: matcher_intent(matcher_context, text)),
+            'classifier_only': accuracy(lambda text: classifier.predict(text)[0]),
+            'classifier_with_fallback': accuracy(with_classifier),
+            'latency_matcher': measure(lambda: matcher_intent(matcher_context, sample), args.iterations),
+            'latency_classifier': measure(lambda: classifier.predict(sample), args.iterations),
+            'batch': {
+                'size': args.batch,
+                'classifier_per_sec': round(args.batch / batch_seconds, 1),
+                'matcher_per_sec': round(args.batch / matcher_batch_seconds, 1),
+            },
+        }
+
+    report('intent_classifier', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Исправление ошибок распознавания: стоимость на фразу и влияние на распознавание команд.
+
+Индекс удалений (FuzzyIndex) сравнивается с перебором всего словаря
+по расстоянию правки при росте словаря. Отдельно замеряется полный
+предварительный этап analyze_text (слово активации + исправление) на
+фразах с ошибками без кэша (каждое слово новое) и с кэшем.
+
+Запуск: python -m benchmarks.bench_fuzzy [--iterations 2000]
+"""
+import argparse
+import logging
+import random
+
+from benchmarks.common import measure, report
+from utils.fuzzy import FuzzyIndex, allowed_distance, edit_distance, vocabulary
+from utils.nlp import COMMAND_PATTERNS, DialogContext
+
+# Фразы с типичными ошибками распознавания и ожидаемый тип команды
+MISRECOGNIZED = [
+    ('тера создат задачу подготовить отчет', 'task_creation'),
+    ('терро, запланироват встречу', 'task_creation'),
+    ('tерра поставит задачу', 'task_creation'),
+    ('здраствуй', 'greeting'),
+    ('привт', 'greeting'),
+    ('бюджэт', 'finance'),
+    ('транзакцыя', 'finance'),
+    ('статус праекта', 'project'),
+    ('обновит проект', 'project'),
+    ('завершит праект', 'project'),
+]
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+
+def linear_lookup(words, token: str):
+    """Перебор всего словаря: эталон для сравнения скорости"""
+    distance = allowed_distance(len(token))
+    if token in words or distance == 0:
+        return token if token in words else None
+    best = None
+    for word in words:
+        found = edit_distance(token, word, distance)
+        if found <= distance and (best is None or found < best[0]):
+            best = (found, word)
+    return best[1] if best else None
+
+
+def typo(rng: random.Random, word: str) -> str:
+    position = rng.randrange(len(word))
+    return word[:position] + rng.choice(ALPHABET) + word[position + 1:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(7)
+
+    results = {}
+    base = vocabulary(COMMAND_PATTERNS)
+    for size in (len(set(base)), 1000, 10000):
+        words = list(set(base))
+        while len(words) < size:
+            words.append(''.join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 12))))
+        index = FuzzyIndex(words)
+        word_set = set(words)
+        queries = [typo(rng, rng.choice(words)) for _ in range(200)]
+        # Время на одно слово; поиск по индексу в обход кэша
+        results[f'vocabulary_{size}'] = {
+            'index_us': round(measure(lambda: [index._lookup(q) for q in queries],
+                                      max(1, args.iterations // 100), warmup=1)['p50_us'] / len(queries), 2),
+            'linear_us': round(measure(lambda: [linear_lookup(word_set, q) for q in queries[:20]],
+                                       1, warmup=0)['p50_us'] / 20, 2),
+        }
+
+    context = DialogContext()
+    index = DialogContext.fuzzy
+    texts = [text for text, _ in MISRECOGNIZED]
+
+    def prestage_warm():
+        text = texts[rng.randrange(len(texts))]
+        return context._matching_text(context._clean_text(text))
+
+    def prestage_cold():
+        # Поиск в обход кэша, как для слов, которые еще не встречались
+        text = texts[rng.randrange(len(texts))]
+        return ' '.join(index._lookup(token) or token for token in context._clean_text(text).split())
+
+    results['prestage_per_utterance_warm'] = measure(prestage_warm, args.iterations)
+    results['prestage_per_utterance_cold'] = measure(prestage_cold, args.iterations)
+    results['index_build_us'] = measure(lambda: FuzzyIndex(vocabulary(COMMAND_PATTERNS)), 20, warmup=2)['p50_us']
+
+    with_fuzzy = sum(DialogContext().analyze_text(text, verbose=False)[0] == label for text, label in MISRECOGNIZED)
+    # Пустой словарь: исправление выключено, слово активации по-прежнему удаляется
+    DialogContext.fuzzy = FuzzyIndex(())
+    try:
+        without_fuzzy = sum(DialogContext().analyze_text(text, verbose=False)[0] == label
+                            for text, label in MISRECOGNIZED)
+    finally:
+        DialogContext.fuzzy = index
+    results['recognized'] = {
+        'utterances': len(MISRECOGNIZED),
+        'with_fuzzy': with_fuzzy,
+        'without_fuzzy': without_fuzzy,
+    }
+
+    report('fuzzy_correction', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Нагрузка на очередь заданий JobQueue с заглушкой распознавания речи.
+
+Заглушка имитирует медленный ответ Whisper API (sleep), поэтому видно,
+как пропускная способность зависит от числа потоков и сколько запросов
+отклоняется при переполнении очереди.
+
+Запуск: python -m benchmarks.bench_jobs [--latency 0.2] [--requests 200]
+"""
+import argparse
+import time
+
+from benchmarks.common import percentile, report
+from utils.jobs import JobQueue, QueueFullError, SessionLimitError
+from utils.nlp import DialogContext
+from utils.command_processor import process_command
+
+
+def stub_pipeline(text: str, latency: float) -> dict:
+    time.sleep(latency)
+    command_type, entities = DialogContext().analyze_text(text)
+    return {'command_type': command_type, 'result': process_command(command_type, entities)}
+
+
+def run(workers: int, max_queue: int, requests: int, latency: float) -> dict:
+    jobs = JobQueue(workers=workers, max_queue=max_queue, max_per_session=requests, name='bench')
+    accepted, rejected = [], 0
+    started = time.perf_counter()
+    for i in range(requests):
+        try:
+            accepted.append((time.perf_counter(), jobs.submit(
+                stub_pipeline, 'терра создать задачу позвонить клиенту', latency,
+                session_id=f'session-{i % 10}')))
+        except (QueueFullError, SessionLimitError):
+            rejected += 1
+
+    latencies = []
+    for submitted, job in accepted:
+        job.done.wait()
+        latencies.append(job.finished_at - submitted)
+        assert job.status == 'done', job.error
+    elapsed = time.perf_counter() - started
+    jobs.shutdown()
+
+    latencies.sort()
+    return {
+        'accepted': len(accepted),
+        'rejected': rejected,
+        'completed_per_sec': round(len(accepted) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.05, help='имитируемое время ответа STT, с')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = {}
+    for workers in (1, 4, 16):
+        results[f'{workers}_workers'] = run(workers, args.requests, args.requests, args.latency)
+    # Маленькая очередь: часть запросов должна быть отклонена сразу
+    results['overload_queue_8'] = run(4, 8, args.requests, args.latency)
+    report('job_queue', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Списки задач: OFFSET против курсора и опрос без изменений (304) против полного ответа.
+
+Запуск: python -m benchmarks.bench_listing [--rows 200000] [--iterations 200]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+
+from sqlalchemy import select
+
+from benchmarks.common import measure, report
+
+STATUSES = ('pending', 'in_progress', 'done', 'cancelled')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'listing.db')}"
+        os.environ.setdefault('STT_BACKEND', 'stub')
+        from app import create_app
+        from benchmarks.bench_storage import seed
+        from models import Task, db
+        from utils.listing import encode_cursor
+
+        app = create_app()
+        logging.disable(logging.CRITICAL)
+        engine = db.get_engine(app)
+        seed(engine, args.rows, tuned=True)
+        client = app.test_client()
+        limit = args.page_size
+        table = Task.__table__
+
+        def offset_page(offset: int):
+            with engine.connect() as conn:
+                return conn.execute(
+                    select(table).order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit).offset(offset)
+                ).fetchall()
+
+        # Курсор страницы в середине таблицы
+        middle = offset_page(args.rows // 2)[0]
+        middle_cursor = encode_cursor(middle.created_at, middle.id)
+        first = client.get(f'/api/tasks?limit={limit}')
+        etag = first.headers['ETag']
+        rng = random.Random(1)
+
+        results = {
+            'offset_first_page': measure(lambda: offset_page(0), args.iterations, warmup=5),
+            'offset_middle_page': measure(lambda: offset_page(args.rows // 2), args.iterations, warmup=5),
+            'keyset_first_page': measure(lambda: client.get(f'/api/tasks?limit={limit}'),
+                                         args.iterations, warmup=5),
+            'keyset_middle_page': measure(lambda: client.get(f'/api/tasks?limit={limit}&cursor={middle_cursor}'),
+                                          args.iterations, warmup=5),
+            'filtered_page': measure(lambda: client.get(f'/api/tasks?limit={limit}&status={rng.choice(STATUSES)}'),
+                                     args.iterations, warmup=5),
+            'poll_not_modified': measure(lambda: client.get(f'/api/tasks?limit={limit}',
+                                                            headers={'If-None-Match': etag}),
+                                         args.iterations, warmup=5),
+        }
+        app.write_behind.close()
+        engine.dispose()
+
+    report('listing', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
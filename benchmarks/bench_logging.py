@@ -0,0 +1,72 @@
+"""Пропускная способность /process_text при разных настройках логирования.
+
+Логи пишутся в файл во временном каталоге. legacy_sync_debug повторяет
+прежнюю настройку: уровень DEBUG, синхронная запись из потока запроса.
+
+Запуск: python -m benchmarks.bench_logging [--iterations 3000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+from benchmarks.common import measure, report
+
+TEXTS = (
+    'создать задачу подготовить квартальный отчет завтра в 10 утра',
+    'привет',
+    'статус проекта разработка сайта',
+    'найди клиента ромашка',
+)
+
+MODES = {
+    'legacy_sync_debug': {'LOG_LEVEL': 'DEBUG', 'LOG_QUEUE': False, 'LOG_FORMAT': 'text'},
+    'sync_text_info': {'LOG_LEVEL': 'INFO', 'LOG_QUEUE': False, 'LOG_FORMAT': 'text'},
+    'queue_text_info': {'LOG_LEVEL': 'INFO', 'LOG_QUEUE': True, 'LOG_FORMAT': 'text'},
+    'queue_json_info': {'LOG_LEVEL': 'INFO', 'LOG_QUEUE': True, 'LOG_FORMAT': 'json'},
+    'queue_json_debug_sampled_1pct': {'LOG_LEVEL': 'INFO', 'LOG_QUEUE': True, 'LOG_FORMAT': 'json',
+                                      'LOG_DEBUG_SAMPLE': 0.01},
+    'queue_json_debug_all': {'LOG_LEVEL': 'DEBUG', 'LOG_QUEUE': True, 'LOG_FORMAT': 'json'},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=3000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'logging.db')}"
+        os.environ.setdefault('STT_BACKEND', 'stub')
+        from app import create_app
+        from utils.logs import configure_logging, shutdown_logging
+
+        app = create_app()
+        client = app.test_client()
+        counter = iter(range(10 ** 9))
+
+        def request():
+            text = TEXTS[next(counter) % len(TEXTS)]
+            return client.post('/process_text', json={'text': text})
+
+        results = {}
+        logging.disable(logging.CRITICAL)
+        results['disabled'] = measure(request, args.iterations, warmup=100)
+        logging.disable(logging.NOTSET)
+        for name, settings in MODES.items():
+            path = os.path.join(tmp, f'{name}.log')
+            config = dict(settings, LOG_FILE=path)
+            configure_logging(config)
+            app.config['LOG_DEBUG_SAMPLE'] = config.get('LOG_DEBUG_SAMPLE', 0)
+            results[name] = measure(request, args.iterations, warmup=100)
+            # Очередь дописывается до замера размера файла
+            shutdown_logging()
+            results[name]['log_bytes'] = os.path.getsize(path)
+        app.write_behind.close()
+
+    report('logging', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
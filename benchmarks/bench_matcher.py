@@ -0,0 +1,73 @@
+"""Сравнение построчного поиска шаблонов и автомата IntentMatcher.
+
+Запуск: python -m benchmarks.bench_matcher [--output results.json]
+"""
+import argparse
+import random
+
+from benchmarks.common import measure, report
+from utils.matcher import IntentMatcher
+from utils.nlp import COMMAND_PATTERNS, DialogContext
+
+UTTERANCES = [
+    'создать задачу подготовить квартальный отчет для отдела продаж на завтра',
+    'покажи расходы по проекту строительство склада за прошлый месяц',
+    'привет как дела',
+    'обновить проект разработка сайта и завершить проект мобильного приложения',
+    'нужно срочно перенести встречу с поставщиком на пятницу в пятнадцать часов',
+]
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+
+def synthetic_patterns(total: int, seed: int = 42) -> dict:
+    """Расширяет реальную таблицу случайными фразами до total фраз"""
+    rng = random.Random(seed)
+    patterns = {intent: list(phrases) for intent, phrases in COMMAND_PATTERNS.items()}
+    intents = [f'intent_{i}' for i in range(max(1, total // 50))]
+    count = sum(len(p) for p in patterns.values())
+    while count < total:
+        words = [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 10)))
+                 for _ in range(rng.randint(1, 3))]
+        patterns.setdefault(rng.choice(intents), []).append(' '.join(words))
+        count += 1
+    return patterns
+
+
+def naive_confidences(patterns: dict, text: str) -> dict:
+    context = DialogContext()
+    return {intent: context._calculate_command_confidence(text, phrases)
+            for intent, phrases in patterns.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = {}
+    for size in (21, 100, 1000, 5000):
+        patterns = synthetic_patterns(size)
+        matcher = IntentMatcher(patterns)
+        context = DialogContext()
+
+        # Автомат обязан давать те же оценки, что и построчный поиск
+        for text in UTTERANCES:
+            assert matcher.confidences(text) == naive_confidences(patterns, text), text
+
+        results[f'{size}_phrases'] = {
+            'naive': measure(
+                lambda: [{i: context._calculate_command_confidence(t, p) for i, p in patterns.items()}
+                         for t in UTTERANCES],
+                iterations=args.iterations),
+            'automaton': measure(
+                lambda: [matcher.confidences(t) for t in UTTERANCES],
+                iterations=args.iterations),
+        }
+
+    report('intent_matcher', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Накладные расходы метрик: стоимость одного этапа и запроса /process_text с метриками и без.
+
+Запуск: python -m benchmarks.bench_metrics [--iterations 5000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+from benchmarks.common import measure, report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'metrics.db')}"
+        os.environ.setdefault('STT_BACKEND', 'stub')
+        from app import create_app
+        from utils.metrics import registry, span, start_breakdown, finish_breakdown
+
+        app = create_app()
+        logging.disable(logging.CRITICAL)
+        client = app.test_client()
+
+        def empty_span():
+            with span('bench'):
+                pass
+
+        def breakdown_span():
+            token = start_breakdown()
+            with span('bench'):
+                pass
+            finish_breakdown(token)
+
+        def request(headers=None):
+            return lambda: client.post('/process_text', json={'text': 'создать задачу подготовить отчет'},
+                                       headers=headers)
+
+        results = {'span': measure(empty_span, args.iterations * 10),
+                   'span_with_breakdown': measure(breakdown_span, args.iterations * 10)}
+        registry.enabled = False
+        results['span_disabled'] = measure(empty_span, args.iterations * 10)
+        results['process_text_metrics_off'] = measure(request(), args.iterations, warmup=50)
+        registry.enabled = True
+        results['process_text_metrics_on'] = measure(request(), args.iterations, warmup=50)
+        results['process_text_server_timing'] = measure(request({'X-Request-Timing': '1'}), args.iterations, warmup=50)
+        results['metrics_scrape'] = measure(lambda: client.get('/metrics'), max(1, args.iterations // 10), warmup=5)
+        app.write_behind.close()
+
+    report('metrics_overhead', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
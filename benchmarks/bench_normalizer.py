@@ -0,0 +1,128 @@
+"""Сверка и замер нормализации текста задач.
+
+Эталон - прежняя реализация format_task_creation (последовательные
+re.sub, поиск слов даты и два выражения времени). Выражение для слова
+активации t?[еэ]рр?а? из эталона убрано: оно вырезало "ер" внутри слов
+("сервер" -> "св"), и теперь слово активации удаляется целиком через
+strip_wake_words в обеих реализациях. Приоритет эталон определяет по
+тому же правилу, что и запись задачи (task_priority): прежняя проверка
+только "срочн" расходилась с приоритетом сохраненной задачи. Ответы новой реализации должны
+совпадать с эталоном на всем корпусе.
+
+Запуск: python -m benchmarks.bench_normalizer [--iterations 2000]
+"""
+import argparse
+import logging
+import re
+from datetime import datetime, timedelta
+
+from benchmarks.common import measure, report
+from utils.command_processor import format_task_creation
+from utils.entities import extract_numeric, task_priority
+from utils.fuzzy import strip_wake_words
+
+GOLDEN_CORPUS = [
+    'создай задачу подготовить отчет на завтра',
+    'терра, поставь срочную задачу позвонить клиенту',
+    'добавь задачу провести совещание в 15 часов',
+    'создайте задачу подготовить презентацию послезавтра в 10:30',
+    'Терра создать задачу купить бумагу через неделю',
+    'поручение проверить договор с поставщиком через месяц',
+    'добавить критичную задачу исправить ошибку на сервере в 9',
+    'тера, поставь задачу перенести встречу с партнером',
+    'поставьте важную задачу согласовать бюджет - ',
+    'задачу отправить счет клиенту в 25 часов',
+    'эра создать задачу перенести встречу через день в 18.45',
+    'задачу, - обновить прайс-лист.',
+    '  создай  задачу   написать письмо партнеру   ',
+    'терра задачу позвонить в 7 ч',
+    'СОЗДАЙ ЗАДАЧУ Оформить Отпуск Сотруднику ЗАВТРА',
+    'отчет по продажам за квартал',
+    'поставь задачу встреча в 12:00 завтра',
+    'создай задачу купить 5 штук картриджей за 3000 рублей',
+    'tерра, создай срочную задачу подготовить ответ на претензию в 16:15',
+]
+
+_LEGACY_CLEANERS = [
+    r'создай(?:те)?\s+', r'создать\s+', r'добавь(?:те)?\s+', r'добавить\s+',
+    r'постав(?:ь|ите)?\s+', r'срочную?\s+', r'важную?\s+', r'критичную?\s+', r'задачу\s*',
+    r'поручение\s*', r'^[\s,\-–]+', r'[\s,\-–]+$'
+]
+
+
+def legacy_format_task_creation(description: str) -> str:
+    """Прежняя реализация без логирования"""
+    if not description:
+        return "Пожалуйста, укажите описание задачи"
+    priority = 'высокий' if task_priority(description) == 'high' else 'обычный'
+    description = strip_wake_words(description)
+    for pattern in _LEGACY_CLEANERS:
+        description = re.sub(pattern, '', description, flags=re.IGNORECASE)
+    task_date = None
+    date_words = {
+        'завтра': timedelta(days=1), 'послезавтра': timedelta(days=2), 'через день': timedelta(days=1),
+        'через неделю': timedelta(weeks=1), 'через месяц': timedelta(days=30)
+    }
+    for word, delta in date_words.items():
+        if word in description.lower():
+            task_date = datetime.now() + delta
+            description = description.replace(word, '').strip()
+            break
+    time_match = re.search(r'в\s+(\d{1,2})(?:[:.:](\d{2}))?\s*(?:час[оа]в?|час|ч)?', description)
+    if time_match:
+        hours = int(time_match.group(1))
+        minutes = int(time_match.group(2)) if time_match.group(2) else 0
+        if 0 <= hours <= 23 and 0 <= minutes <= 59:
+            if task_date:
+                task_date = task_date.replace(hour=hours, minute=minutes)
+            else:
+                task_date = datetime.now().replace(hour=hours, minute=minutes)
+                if task_date < datetime.now():
+                    task_date += timedelta(days=1)
+            description = re.sub(r'в\s+\d{1,2}(?:[:.:]?\d{2})?\s*(?:час[оа]в?|час|ч)?\s*', '', description)
+    description = ' '.join(word for word in description.split() if word)
+    description = description.rstrip('.')
+    response_parts = ["✅ Создаю новую задачу:", f"\n📝 Описание: {description.capitalize()}"]
+    if task_date:
+        date_format = '%d.%m.%Y в %H:%M' if task_date.hour != 0 or task_date.minute != 0 else '%d.%m.%Y'
+        response_parts.append(f"\n📅 {'Дата и время' if 'в' in date_format else 'Дата'}: {task_date.strftime(date_format)}")
+    response_parts.extend([f"\n⚡ Приоритет: {priority.capitalize()}", "\n✨ Задача успешно создана и добавлена в систему."])
+    return ''.join(response_parts)
+
+
+def legacy_numeric_entities(text: str) -> dict:
+    entities = {}
+    for pattern, entity_name in [
+        (r'(\d+)\s*(рубл[яейь]|руб)', 'amount'), (r'(\d+)\s*(час[ао]в|час)', 'duration_hours'),
+        (r'(\d+)\s*(минут[аы]?|мин)', 'duration_minutes'), (r'(\d+)\s*(шт[а-я]*|единиц[а-я]*)', 'quantity')
+    ]:
+        match = re.search(pattern, text)
+        if match:
+            entities[entity_name] = int(match.group(1))
+    return entities
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    for text in GOLDEN_CORPUS:
+        assert format_task_creation(text) == legacy_format_task_creation(text), text
+        assert extract_numeric(text) == legacy_numeric_entities(text), text
+
+    # Без логирования, чтобы сравнивать только разбор
+    results = {
+        'legacy': measure(lambda: [legacy_format_task_creation(t) for t in GOLDEN_CORPUS],
+                          iterations=args.iterations),
+        'precompiled': measure(lambda: [format_task_creation(t) for t in GOLDEN_CORPUS],
+                               iterations=args.iterations),
+    }
+    results['speedup'] = round(results['legacy']['mean_us'] / results['precompiled']['mean_us'], 2)
+    report('task_normalizer', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
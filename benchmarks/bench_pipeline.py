@@ -0,0 +1,88 @@
+"""Пропускная способность и хвост задержек конвейера NLP и команд на корпусе фраз.
+
+Замеряются DialogContext.analyze_text, format_task_creation и
+process_command отдельно для чистых, зашумленных и длинных фраз
+(benchmarks/corpus.py). Кроме задержек в отчет входит доля распознанных
+команд по видам фраз: ускорение, которое ломает распознавание, видно сразу.
+
+Запуск: python -m benchmarks.bench_pipeline [--iterations 5000] [--intent-backend classifier] [--output pipeline.json]
+"""
+import argparse
+import itertools
+import logging
+from collections import Counter
+
+from benchmarks.common import measure, report
+from benchmarks.corpus import KINDS, build_corpus, task_descriptions
+from utils.command_processor import format_task_creation, process_command
+from utils.nlp import COMMAND_PATTERNS, DialogContext
+
+
+def recognition(corpus) -> dict:
+    """Доля фраз с распознанной командой и доля верных среди типов сервера"""
+    context = DialogContext()
+    recognized = correct = known = 0
+    intents = Counter()
+    for utterance in corpus:
+        command_type, _ = context.analyze_text(utterance.text, verbose=False)
+        intents[command_type] += 1
+        recognized += command_type != 'unknown'
+        if utterance.intent in COMMAND_PATTERNS:
+            known += 1
+            correct += command_type == utterance.intent
+    return {
+        'utterances': len(corpus),
+        'recognized_share': round(recognized / len(corpus), 3),
+        'server_intent_accuracy': round(correct / known, 3) if known else None,
+        'command_types': dict(intents.most_common()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--intent-backend', choices=('matcher', 'classifier'), default='matcher')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    if args.intent_backend == 'classifier':
+        from utils.classifier import IntentClassifier
+        DialogContext.classifier = IntentClassifier.train(COMMAND_PATTERNS)
+
+    corpus = build_corpus(seed=args.seed)
+    results = {
+        'intent_backend': args.intent_backend,
+        'corpus': {
+            'utterances': len(corpus),
+            'intents': len({utterance.intent for utterance in corpus}),
+            'by_kind': dict(Counter(utterance.kind for utterance in corpus)),
+        },
+    }
+
+    for kind in KINDS:
+        texts = [utterance.text for utterance in corpus if utterance.kind == kind]
+        context = DialogContext()
+        cycle = itertools.cycle(texts)
+        # Результаты разбора для process_command считаются заранее
+        analyzed = itertools.cycle([context.analyze_text(text, verbose=False) for text in texts])
+        results[kind] = {
+            'analyze_text': measure(lambda: context.analyze_text(next(cycle), verbose=False), args.iterations),
+            'process_command': measure(lambda: process_command(*next(analyzed)), args.iterations),
+            'recognition': recognition([utterance for utterance in corpus if utterance.kind == kind]),
+        }
+
+    descriptions = itertools.cycle(task_descriptions(seed=args.seed))
+    results['format_task_creation'] = measure(lambda: format_task_creation(next(descriptions)), args.iterations)
+
+    # Конвейер целиком: разбор и ответ на каждую фразу корпуса
+    context = DialogContext()
+    everything = itertools.cycle([utterance.text for utterance in corpus])
+    results['analyze_and_process'] = measure(
+        lambda: process_command(*context.analyze_text(next(everything), verbose=False)), args.iterations)
+
+    report('nlp_pipeline', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
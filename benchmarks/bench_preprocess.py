@@ -0,0 +1,73 @@
+"""Стоимость и выигрыш предобработки WAV перед распознаванием.
+
+Синтетическая запись: тишина с шумом, "речь" (сумма тонов с огибающей)
+и снова тишина, в формате браузера (48 кГц, стерео, 16 бит). Для каждой
+длительности замеряется preprocess_audio и доля секунд и байт, которые
+остаются для движка распознавания.
+
+Запуск: python -m benchmarks.bench_preprocess [--iterations 50]
+"""
+import argparse
+import io
+import wave
+
+import numpy as np
+
+from benchmarks.common import measure, report
+from utils.audio import AudioUpload
+from utils.preprocessing import preprocess_audio
+
+RATE = 48000
+# (тишина в начале, речь, тишина в конце), секунды
+CLIPS = {
+    'short_3s': (1.0, 1.5, 0.5),
+    'typical_8s': (1.5, 5.0, 1.5),
+    'long_30s': (2.0, 25.0, 3.0),
+}
+
+
+def synth_wav(lead: float, speech: float, tail: float, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    total = int((lead + speech + tail) * RATE)
+    signal = rng.normal(0, 0.002, total)
+    start, count = int(lead * RATE), int(speech * RATE)
+    t = np.arange(count) / RATE
+    # Слоги по 4 в секунду: тоны с амплитудной модуляцией
+    voice = (np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 720 * t)) * np.abs(np.sin(np.pi * 4 * t))
+    signal[start:start + count] += 0.25 * voice
+    stereo = np.repeat(signal[:, None], 2, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes((np.clip(stereo, -1, 1) * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    results = {}
+    for name, clip in CLIPS.items():
+        data = synth_wav(*clip)
+        result = preprocess_audio(AudioUpload.from_bytes(data, 'audio.wav'))
+        stats = measure(lambda: preprocess_audio(AudioUpload.from_bytes(data, 'audio.wav')),
+                        args.iterations, warmup=3)
+        stats.update({
+            'seconds_before': round(result.seconds_before, 2),
+            'seconds_after': round(result.seconds_after, 2),
+            'bytes_before': result.bytes_before,
+            'bytes_after': result.bytes_after,
+            'bytes_saved_ratio': round(1 - result.bytes_after / result.bytes_before, 3),
+        })
+        results[name] = stats
+
+    report('preprocess', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
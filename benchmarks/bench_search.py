@@ -0,0 +1,148 @@
+"""Поиск по задачам и бизнес-сущностям: FTS5-индекс против сканирования LIKE.
+
+Обе базы заполняются одинаковыми строками; в индексированной базе триггеры
+поддерживают FTS-таблицы при вставке, поэтому отдельно измеряется скорость
+заполнения. Запросы - словоформы, отличающиеся от сохраненных ("отчетов",
+"клиентом"); оба варианта ищут по основам слов, поэтому находят одно и то же.
+
+Запуск: python -m benchmarks.bench_search [--rows 200000] [--iterations 200]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, text
+
+from benchmarks.common import measure, report
+from models import BusinessEntity, Task, db
+from utils.search import SearchIndex, query_terms
+from utils.storage import _apply_sqlite_pragmas, engine_options
+
+WORDS = (
+    'отчет', 'договор', 'клиент', 'поставщик', 'встреча', 'презентация', 'бюджет',
+    'счет', 'платеж', 'проект', 'звонок', 'рассылка', 'аудит', 'склад', 'доставка',
+    'продажи', 'сотрудник', 'собеседование', 'кампания', 'качество',
+)
+ENDINGS = ('', 'а', 'у', 'ом', 'ов', 'ы', 'ам', 'ами')
+SYLLABLES = ('ка', 'ро', 'ми', 'ту', 'ле', 'на', 'зо', 'вы', 'пе', 'ду', 'ги', 'со', 'бра', 'сти', 'мон')
+# Доля слов предметной области; остальные - случайный словарь, поэтому
+# запросы избирательны, как в реальной базе
+DOMAIN_SHARE = 0.01
+
+QUERIES = (
+    'отчетов по продажам',
+    'договора с поставщиком',
+    'встречу с клиентом',
+    'бюджет кампании',
+    'собеседования',
+    'доставки на склад',
+)
+
+
+def make_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    return engine
+
+
+def word(rng: random.Random) -> str:
+    if rng.random() < DOMAIN_SHARE:
+        return rng.choice(WORDS) + rng.choice(ENDINGS)
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def phrase(rng: random.Random, length: int) -> str:
+    return ' '.join(word(rng) for _ in range(length))
+
+
+def seed(engine, rows: int) -> float:
+    tables = [Task.__table__, BusinessEntity.__table__]
+    db.metadata.create_all(engine, tables=tables)
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    chunk = 20000
+    started = time.perf_counter()
+    for offset in range(0, rows, chunk):
+        count = min(rows, offset + chunk) - offset
+        tasks = [{
+            'title': phrase(rng, 3),
+            'description': phrase(rng, 12),
+            'status': 'pending',
+            'created_at': start + timedelta(seconds=offset + i),
+        } for i in range(count)]
+        entities = [{
+            'name': f'ООО {phrase(rng, 1).capitalize()} {offset + i}',
+            'entity_type': 'client',
+            'description': phrase(rng, 8),
+            'contact_info': f'+7 900 {offset + i:07d}',
+            'status': 'active',
+            'created_at': start + timedelta(seconds=offset + i),
+        } for i in range(count // 4)]
+        with engine.begin() as conn:
+            conn.execute(Task.__table__.insert(), tasks)
+            conn.execute(BusinessEntity.__table__.insert(), entities)
+    return time.perf_counter() - started
+
+
+def like_search(engine, query: str, limit: int = 10) -> list:
+    """Прежний подход: подстрока каждой основы в любом текстовом столбце"""
+    hits = []
+    terms = query_terms(query)
+    with engine.connect() as conn:
+        for table, columns in (('tasks', ('title', 'description')),
+                               ('business_entities', ('name', 'description', 'contact_info'))):
+            conditions = ' AND '.join(
+                '(' + ' OR '.join(f'{column} LIKE :term{i}' for column in columns) + ')'
+                for i in range(len(terms))
+            )
+            params = {f'term{i}': f'%{term}%' for i, term in enumerate(terms)}
+            hits.extend(conn.execute(text(
+                f'SELECT id FROM {table} WHERE {conditions} ORDER BY created_at DESC LIMIT {limit}'
+            ), params).fetchall())
+    return hits[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = make_engine(f"sqlite:///{os.path.join(tmp, 'plain.db')}")
+        indexed = make_engine(f"sqlite:///{os.path.join(tmp, 'fts.db')}")
+
+        plain_seconds = seed(plain, args.rows)
+        # Триггеры создаются до заполнения, чтобы учесть их стоимость
+        db.metadata.create_all(indexed, tables=[Task.__table__, BusinessEntity.__table__])
+        index = SearchIndex()
+        index.engine_getter = lambda: indexed
+        index.fts_enabled = SearchIndex.ensure_schema(indexed)
+        fts_seconds = seed(indexed, args.rows)
+
+        results['seed_rows_per_sec'] = {
+            'plain': round(args.rows / plain_seconds, 1),
+            'fts': round(args.rows / fts_seconds, 1),
+        }
+        for query in QUERIES:
+            results[query] = {
+                'like': measure(lambda: like_search(plain, query), args.iterations, warmup=5),
+                'fts': measure(lambda: index.search(query), args.iterations, warmup=5),
+                'like_hits': len(like_search(plain, query)),
+                'fts_hits': len(index.search(query)),
+            }
+        plain.dispose()
+        indexed.dispose()
+
+    report('search', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Холодный старт: импорт, create_app, прогрев и время до первого ответа.
+
+Каждый запуск - новый процесс Python на уже созданной базе, как новый
+воркер при масштабировании. time_to_first_response_ms считается от
+запуска процесса до готового ответа на первую команду. Первая команда -
+поиск: без прогрева она платит за импорт стеммера nltk. Значения -
+медианы по --runs запускам.
+
+Запуск: python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, logging, time
+started = time.perf_counter()
+import app as application
+imported = time.perf_counter()
+app = application.create_app()
+created = time.perf_counter()
+logging.disable(logging.CRITICAL)
+client = app.test_client()
+timings = {}
+for name, text in (('first_request', 'найди клиента ромашка'),
+                   ('second_request', 'создать задачу подготовить отчет завтра в 10 утра'),
+                   ('third_request', 'статус проекта разработка сайта')):
+    t0 = time.perf_counter()
+    client.post('/process_text', json={'text': text})
+    timings[name + '_ms'] = (time.perf_counter() - t0) * 1000
+    if name == 'first_request':
+        first_response = time.time()
+app.write_behind.close()
+print(json.dumps(dict(timings, import_ms=(imported - started) * 1000, create_app_ms=(created - imported) * 1000,
+                      first_response_at=first_response)))
+'''
+
+SCENARIOS = {
+    'no_warm_up': {'WARM_UP': '0'},
+    'warm_up': {'WARM_UP': '1'},
+    'warm_up_skip_schema': {'WARM_UP': '1', 'DB_CREATE_SCHEMA': '0'},
+    'classifier_no_warm_up': {'WARM_UP': '0', 'INTENT_BACKEND': 'classifier'},
+    'classifier_warm_up': {'WARM_UP': '1', 'INTENT_BACKEND': 'classifier'},
+}
+
+
+def run_once(env: dict) -> dict:
+    started = time.time()
+    completed = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['time_to_first_response_ms'] = (result.pop('first_response_at') - started) * 1000
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = dict(os.environ, STT_BACKEND='stub', LOG_LEVEL='WARNING',
+                    DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+                    INTENT_MODEL_PATH=os.path.join(tmp, 'intent_classifier'))
+        # Первый запуск создает базу и модель; дальше замеряется уже готовое окружение
+        run_once(dict(base, INTENT_BACKEND='classifier'))
+
+        results = {}
+        for name, overrides in SCENARIOS.items():
+            runs = [run_once(dict(base, **overrides)) for _ in range(args.runs)]
+            results[name] = {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+
+    report('startup', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
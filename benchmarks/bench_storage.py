@@ -0,0 +1,154 @@
+"""Параллельные чтение и запись в таблицу задач: настройки по умолчанию против профиля хранилища.
+
+Профиль "default" - как было раньше: журнал по умолчанию, без индексов,
+без пула соединений. Профиль "tuned" - WAL, PRAGMA и составные индексы из
+models.py, пул QueuePool. Для PostgreSQL передайте --url (используется
+только профиль tuned).
+
+Запуск: python -m benchmarks.bench_storage [--rows 1000000] [--seconds 10]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.pool import NullPool
+
+from benchmarks.common import percentile, report
+from models import Task, db
+from utils.storage import _apply_sqlite_pragmas, engine_options
+
+STATUSES = ('pending', 'in_progress', 'done', 'cancelled')
+CATEGORIES = ('task', 'marketing', 'finance', 'project', 'client')
+
+
+def make_engine(url: str, tuned: bool):
+    if not tuned:
+        return create_engine(url, poolclass=NullPool)
+    engine = create_engine(url, **engine_options(url))
+    if url.startswith('sqlite'):
+        event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    return engine
+
+
+def seed(engine, rows: int, tuned: bool) -> None:
+    table = Task.__table__
+    if tuned:
+        db.metadata.create_all(engine, tables=[table])
+    else:
+        # Та же таблица без индексов
+        indexes = set(table.indexes)
+        table.indexes.clear()
+        try:
+            db.metadata.create_all(engine, tables=[table])
+        finally:
+            table.indexes.update(indexes)
+
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    chunk = 50000
+    for offset in range(0, rows, chunk):
+        batch = [{
+            'title': f'задача {i}',
+            'description': 'описание задачи',
+            'status': rng.choice(STATUSES),
+            'category': rng.choice(CATEGORIES),
+            'priority': 'normal',
+            'created_at': start + timedelta(seconds=i),
+        } for i in range(offset, min(rows, offset + chunk))]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+
+
+def run_load(engine, seconds: float, readers: int, writers: int) -> dict:
+    table = Task.__table__
+    stop = time.monotonic() + seconds
+    read_latencies, write_latencies, errors = [], [], []
+    lock = threading.Lock()
+
+    def reader():
+        rng = random.Random()
+        local = []
+        while time.monotonic() < stop:
+            query = (select(table.c.id, table.c.title, table.c.created_at)
+                     .where(table.c.status == rng.choice(STATUSES))
+                     .order_by(table.c.created_at.desc()).limit(50))
+            t0 = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(query).fetchall()
+            local.append(time.perf_counter() - t0)
+        with lock:
+            read_latencies.extend(local)
+
+    def writer():
+        local = []
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(table.insert(), [{
+                        'title': 'новая задача', 'status': 'pending', 'category': 'task',
+                        'priority': 'normal', 'created_at': datetime.utcnow()
+                    } for _ in range(10)])
+                local.append(time.perf_counter() - t0)
+            except Exception as e:
+                errors.append(str(e))
+        with lock:
+            write_latencies.extend(local)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    read_latencies.sort()
+    write_latencies.sort()
+    return {
+        'reads_per_sec': round(len(read_latencies) / seconds, 1),
+        'read_p99_ms': round(percentile(read_latencies, 99) * 1000, 2),
+        'write_tx_per_sec': round(len(write_latencies) / seconds, 1),
+        'write_p99_ms': round(percentile(write_latencies, 99) * 1000, 2),
+        'write_errors': len(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--url', help='готовая база, например postgresql://...')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = [('tuned', args.url, True)] if args.url else [
+            ('default', f"sqlite:///{os.path.join(tmp, 'default.db')}", False),
+            ('tuned', f"sqlite:///{os.path.join(tmp, 'tuned.db')}", True),
+        ]
+        for name, url, tuned in profiles:
+            engine = make_engine(url, tuned)
+            started = time.perf_counter()
+            seed(engine, args.rows, tuned)
+            seeded = time.perf_counter() - started
+            results[name] = run_load(engine, args.seconds, args.readers, args.writers)
+            results[name]['seed_rows_per_sec'] = round(args.rows / seeded, 1)
+            with engine.connect() as conn:
+                results[name]['rows'] = conn.execute(text('SELECT COUNT(*) FROM tasks')).scalar()
+            engine.dispose()
+
+    report('storage_profile', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
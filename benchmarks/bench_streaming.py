@@ -0,0 +1,168 @@
+"""Время до ответа после остановки записи: загрузка целиком против потоковой.
+
+Фразы корпуса воспроизводятся как записи с микрофона: "аудио" - это текст
+фразы, дополненный пробелами до размера WebM/Opus (BYTES_PER_SECOND) при
+темпе речи WORDS_PER_SECOND. Фрагменты появляются каждые TIMESLICE_MS,
+отправка ограничена полосой --bandwidth-kbps. Распознавание имитирует
+заглушка, задержка которой растет с длительностью аудио (--stt-base и
+--stt-rtf), как у внешнего сервиса.
+
+Режимы:
+* one_shot - запись отправляется в /process_audio после остановки;
+* streaming - фрагменты загружаются во время речи, /finish после остановки;
+* streaming_segments - то же, плюс сегмент закрывается на паузе после
+  каждых --segment-words слов и распознается, пока речь продолжается.
+
+Все интервалы сжимаются в --time-scale раз, результаты пересчитываются
+обратно в реальное время.
+
+Запуск: python -m benchmarks.bench_streaming [--utterances 20] [--time-scale 0.25]
+"""
+import argparse
+import io
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.common import percentile, report
+from benchmarks.corpus import build_corpus
+from utils.stt import StubBackend
+
+WORDS_PER_SECOND = 2.5
+BYTES_PER_SECOND = 4000  # Opus около 32 кбит/с
+TIMESLICE_MS = 250
+
+
+class PacedStub(StubBackend):
+    """Заглушка, время ответа которой пропорционально длительности аудио"""
+
+    def __init__(self, base: float, rtf: float):
+        super().__init__()
+        self.base = base
+        self.rtf = rtf
+
+    def transcribe(self, upload, timeout=None) -> str:
+        upload.stream.seek(0, io.SEEK_END)
+        seconds = upload.stream.tell() / BYTES_PER_SECOND
+        time.sleep(self.base + self.rtf * seconds)
+        return super().transcribe(upload)
+
+
+def record(text: str, segment_words: int) -> List[Tuple[bytes, bool]]:
+    """Фрагменты записи фразы: (байты, закрывает ли фрагмент сегмент)"""
+    words = text.split()
+    step = segment_words or len(words)
+    chunk_size = BYTES_PER_SECOND * TIMESLICE_MS // 1000
+    chunks = []
+    for start in range(0, len(words), step):
+        part = ' '.join(words[start:start + step]) + ' '
+        audio = part.encode().ljust(int(len(words[start:start + step]) / WORDS_PER_SECOND * BYTES_PER_SECOND))
+        pieces = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+        chunks.extend((piece, False) for piece in pieces)
+        if segment_words:
+            # Клиент перезапускает запись после паузы и закрывает сегмент пустым фрагментом
+            chunks.append((b'', True))
+    return chunks
+
+
+def one_shot(client, chunks, scale: float, bandwidth: float) -> float:
+    audio = b''.join(data for data, _ in chunks)
+    time.sleep(len(chunks) * TIMESLICE_MS / 1000 * scale)
+    stopped = time.perf_counter()
+    time.sleep(len(audio) / bandwidth * scale)
+    response = client.post('/process_audio', data={'audio': (io.BytesIO(audio), 'audio.webm')})
+    assert response.status_code == 200, response.get_json()
+    return time.perf_counter() - stopped
+
+
+def streaming(client, chunks, scale: float, bandwidth: float) -> float:
+    stream = client.post('/process_audio/stream', json={}).get_json()
+    outbox: 'queue.Queue' = queue.Queue()
+
+    def sender():
+        # Как цепочка fetch в voice.js: фрагменты уходят по одному и по порядку
+        index = 0
+        while True:
+            item = outbox.get()
+            if item is None:
+                break
+            data, segment_end = item
+            time.sleep(len(data) / bandwidth * scale)
+            suffix = '&segment_end=1' if segment_end else ''
+            response = client.post(f"{stream['chunk_url']}?index={index}{suffix}", data=data)
+            assert response.status_code == 200, response.get_json()
+            index += 1
+
+    thread = threading.Thread(target=sender)
+    thread.start()
+    for data, segment_end in chunks:
+        if not segment_end:
+            time.sleep(TIMESLICE_MS / 1000 * scale)
+        outbox.put((data, segment_end))
+    stopped = time.perf_counter()
+    outbox.put(None)
+    thread.join()
+    response = client.post(stream['finish_url'])
+    assert response.status_code == 200, response.get_json()
+    return time.perf_counter() - stopped
+
+
+def summarize(samples: List[float], scale: float) -> Dict:
+    samples = sorted(sample / scale for sample in samples)
+    return {
+        'count': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 1),
+        'p50_ms': round(percentile(samples, 50) * 1000, 1),
+        'p95_ms': round(percentile(samples, 95) * 1000, 1),
+        'max_ms': round(samples[-1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--utterances', type=int, default=20)
+    parser.add_argument('--time-scale', type=float, default=0.25, help='сжатие времени при воспроизведении')
+    parser.add_argument('--bandwidth-kbps', type=float, default=256.0, help='полоса отправки клиента')
+    parser.add_argument('--stt-base', type=float, default=0.3, help='постоянная часть задержки STT, секунды')
+    parser.add_argument('--stt-rtf', type=float, default=0.15, help='секунды распознавания на секунду аудио')
+    parser.add_argument('--segment-words', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    scale = args.time_scale
+    bandwidth = args.bandwidth_kbps * 1000 / 8
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'streaming.db')}"
+        os.environ['STT_BACKEND'] = 'stub'
+        from app import create_app
+
+        app = create_app()
+        app.stt = PacedStub(args.stt_base * scale, args.stt_rtf * scale)
+        logging.disable(logging.CRITICAL)
+        client = app.test_client()
+        texts = [u.text for u in build_corpus(seed=args.seed, kinds=['long'])[:args.utterances]]
+
+        modes = {
+            'one_shot': lambda text: one_shot(client, record(text, 0), scale, bandwidth),
+            'streaming': lambda text: streaming(client, record(text, 0), scale, bandwidth),
+            'streaming_segments': lambda text: streaming(client, record(text, args.segment_words), scale, bandwidth),
+        }
+        results = {}
+        for name, run in modes.items():
+            # Свое пространство ключей кэша: каждый режим распознает фразы заново
+            app.stt.model = name
+            results[name] = summarize([run(text) for text in texts], scale)
+        words = [len(text.split()) for text in texts]
+        results['utterance_seconds_mean'] = round(sum(words) / len(words) / WORDS_PER_SECOND, 2)
+        app.write_behind.close()
+
+    report('streaming', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
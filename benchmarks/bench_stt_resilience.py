@@ -0,0 +1,165 @@
+"""Хвост задержек распознавания: прямой вызов Whisper против ResilientBackend.
+
+Локальный поддельный сервер реализует POST /v1/audio/transcriptions и
+подключается к настоящему клиенту openai через base_url (как
+OPENAI_BASE_URL). Сервер отвечает за --latency-ms с разбросом, в доле
+--slow-share запросов зависает на --slow-ms, в доле --error-share
+отвечает 500. Клиенты в --concurrency потоков отправляют запись длиной
+--audio-seconds.
+
+Режимы:
+* direct - WhisperAPIBackend с настройками клиента по умолчанию
+  (2 встроенных повтора, длинный тайм-аут), как до ResilientBackend;
+* resilient - срок по длительности аудио, срок попытки по p95 и повторы с jitter;
+* hedged - то же плюс дублирующая попытка после p95 задержек.
+
+Фаза outage: сервер отвечает 500 на все запросы; с предохранителем
+запросы после его срабатывания сразу уходят в резервный движок.
+
+Запуск: python -m benchmarks.bench_stt_resilience [--requests 400] [--concurrency 8]
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from benchmarks.common import percentile, report
+from utils.audio import AudioUpload
+from utils.resilience import CircuitBreaker
+from utils.stt import COMPRESSED_BYTES_PER_SECOND, ResilientBackend, StubBackend, WhisperAPIBackend
+
+
+class FakeWhisper(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, args):
+        super().__init__(('127.0.0.1', 0), FakeWhisperHandler)
+        self.args = args
+        self.outage = False
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        with self.lock:
+            return self.rng.random(), self.rng.random(), self.rng.lognormvariate(0, 0.25)
+
+
+class FakeWhisperHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        args = self.server.args
+        error, slow, jitter = self.server.draw()
+        if self.server.outage or error < args.error_share:
+            time.sleep(args.latency_ms / 1000 * jitter / 4)
+            self.reply(500, {'error': {'message': 'injected failure', 'type': 'server_error'}})
+            return
+        time.sleep((args.slow_ms if slow < args.slow_share else args.latency_ms * jitter) / 1000)
+        self.reply(200, {'text': 'терра привет'})
+
+    def reply(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент уже отказался от попытки по сроку
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def run(backend, audio: bytes, requests: int, concurrency: int) -> Dict:
+    def one(_) -> tuple:
+        started = time.perf_counter()
+        try:
+            backend.transcribe(AudioUpload.from_bytes(audio, 'audio.webm'))
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    latencies = sorted(latency for latency, _ in samples)
+    return {
+        'requests': requests,
+        'error_share': round(sum(not ok for _, ok in samples) / requests, 4),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--audio-seconds', type=float, default=3.0)
+    parser.add_argument('--latency-ms', type=float, default=120.0, help='типичное время ответа сервера')
+    parser.add_argument('--slow-ms', type=float, default=3000.0, help='время зависшего ответа')
+    parser.add_argument('--slow-share', type=float, default=0.03)
+    parser.add_argument('--error-share', type=float, default=0.03)
+    parser.add_argument('--outage-requests', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    server = FakeWhisper(args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    audio = b'\0' * int(args.audio_seconds * COMPRESSED_BYTES_PER_SECOND)
+
+    def direct():
+        return WhisperAPIBackend(api_key='test', base_url=base_url)
+
+    def resilient(hedge: bool, fallback=None):
+        return ResilientBackend(
+            WhisperAPIBackend(api_key='test', base_url=base_url, max_retries=0),
+            fallback=fallback, timeout_base=0.5, timeout_per_second=0.2, retries=2, backoff=0.05,
+            hedge=hedge, breaker=CircuitBreaker(window=20, cooldown=5.0)
+        )
+
+    modes: Dict[str, Callable] = {
+        'direct': direct,
+        'resilient': lambda: resilient(False),
+        'hedged': lambda: resilient(True),
+    }
+    results: Dict = {}
+    for name, factory in modes.items():
+        backend = factory()
+        # Разогрев: соединения клиента и окно задержек для p95
+        run(backend, audio, 40, args.concurrency)
+        results[name] = run(backend, audio, args.requests, args.concurrency)
+        if name != 'direct':
+            results[name]['p95_deadline_pct'] = backend.stats()['p95_deadline_pct']
+
+    server.outage = True
+    results['outage_direct'] = run(direct(), audio, args.outage_requests, args.concurrency)
+    backend = resilient(True, fallback=StubBackend(default_text='терра привет'))
+    results['outage_resilient_fallback'] = run(backend, audio, args.outage_requests, args.concurrency)
+    results['outage_resilient_fallback']['breaker_trips'] = backend.breaker.stats()['trips']
+    server.outage = False
+    server.shutdown()
+
+    results['p99_improvement'] = {
+        name: round(results['direct']['p99_ms'] / results[name]['p99_ms'], 2)
+        for name in ('resilient', 'hedged') if results[name]['p99_ms']
+    }
+    report('stt_resilience', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
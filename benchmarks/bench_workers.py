@@ -0,0 +1,125 @@
+"""Пропускная способность под gunicorn в зависимости от числа воркеров.
+
+Для каждого значения --workers запускается gunicorn -c gunicorn.conf.py
+wsgi:app (контекст диалогов в общем SQLite-файле, SESSION_STORE=sqlite),
+и клиенты в отдельных процессах (чтобы GIL клиента не ограничивал
+нагрузку) в течение --duration секунд отправляют фразы корпуса в
+/process_text. Сессии клиентов чередуются, поэтому соседние запросы одной
+сессии попадают на разные воркеры. scaling - отношение к одному воркеру;
+при линейном масштабировании оно равно числу воркеров, пока их не больше
+числа ядер (cpu_count в отчете).
+
+Запуск: python -m benchmarks.bench_workers [--workers 1 2 4] [--clients 16] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.common import percentile, report
+from benchmarks.corpus import build_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_workers(log_path: str, workers: int, timeout: float = 120.0) -> None:
+    """Ждет, пока все воркеры создадут и прогреют приложение (post_worker_init)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(log_path, encoding='utf-8', errors='replace') as fh:
+            if fh.read().count('Worker ready') >= workers:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'gunicorn workers did not start, see {log_path}')
+
+
+def client(args) -> Dict:
+    port, texts, sessions, client_index, started_at, duration = args
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    latencies: List[float] = []
+    errors = 0
+    while time.time() < started_at:
+        time.sleep(0.001)
+    deadline = started_at + duration
+    index = client_index
+    while time.time() < deadline:
+        body = json.dumps({'text': texts[index % len(texts)]})
+        headers = {'Content-Type': 'application/json', 'X-Session-Id': f'bench-{index % sessions}'}
+        t0 = time.perf_counter()
+        conn.request('POST', '/process_text', body, headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - t0)
+        errors += response.status != 200
+        index += 1
+    conn.close()
+    return {'latencies': latencies, 'errors': errors}
+
+
+def run(workers: int, args, texts: List[str], tmp: str) -> Dict:
+    port = args.port
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(args.threads), PORT=str(port),
+               STT_BACKEND='stub', LOG_LEVEL='WARNING', METRICS_ENABLED='1',
+               DATABASE_URL=f"sqlite:///{os.path.join(tmp, f'workers{workers}.db')}",
+               SESSION_STORE=args.session_store,
+               SESSION_STORE_PATH=os.path.join(tmp, f'sessions{workers}.db'),
+               STREAM_STORE_PATH=os.path.join(tmp, f'streams{workers}.db'),
+               TRANSCRIPTION_CACHE_PATH=os.path.join(tmp, f'transcriptions{workers}.db'))
+    log_path = os.path.join(tmp, f'gunicorn{workers}.log')
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                  cwd=ROOT, env=env, stdout=log, stderr=log)
+    try:
+        wait_for_workers(log_path, workers)
+        started_at = time.time() + 1.0
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, [(port, texts, args.sessions, i, started_at, args.duration)
+                                        for i in range(args.clients)])
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    latencies = sorted(sample for result in results for sample in result['latencies'])
+    return {
+        'requests': len(latencies),
+        'errors': sum(result['errors'] for result in results),
+        'requests_per_sec': round(len(latencies) / args.duration, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--session-store', default='sqlite', choices=['sqlite', 'memory'])
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    texts = [utterance.text for utterance in build_corpus()]
+    results: Dict = {'cpu_count': os.cpu_count()}
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            results[f'workers_{workers}'] = run(workers, args, texts, tmp)
+    base = results[f'workers_{args.workers[0]}']['requests_per_sec'] or 1
+    for workers in args.workers:
+        results[f'workers_{workers}']['scaling'] = round(results[f'workers_{workers}']['requests_per_sec'] / base, 2)
+
+    report('workers', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Скорость записи команд: фиксация на каждый запрос против пакетной записи.
+
+Оба режима пишут в отдельный временный SQLite-файл.
+
+Запуск: python -m benchmarks.bench_write_behind [--rows 5000]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Tuple
+
+from flask import Flask
+
+from benchmarks.common import report
+from models import Command, db
+from utils.persistence import WriteBehindQueue
+
+
+def make_app(path: str) -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def row(i: int) -> dict:
+    return {
+        'text': f'терра создать задачу номер {i}',
+        'command_type': 'task_creation',
+        'status': 'processed',
+        'result': 'Задача успешно создана',
+        'created_at': datetime.utcnow(),
+    }
+
+
+def naive(app: Flask, rows: int) -> float:
+    with app.app_context():
+        started = time.perf_counter()
+        for i in range(rows):
+            db.session.add(Command(**row(i)))
+            db.session.commit()
+        return time.perf_counter() - started
+
+
+def write_behind(app: Flask, rows: int, batch_size: int) -> Tuple[float, float]:
+    queue = WriteBehindQueue(lambda: db.get_engine(app), batch_size=batch_size, flush_interval=0.05,
+                             max_queue=rows + 1)
+    started = time.perf_counter()
+    for i in range(rows):
+        queue.enqueue(Command.__table__, **row(i))
+    enqueue_elapsed = time.perf_counter() - started
+    queue.close(timeout=None)
+    assert queue.written == rows, queue.stats()
+    return enqueue_elapsed, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed = naive(make_app(os.path.join(tmp, 'naive.db')), args.rows)
+        results['per_request_commit'] = {'rows_per_sec': round(args.rows / elapsed, 1)}
+
+        enqueue_elapsed, elapsed = write_behind(make_app(os.path.join(tmp, 'wb.db')), args.rows, args.batch_size)
+        results['write_behind'] = {
+            'rows_per_sec': round(args.rows / elapsed, 1),
+            'enqueue_us_per_row': round(enqueue_elapsed / args.rows * 1e6, 2),
+            'batch_size': args.batch_size,
+        }
+    report('write_behind', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
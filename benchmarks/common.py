@@ -0,0 +1,46 @@
+import json
+import statistics
+import time
+from typing import Callable, Dict, List, Optional
+
+
+def measure(func: Callable[[], object], iterations: int = 1000, warmup: int = 50) -> Dict:
+    """Runs func repeatedly and returns latency statistics in microseconds"""
+    for _ in range(warmup):
+        func()
+
+    samples: List[float] = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': round(statistics.fmean(samples), 2),
+        'p50_us': round(percentile(samples, 50), 2),
+        'p95_us': round(percentile(samples, 95), 2),
+        'p99_us': round(percentile(samples, 99), 2),
+        'ops_per_sec': round(iterations / elapsed, 1),
+    }
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def report(name: str, results: Dict, output: Optional[str] = None) -> None:
+    """Prints results as JSON and optionally writes them to a file"""
+    payload = {'benchmark': name, 'results': results}
+    text = json.dumps(payload, ensure_ascii=False, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as fh:
+            fh.write(text)
@@ -0,0 +1,57 @@
+"""Сравнение двух JSON-отчетов бенчмарков (до и после изменения).
+
+Сравниваются все задержки (*_us, *_ms) и пропускная способность
+(ops_per_sec, requests_per_sec) с одинаковым путем в обоих отчетах.
+Код возврата 1, если что-то ухудшилось сильнее порога.
+
+Запуск: python -m benchmarks.compare before.json after.json [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+THROUGHPUT_KEYS = ('ops_per_sec', 'requests_per_sec')
+LATENCY_SUFFIXES = ('_us', '_ms')
+
+
+def flatten(node, path: str = '') -> Iterator[Tuple[str, float]]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from flatten(value, f'{path}.{key}' if path else key)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield path, float(node)
+
+
+def metrics(path: str) -> Dict[str, float]:
+    with open(path, encoding='utf-8') as fh:
+        payload = json.load(fh)
+    return {key: value for key, value in flatten(payload.get('results', payload))
+            if key.endswith(LATENCY_SUFFIXES) or key.rsplit('.', 1)[-1] in THROUGHPUT_KEYS}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.1, help='допустимое ухудшение, доля')
+    args = parser.parse_args()
+
+    before, after = metrics(args.before), metrics(args.after)
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if old == 0:
+            continue
+        change = (new - old) / old
+        # Для пропускной способности хуже - меньше, для задержек - больше
+        worse = -change if key.rsplit('.', 1)[-1] in THROUGHPUT_KEYS else change
+        mark = 'REGRESSION' if worse > args.threshold else ('improved' if worse < -args.threshold else '')
+        regressions += mark == 'REGRESSION'
+        print(f'{key:70} {old:>12.2f} {new:>12.2f} {change:>+8.1%} {mark}')
+    print(f'{regressions} regression(s) above {args.threshold:.0%}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
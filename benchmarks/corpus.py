@@ -0,0 +1,141 @@
+"""Корпус русских фраз для бенчмарков конвейера NLP и команд.
+
+Фразы строятся из обеих таблиц реестра команд (utils.commands): фраз
+сервера и фраз клиента из каталога, поэтому в корпус попадает каждый тип
+команды. Для каждой фразы есть четыре вида:
+command - короткое обращение, которое проходит порог уверенности
+распознавания (фраза команды занимает больше RECOGNITION_THRESHOLD текста;
+только для фраз сервера, клиентские команды сервер не распознает),
+clean - команда в обычном окружении слов, noisy - ошибки распознавания,
+искажения слова активации и слова-паразиты, long - несколько предложений
+подряд, как при длинной диктовке. Фразы clean, noisy и long в основном
+распознаются как unknown: они проверяют стоимость разбора, а не долю
+распознанных команд. Корпус детерминирован при одном seed.
+"""
+import random
+from typing import List, NamedTuple, Optional
+
+from utils.commands import registry
+
+KINDS = ('command', 'clean', 'noisy', 'long')
+
+# Порог DialogContext.confidence_threshold: длина фразы команды / длина текста без слова активации
+RECOGNITION_THRESHOLD = 0.6
+
+PREFIXES = ('', 'терра ', 'терра, ', 'пожалуйста ', 'терра пожалуйста ', 'нужно ', 'давай ')
+TAILS = (
+    '', ' на завтра', ' для отдела продаж', ' по проекту строительство склада',
+    ' в пятницу в 15 часов', ' за прошлый месяц', ' для клиента ромашка', ' до конца недели',
+)
+# Описания задач для task_creation и format_task_creation
+TASK_DESCRIPTIONS = (
+    'подготовить квартальный отчет', 'позвонить клиенту ромашка', 'отправить счет поставщику бумаги',
+    'проверить договор с подрядчиком', 'обновить прайс-лист на сайте', 'провести собеседование с кандидатом',
+    'купить бумагу для принтера', 'согласовать бюджет рекламной кампании', 'перенести встречу с партнером',
+)
+TASK_DUES = (
+    '', ' завтра', ' послезавтра', ' в пятницу', ' через 3 дня', ' завтра в 10 утра',
+    ' 15 марта в 14:30', ' через неделю в 9 часов', ' в понедельник вечером',
+)
+TASK_PRIORITIES = ('', 'срочно ', 'важно ')
+# Короткие описания для command: вместе с триггером проходят порог уверенности
+SHORT_TASKS = ('отчет', 'звонок', 'счет', 'встреча', 'договор', 'прайс', 'отчет завтра', 'звонок в 15:00')
+WAKE_PREFIXES = ('', 'терра ', 'терра, ')
+WAKE_VARIANTS = ('тера', 'терро', 'тэра', 'tерра', 'эра')
+HESITATIONS = ('э', 'эээ', 'ммм', 'ну', 'короче', 'как бы', 'значит', 'в общем')
+SMALL_TALK = (
+    'у нас сегодня много работы', 'я только что вернулся со встречи', 'потом еще обсудим детали',
+    'спасибо большое', 'это важно для всей команды', 'давай быстро',
+)
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+
+class Utterance(NamedTuple):
+    text: str
+    intent: str    # тип команды исходной фразы
+    kind: str      # command | clean | noisy | long
+
+
+def typo(rng: random.Random, word: str) -> str:
+    """Одна ошибка распознавания: замена, пропуск или перестановка букв"""
+    if len(word) < 5:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    operation = rng.randrange(3)
+    if operation == 0:
+        return word[:position] + rng.choice(ALPHABET) + word[position + 1:]
+    if operation == 1:
+        return word[:position] + word[position + 1:]
+    return word[:position - 1] + word[position] + word[position - 1] + word[position + 1:]
+
+
+def add_noise(rng: random.Random, text: str) -> str:
+    """Ошибки в словах, искаженное слово активации, паразиты и повторы слов"""
+    words = [typo(rng, word) if rng.random() < 0.3 else word for word in text.split()]
+    for _ in range(rng.randint(1, 2)):
+        words.insert(rng.randrange(len(words) + 1), rng.choice(HESITATIONS))
+    if rng.random() < 0.3:
+        position = rng.randrange(len(words))
+        words.insert(position, words[position])
+    if rng.random() < 0.5:
+        words.insert(0, rng.choice(WAKE_VARIANTS) + rng.choice(('', ',')))
+    return ' '.join(words)
+
+
+def _recognizable(phrase: str, text: str) -> bool:
+    return len(phrase) > RECOGNITION_THRESHOLD * len(text)
+
+
+def command_phrase(rng: random.Random, phrase: str, task: bool) -> str:
+    """Короткая команда: слово активации, фраза и дополнение, не опускающее уверенность ниже порога"""
+    if task:
+        additions = [f' {description}' for description in SHORT_TASKS]
+    else:
+        additions = list(TAILS)
+    additions = [addition for addition in additions if _recognizable(phrase, phrase + addition)] or ['']
+    return f'{rng.choice(WAKE_PREFIXES)}{phrase}{rng.choice(additions)}'
+
+
+def task_phrase(rng: random.Random, trigger: str) -> str:
+    return f'{rng.choice(TASK_PRIORITIES)}{trigger} {rng.choice(TASK_DESCRIPTIONS)}{rng.choice(TASK_DUES)}'
+
+
+def build_corpus(per_phrase: int = 1, seed: int = 0, kinds: Optional[List[str]] = None) -> List[Utterance]:
+    """Фразы каждого типа команды из обеих таблиц реестра во всех видах"""
+    rng = random.Random(seed)
+    kinds = kinds or list(KINDS)
+    corpus: List[Utterance] = []
+    for source, patterns in (('server', registry.patterns()), ('client', registry.client_patterns())):
+        for intent, phrases in patterns.items():
+            for phrase in phrases:
+                for _ in range(per_phrase):
+                    if 'command' in kinds and source == 'server':
+                        command = command_phrase(rng, phrase, intent == 'task_creation')
+                        corpus.append(Utterance(command, intent, 'command'))
+                    if intent == 'task_creation':
+                        clean = f'{rng.choice(PREFIXES)}{task_phrase(rng, phrase)}'
+                    else:
+                        clean = f'{rng.choice(PREFIXES)}{phrase}{rng.choice(TAILS)}'
+                    clean = ' '.join(clean.split())
+                    if 'clean' in kinds:
+                        corpus.append(Utterance(clean, intent, 'clean'))
+                    if 'noisy' in kinds:
+                        corpus.append(Utterance(add_noise(rng, clean), intent, 'noisy'))
+                    if 'long' in kinds:
+                        parts = [rng.choice(SMALL_TALK) for _ in range(rng.randint(2, 4))]
+                        parts.insert(rng.randrange(len(parts) + 1), clean)
+                        corpus.append(Utterance(' '.join(parts), intent, 'long'))
+    rng.shuffle(corpus)
+    return corpus
+
+
+def task_descriptions(count: int = 200, seed: int = 0) -> List[str]:
+    """Описания задач для format_task_creation: даты, время, приоритет, длинный текст"""
+    rng = random.Random(seed)
+    descriptions = []
+    for index in range(count):
+        text = f'{rng.choice(TASK_PRIORITIES)}{rng.choice(TASK_DESCRIPTIONS)}{rng.choice(TASK_DUES)}'
+        if index % 4 == 0:
+            text = f'{text} и {rng.choice(TASK_DESCRIPTIONS)} {rng.choice(SMALL_TALK)}'
+        descriptions.append(' '.join(text.split()))
+    return descriptions
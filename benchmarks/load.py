@@ -0,0 +1,160 @@
+"""Сквозная нагрузка на приложение через тестовый клиент Flask с заглушкой распознавания.
+
+Несколько потоков-клиентов отправляют фразы корпуса (benchmarks/corpus.py)
+в /process_audio (заглушка STT читает загрузку как текст) и /process_text.
+Доля --command-share запросов - короткие команды, которые проходят порог
+распознавания, остальные - длинные и зашумленные фразы, которые чаще
+остаются unknown и не доходят до обработчиков команд. Каждый запрос
+просит разбивку по этапам (X-Request-Timing), поэтому в отчете кроме
+задержек запросов есть p50/p95/p99 каждого этапа, а рядом с задержками -
+доля распознанных команд и задержки отдельно для них и для unknown.
+
+Запуск: python -m benchmarks.load [--requests 5000] [--concurrency 8] [--audio-share 0.7]
+        [--command-share 0.8] [--repeat-share 0.2] [--stt-latency 0.05] [--output load.json]
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from benchmarks.common import percentile, report
+from benchmarks.corpus import build_corpus
+
+
+def unique_audio(text: str, index: int) -> bytes:
+    """Уникальные байты для того же текста: хвост из пробелов и табуляций кодирует номер.
+
+    Заглушка STT отрезает пробельные символы, поэтому текст не меняется,
+    а хэш аудио (ключ кэша распознавания) получается новым.
+    """
+    return (text + ''.join(' ' if bit == '0' else '\t' for bit in format(index, 'b'))).encode()
+
+
+def summarize(samples: List[float]) -> Dict:
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0,
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for part in filter(None, (item.strip() for item in (header or '').split(','))):
+        name, _, duration = part.partition(';dur=')
+        if duration:
+            stages[name] = float(duration) / 1000
+    return stages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--audio-share', type=float, default=0.7, help='доля запросов к /process_audio')
+    parser.add_argument('--command-share', type=float, default=0.8,
+                        help='доля коротких команд, проходящих порог распознавания')
+    parser.add_argument('--repeat-share', type=float, default=0.2, help='доля повторных загрузок (кэш распознавания)')
+    parser.add_argument('--stt-latency', type=float, default=0.0, help='задержка заглушки STT, секунды')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        os.environ['STT_BACKEND'] = 'stub'
+        os.environ['STT_STUB_LATENCY'] = str(args.stt_latency)
+        from app import create_app
+
+        app = create_app()
+        logging.disable(logging.CRITICAL)
+        corpus = build_corpus(seed=args.seed)
+        # Короткие команды выбираются равномерно по типам, иначе половину дал бы marketing
+        commands: Dict[str, List] = defaultdict(list)
+        for utterance in corpus:
+            if utterance.kind == 'command':
+                commands[utterance.intent].append(utterance)
+        intents = sorted(commands)
+        other = [utterance for utterance in corpus if utterance.kind != 'command']
+
+        lock = threading.Lock()
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        outcomes: Dict[str, List[float]] = defaultdict(list)
+        stages: Dict[str, List[float]] = defaultdict(list)
+        statuses: Counter = Counter()
+        command_types: Counter = Counter()
+        counter = iter(range(args.requests))
+
+        def worker(number: int) -> None:
+            rng = random.Random(args.seed * 1000 + number)
+            client = app.test_client()
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                pool = commands[intents[rng.randrange(len(intents))]] if rng.random() < args.command_share else other
+                utterance = pool[rng.randrange(len(pool))]
+                headers = {'X-Session-Id': f'load-{rng.randrange(args.sessions)}', 'X-Request-Timing': '1'}
+                started = time.perf_counter()
+                if rng.random() < args.audio_share:
+                    endpoint = 'process_audio'
+                    # Повтор отправляет те же байты, что и первая загрузка фразы
+                    body = utterance.text.encode() if rng.random() < args.repeat_share else unique_audio(utterance.text, index)
+                    response = client.post('/process_audio', headers=headers,
+                                           data={'audio': (io.BytesIO(body), 'command.webm')})
+                else:
+                    endpoint = 'process_text'
+                    response = client.post('/process_text', headers=headers, json={'text': utterance.text})
+                elapsed = time.perf_counter() - started
+                payload = response.get_json(silent=True) or {}
+                with lock:
+                    latencies[endpoint].append(elapsed)
+                    statuses[str(response.status_code)] += 1
+                    command_type = payload.get('command_type', 'none')
+                    command_types[command_type] += 1
+                    outcomes['unknown' if command_type in ('unknown', 'none', 'error') else 'recognized'].append(elapsed)
+                    for stage, seconds in parse_server_timing(response.headers.get('Server-Timing')).items():
+                        stages[stage].append(seconds)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        app.write_behind.close()
+
+        results = {
+            'config': {key: value for key, value in vars(args).items() if key != 'output'},
+            'elapsed_seconds': round(elapsed, 3),
+            'requests_per_sec': round(args.requests / elapsed, 1),
+            'latency': {endpoint: summarize(samples) for endpoint, samples in sorted(latencies.items())},
+            'latency_by_outcome': {outcome: summarize(samples) for outcome, samples in sorted(outcomes.items())},
+            'intent_mix': {
+                'recognized_share': round(len(outcomes['recognized']) / args.requests, 3),
+                'intents': len(set(command_types) - {'unknown', 'none', 'error'}),
+            },
+            'stages': {stage: summarize(samples) for stage, samples in sorted(stages.items())},
+            'statuses': dict(statuses),
+            'command_types': dict(command_types.most_common()),
+            'transcription_cache': app.transcription_cache.stats(),
+            'write_behind': app.write_behind.stats(),
+        }
+
+    report('load', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
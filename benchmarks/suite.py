@@ -0,0 +1,60 @@
+"""Запуск набора бенчмарков и сбор результатов в один JSON-отчет.
+
+Каждый бенчмарк запускается отдельным процессом (у многих свое
+приложение и временная база), результаты собираются по имени модуля.
+Сравнить два отчета: python -m benchmarks.compare before.json after.json
+
+Запуск: python -m benchmarks.suite [--only bench_pipeline load] [--output suite.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import report
+
+# Набор по умолчанию: конвейер NLP и команд плюс сквозная нагрузка
+DEFAULT_SUITE = {
+    'bench_pipeline': ['--iterations', '3000'],
+    'bench_matcher': ['--iterations', '200'],
+    'bench_normalizer': [],
+    'bench_metrics': ['--iterations', '1000'],
+    'load': ['--requests', '3000'],
+}
+
+
+def run(module: str, extra) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'result.json')
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-m', f'benchmarks.{module}', '--output', output, *extra],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        if completed.returncode != 0:
+            return {'error': completed.stderr.strip().splitlines()[-1:] or ['failed']}
+        with open(output, encoding='utf-8') as fh:
+            payload = json.load(fh)
+        payload['results']['wall_seconds'] = round(time.perf_counter() - started, 2)
+        return payload['results']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--only', nargs='+', help='модули из benchmarks/, по умолчанию набор DEFAULT_SUITE')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    modules = args.only or list(DEFAULT_SUITE)
+    results = {}
+    for module in modules:
+        print(f'running {module}...', file=sys.stderr)
+        results[module] = run(module, DEFAULT_SUITE.get(module, []))
+    report('suite', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Gunicorn settings for production: preforked workers with threads.
+
+WEB_CONCURRENCY - число процессов (по умолчанию число ядер),
+GUNICORN_THREADS - потоков в каждом процессе, PORT - порт.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+# Распознавание через внешний сервис может занимать десятки секунд
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Состояние, которое должно быть общим для воркеров: контекст диалогов,
+# буферы потоковой загрузки и кэш распознавания лежат в SQLite-файлах.
+# Результаты фоновых заданий остаются в памяти процесса, поэтому
+# /process_audio?async=1 отвечает синхронно
+os.environ.setdefault('SESSION_STORE', 'sqlite')
+os.environ.setdefault('STREAM_STORE', 'sqlite')
+os.environ.setdefault('TRANSCRIPTION_CACHE_PATH', 'instance/transcriptions.db')
+if workers > 1:
+    os.environ.setdefault('JOB_ASYNC_ENABLED', '0')
+
+
+def on_starting(server):
+    """Создает схему базы один раз до запуска воркеров"""
+    if os.environ.get('DB_CREATE_SCHEMA', '1') in ('0', 'false'):
+        return
+    subprocess.run([sys.executable, '-m', 'flask', 'init-db'], check=True,
+                   env=dict(os.environ, FLASK_APP='app:create_app', WARM_UP='0'))
+    # Воркеры не проверяют схему при запуске
+    os.environ['DB_CREATE_SCHEMA'] = '0'
+
+
+def post_worker_init(worker):
+    # Приложение создано и прогрето: воркер начинает принимать запросы
+    worker.log.info("Worker ready (pid: %s)", worker.pid)
@@ -1,30 +1,25 @@
 import logging
 import os
 from dotenv import load_dotenv
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+from utils.logs import configure_logging
 
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
+# Настройка логирования (LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_QUEUE, LOG_DEBUG_SAMPLE);
+# create_app применяет те же настройки повторно без изменений
+configure_logging(os.environ)
+logger = logging.getLogger(__name__)
+
 # Проверяем наличие переменных окружения
-required_env_vars = ['OPENAI_API_KEY']
+# Ключ OpenAI нужен только для распознавания через Whisper API
+required_env_vars = ['OPENAI_API_KEY'] if os.getenv('STT_BACKEND', 'whisper') == 'whisper' else []
 missing_vars = [var for var in required_env_vars if not os.getenv(var)]
 
 if missing_vars:
     logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
     raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
-# Проверяем наличие переменных окружения
-if not os.getenv('OPENAI_API_KEY'):
-    logger.error("OPENAI_API_KEY не найден в переменных окружения")
-    raise ValueError("OPENAI_API_KEY обязателен для работы приложения")
-
 try:
     from app import create_app
     logger.info("Импорт create_app успешен")
@@ -1,23 +1,25 @@
 from datetime import datetime
 import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 import logging
 
 logger = logging.getLogger(__name__)
 db = SQLAlchemy()
 
-def init_db(app):
-    """Initialize the database with the application"""
+def init_db(app, create_schema: bool = True):
+    """Initialize the database with the application.
+
+    create_schema=False only binds the engine: the schema is expected to be
+    created beforehand, e.g. by `flask init-db` in a deploy step.
+    """
     try:
         logger.info("Initializing database...")
         db.init_app(app)
         
-        with app.app_context():
-            # Создаем директорию instance если её нет
-            os.makedirs('instance', exist_ok=True)
-            # Создаем все таблицы
-            db.create_all()
-            logger.info("Database tables created successfully")
+        if create_schema:
+            with app.app_context():
+                create_tables()
             
     except Exception as e:
         logger.error(f"Failed to initialize database: {str(e)}", exc_info=True)
@@ -28,9 +30,49 @@ def init_db(app):
             pass
         raise
 
+def create_tables():
+    """Create missing tables, columns and indexes"""
+    # Создаем директорию instance если её нет
+    os.makedirs('instance', exist_ok=True)
+    # Создаем все таблицы
+    db.create_all()
+    upgrade_schema()
+    logger.info("Database tables created successfully")
+
+def upgrade_schema():
+    """Bring an existing database up to the models: add missing columns and indexes"""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            # create_all не изменяет существующие таблицы, поэтому
+            # новые столбцы (всегда допускающие NULL) добавляем вручную
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            logger.info(f"Added missing column {table.name}.{column.name}")
+    db.session.commit()
+
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                try:
+                    index.create(bind=db.engine)
+                except IntegrityError as e:
+                    # Уникальный индекс не строится поверх уже накопленных дублей
+                    logger.error(f"Index {index.name} not created, remove duplicate rows first: {e.orig}")
+                    continue
+                logger.info(f"Created index {index.name}")
+
 class Command(db.Model):
     """Model for storing voice commands and their results"""
     __tablename__ = 'commands'
+    __table_args__ = (
+        db.Index('ix_commands_created_at', 'created_at'),
+        db.Index('ix_commands_type_created_at', 'command_type', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(500), nullable=False)
@@ -45,6 +87,11 @@ class Command(db.Model):
 class Task(db.Model):
     """Model for storing tasks created by voice commands"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('ix_tasks_created_at_id', 'created_at', 'id'),
+        db.Index('ix_tasks_status_created_at', 'status', 'created_at'),
+        db.Index('ix_tasks_category_created_at', 'category', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -61,6 +108,14 @@ class Task(db.Model):
 class BusinessEntity(db.Model):
     """Model for storing business entities like clients, suppliers, etc."""
     __tablename__ = 'business_entities'
+    __table_args__ = (
+        db.Index('ix_business_entities_created_at_id', 'created_at', 'id'),
+        db.Index('ix_business_entities_type_created_at', 'entity_type', 'created_at'),
+        db.Index('ix_business_entities_type_name', 'entity_type', 'name'),
+        db.Index('ix_business_entities_status', 'status'),
+        # Дубли по (name, entity_type) отсекает база: импорт вставляет с ON CONFLICT DO NOTHING
+        db.Index('uq_business_entities_name_type', 'name', 'entity_type', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
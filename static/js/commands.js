@@ -1,325 +1,35 @@
-// Типы команд
+// Типы и шаблоны команд загружаются с сервера из каталога команд
+// (/api/commands/catalog), чтобы клиент и сервер распознавали одни и те же фразы
 const CommandTypes = {
-    TASK_CREATION: 'task_creation',
-    MARKETING: 'marketing',
-    CLIENT: 'client',
-    SUPPLIER: 'supplier',
-    CONTRACT: 'contract',
-    QUALITY: 'quality',
-    RISK: 'risk',
-    STRATEGY: 'strategy',
-    COMPLIANCE: 'compliance',
-    INNOVATION: 'innovation',
-    DOCUMENT: 'document_analysis',
-    SEARCH: 'search',
-    CALENDAR: 'calendar',
-    CONTACT: 'contact',
-    REMINDER: 'reminder',
-    FINANCE: 'finance',
-    PROJECT: 'project',
-    SALES: 'sales',
-    INVENTORY: 'inventory',
-    ANALYTICS: 'analytics',
-    EMPLOYEE: 'employee',
-    MEETING: 'meeting',
-    GREETING: 'greeting',
     UNKNOWN: 'unknown'
 };
 
-// Шаблоны команд для распознавания
-const CommandPatterns = {
-    [CommandTypes.TASK_CREATION]: [
-        'создать задачу',
-        'новая задача',
-        'добавить заявку',
-        'запланировать',
-        'поставить задачу',
-        'назначить задание'
-    ],
-    [CommandTypes.MARKETING]: [
-        // Общий маркетинг
-        'маркетинг',
-        'маркетинговый план',
-        'маркетинговая стратегия',
-        'маркетинговый бюджет',
-        'маркетинговый отчет',
-        'маркетинговые показатели',
-        
-        // Реклама и продвижение
-        'рекламная кампания',
-        'запустить рекламу',
-        'остановить рекламу',
-        'рекламный бюджет',
-        'эффективность рекламы',
-        'таргетированная реклама',
-        'контекстная реклама',
-        'медийная реклама',
-        
-        // Социальные сети и контент
-        'социальные сети',
-        'контент план',
-        'публикация',
-        'пост',
-        'создать контент',
-        'расписание постов',
-        'истории',
-        'прямой эфир',
-        
-        // Email-маркетинг
-        'email рассылка',
-        'создать рассылку',
-        'шаблон письма',
-        'база подписчиков',
-        'открываемость писем',
-        'конверсия рассылки',
-        
-        // Аналитика и исследования
-        'анализ рынка',
-        'исследование конкурентов',
-        'анализ конкурентов',
-        'маркетинговое исследование',
-        'аналитика сайта',
-        'веб-аналитика',
-        'отчет по конверсии',
-        'воронка продаж',
-        
-        // Целевая аудитория
-        'целевая аудитория',
-        'сегмент аудитории',
-        'портрет клиента',
-        'анализ аудитории',
-        'поведение пользователей',
-        'предпочтения клиентов',
-        
-        // Бренд и PR
-        'бренд',
-        'фирменный стиль',
-        'брендинг',
-        'репутация бренда',
-        'пресс-релиз',
-        'PR кампания',
-        'медиа план',
-        
-        // Мероприятия
-        'маркетинговое мероприятие',
-        'организовать событие',
-        'промо-акция',
-        'презентация продукта',
-        'выставка',
-        'конференция',
-        
-        // SEO
-        'seo оптимизация',
-        'поисковое продвижение',
-        'ключевые слова',
-        'позиции в поиске',
-        'meta теги',
-        'оптимизация контента',
-        
-        // Лояльность
-        'программа лояльности',
-        'акции для клиентов',
-        'бонусная программа',
-        'удержание клиентов',
-        'обратная связь',
-        'отзывы клиентов'
-    ],
-    [CommandTypes.CLIENT]: [
-        'клиентская база',
-        'клиенты',
-        'работа с клиентами',
-        'обслуживание клиентов',
-        'лояльность клиентов',
-        'обратная связь',
-        'клиентский опыт'
-    ],
-    [CommandTypes.SUPPLIER]: [
-        'поставщики',
-        'управление поставками',
-        'закупки',
-        'оценка поставщиков',
-        'договор поставки',
-        'логистика',
-        'цепочка поставок'
-    ],
-    [CommandTypes.CONTRACT]: [
-        'договор',
-        'контракт',
-        'соглашение',
-        'условия договора',
-        'подписание договора',
-        'расторжение договора',
-        'дополнительное соглашение'
-    ],
-    [CommandTypes.QUALITY]: [
-        'качество',
-        'контроль качества',
-        'управление качеством',
-        'стандарты качества',
-        'улучшение качества',
-        'оценка качества',
-        'система качества'
-    ],
-    [CommandTypes.RISK]: [
-        'риски',
-        'управление рисками',
-        'оценка рисков',
-        'минимизация рисков',
-        'анализ рисков',
-        'риск-менеджмент',
-        'страхование рисков'
-    ],
-    [CommandTypes.STRATEGY]: [
-        'стратегия',
-        'стратегическое планирование',
-        'развитие бизнеса',
-        'долгосрочные цели',
-        'бизнес-план',
-        'конкурентная стратегия',
-        'стратегические инициативы'
-    ],
-    [CommandTypes.COMPLIANCE]: [
-        'соответствие',
-        'нормативы',
-        'регуляторные требования',
-        'compliance',
-        'аудит соответствия',
-        'правовые требования',
-        'стандарты compliance'
-    ],
-    [CommandTypes.INNOVATION]: [
-        'инновации',
-        'инновационные проекты',
-        'технологическое развитие',
-        'цифровая трансформация',
-        'новые технологии',
-        'модернизация',
-        'оптимизация процессов'
-    ],
-    [CommandTypes.DOCUMENT]: [
-        'проверить документ',
-        'анализ документа',
-        'проверка договора',
-        'изучить документ',
-        'просмотреть контракт',
-        'проанализировать соглашение'
-    ],
-    [CommandTypes.SEARCH]: [
-        'найти',
-        'поиск',
-        'искать',
-        'где находится',
-        'покажи информацию',
-        'найди данные',
-        'поищи'
-    ],
-    [CommandTypes.CALENDAR]: [
-        'календарь',
-        'расписание',
-        'встреча',
-        'запланировать встречу',
-        'добавить в календарь'
-    ],
-    [CommandTypes.CONTACT]: [
-        'контакт',
-        'добавить контакт',
-        'найти контакт',
-        'информация о человеке',
-        'данные сотрудника',
-        'телефон'
-    ],
-    [CommandTypes.REMINDER]: [
-        'напомнить',
-        'установить напоминание',
-        'поставить будильник',
-        'не забыть',
-        'запомнить'
-    ],
-    [CommandTypes.FINANCE]: [
-        'финансы',
-        'баланс',
-        'бюджет',
-        'расходы',
-        'доходы',
-        'платеж',
-        'счет',
-        'транзакция',
-        'оплата',
-        'выставить счет'
-    ],
-    [CommandTypes.PROJECT]: [
-        'проект',
-        'создать проект',
-        'статус проекта',
-        'обновить проект',
-        'завершить проект',
-        'команда проекта',
-        'план проекта'
-    ],
-    [CommandTypes.SALES]: [
-        'продажи',
-        'новая сделка',
-        'клиент',
-        'заказ',
-        'оформить продажу',
-        'воронка продаж',
-        'выставить счет',
-        'статус сделки',
-        'потенциальный клиент'
-    ],
-    [CommandTypes.INVENTORY]: [
-        'склад',
-        'товары',
-        'остатки',
-        'проверить наличие',
-        'заказать товар',
-        'инвентаризация',
-        'поставка',
-        'приход товара',
-        'отгрузка'
-    ],
-    [CommandTypes.ANALYTICS]: [
-        'аналитика',
-        'анализ данных',
-        'тренды',
-        'прогноз',
-        'показатели',
-        'метрики',
-        'эффективность',
-        'отчет по продажам',
-        'статистика',
-        'динамика продаж'
-    ],
-    [CommandTypes.EMPLOYEE]: [
-        'сотрудник',
-        'персонал',
-        'штат',
-        'отпуск',
-        'график работы',
-        'зарплата',
-        'оценка работы',
-        'повышение',
-        'обучение',
-        'компетенции'
-    ],
-    [CommandTypes.MEETING]: [
-        'совещание',
-        'организовать встречу',
-        'запланировать звонок',
-        'конференция',
-        'презентация',
-        'брифинг',
-        'переговоры'
-    ],
-    [CommandTypes.GREETING]: [
-        'привет',
-        'здравствуй',
-        'добрый день',
-        'доброе утро',
-        'добрый вечер',
-        'приветствую'
-    ]
-};
+const CommandPatterns = {};
+
+// Начала фраз, по которым узнается приветствие
+const GreetingPrefixes = [];
+
+const commandCatalogUrl = document.currentScript.dataset.catalogUrl || '/api/commands/catalog';
+
+// Каталог версионирован: адрес с версией браузер берет из кэша без запроса
+const commandCatalogReady = fetch(commandCatalogUrl)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        return response.json();
+    })
+    .then(catalog => {
+        GreetingPrefixes.push(...catalog.greetings);
+        for (const command of catalog.commands) {
+            CommandTypes[command.name.toUpperCase()] = command.name;
+            CommandPatterns[command.name] = command.phrases;
+        }
+        return catalog;
+    })
+    .catch(err => {
+        console.error('Не удалось загрузить каталог команд:', err);
+    });
 
 // Дополнительные служебные функции для улучшения распознавания
 function normalizeText(text) {
@@ -339,8 +49,7 @@ function detectCommandType(text) {
     console.log('Text after removing keyword:', text);
     
     // Проверяем на приветствие перед основной обработкой
-    const greetings = ['привет', 'здравствуй', 'добр', 'хай', 'hello'];
-    for (const greeting of greetings) {
+    for (const greeting of GreetingPrefixes) {
         if (text.toLowerCase().startsWith(greeting)) {
             console.log('Greeting detected:', text);
             return CommandTypes.GREETING;
@@ -2,6 +2,23 @@ let mediaRecorder;
 let audioChunks = [];
 let isRecording = false;
 
+// Асинхронная обработка: сервер сразу возвращает id задания,
+// а результат приходит через Server-Sent Events
+const USE_ASYNC_PROCESSING = true;
+
+// Потоковая загрузка: фрагменты записи отправляются каждые TIMESLICE_MS,
+// а после паузы в речи запись перезапускается, чтобы сервер начал
+// распознавать законченную часть, пока пользователь продолжает говорить
+const USE_STREAMING = true;
+const TIMESLICE_MS = 250;
+const SILENCE_MS = 700;
+const SILENCE_LEVEL = 0.02;
+
+// Отправка записи в WAV (PCM): сервер обрезает тишину, сводит в моно
+// и понижает частоту до 16 кГц перед распознаванием. Фрагменты WebM
+// нельзя перекодировать по отдельности, поэтому WAV отправляется целиком
+const SEND_WAV = false;
+
 document.addEventListener('DOMContentLoaded', () => {
     const startBtn = document.getElementById('startBtn');
     const stopBtn = document.getElementById('stopBtn');
@@ -14,23 +31,23 @@ document.addEventListener('DOMContentLoaded', () => {
     startBtn.addEventListener('click', startRecording);
     stopBtn.addEventListener('click', stopRecording);
 
+    // Состояние потоковой загрузки текущей записи
+    let micStream = null;
+    let audioStream = null;
+    let chunkIndex = 0;
+    let sendChain = Promise.resolve();
+    let silenceTimer = null;
+    let audioContext = null;
+
     async function startRecording() {
         try {
-            const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-            mediaRecorder = new MediaRecorder(stream);
-            
-            mediaRecorder.ondataavailable = (event) => {
-                audioChunks.push(event.data);
-            };
-
-            mediaRecorder.onstop = async () => {
-                const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
-                await sendAudioToServer(audioBlob);
-                audioChunks = [];
-            };
-
-            mediaRecorder.start();
+            micStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+            audioStream = USE_STREAMING && !SEND_WAV ? await openStream() : null;
             isRecording = true;
+            startRecorder();
+            if (audioStream) {
+                watchSilence();
+            }
             
             // Обновляем UI
             startBtn.disabled = true;
@@ -44,13 +61,185 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function openStream() {
+        try {
+            const response = await fetch('/process_audio/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: 'audio.webm' })
+            });
+            if (response.status !== 201) {
+                return null;
+            }
+            chunkIndex = 0;
+            sendChain = Promise.resolve();
+            return await response.json();
+        } catch (err) {
+            // Без потока запись отправляется целиком после остановки
+            console.warn('Потоковая загрузка недоступна:', err);
+            return null;
+        }
+    }
+
+    function startRecorder() {
+        mediaRecorder = new MediaRecorder(micStream);
+        
+        mediaRecorder.ondataavailable = (event) => {
+            if (audioStream) {
+                sendChunk(event.data, false);
+            } else {
+                audioChunks.push(event.data);
+            }
+        };
+
+        mediaRecorder.onstop = async () => {
+            if (audioStream) {
+                // Последний фрагмент уже отправлен: закрываем сегмент
+                sendChunk(new Blob(), true);
+                if (isRecording) {
+                    startRecorder();
+                } else {
+                    await finishStream();
+                }
+                return;
+            }
+            const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+            audioChunks = [];
+            if (SEND_WAV) {
+                await sendAudioToServer(await encodeWav(audioBlob), 'audio.wav');
+            } else {
+                await sendAudioToServer(audioBlob, 'audio.webm');
+            }
+        };
+
+        if (audioStream) {
+            mediaRecorder.start(TIMESLICE_MS);
+        } else {
+            mediaRecorder.start();
+        }
+    }
+
+    async function encodeWav(blob) {
+        // Декодирование записи и упаковка в 16-битный PCM с исходными частотой и каналами
+        const context = new AudioContext();
+        try {
+            const audio = await context.decodeAudioData(await blob.arrayBuffer());
+            const channels = audio.numberOfChannels;
+            const frames = audio.length;
+            const buffer = new ArrayBuffer(44 + frames * channels * 2);
+            const view = new DataView(buffer);
+            const writeString = (offset, text) => {
+                for (let i = 0; i < text.length; i++) {
+                    view.setUint8(offset + i, text.charCodeAt(i));
+                }
+            };
+            writeString(0, 'RIFF');
+            view.setUint32(4, 36 + frames * channels * 2, true);
+            writeString(8, 'WAVE');
+            writeString(12, 'fmt ');
+            view.setUint32(16, 16, true);
+            view.setUint16(20, 1, true);
+            view.setUint16(22, channels, true);
+            view.setUint32(24, audio.sampleRate, true);
+            view.setUint32(28, audio.sampleRate * channels * 2, true);
+            view.setUint16(32, channels * 2, true);
+            view.setUint16(34, 16, true);
+            writeString(36, 'data');
+            view.setUint32(40, frames * channels * 2, true);
+
+            const data = [];
+            for (let c = 0; c < channels; c++) {
+                data.push(audio.getChannelData(c));
+            }
+            let offset = 44;
+            for (let i = 0; i < frames; i++) {
+                for (let c = 0; c < channels; c++) {
+                    const sample = Math.max(-1, Math.min(1, data[c][i]));
+                    view.setInt16(offset, sample < 0 ? sample * 0x8000 : sample * 0x7fff, true);
+                    offset += 2;
+                }
+            }
+            return new Blob([buffer], { type: 'audio/wav' });
+        } finally {
+            context.close();
+        }
+    }
+
+    function sendChunk(blob, segmentEnd) {
+        // Фрагменты уходят строго по порядку, по одному запросу за раз
+        const index = chunkIndex++;
+        const url = `${audioStream.chunk_url}?index=${index}` + (segmentEnd ? '&segment_end=1' : '');
+        sendChain = sendChain.then(async () => {
+            const response = await fetch(url, { method: 'POST', body: blob });
+            if (!response.ok) {
+                throw new Error(`Фрагмент ${index} не принят: ${response.status}`);
+            }
+        });
+    }
+
+    function watchSilence() {
+        // Пауза в речи после звука завершает сегмент
+        audioContext = new AudioContext();
+        const analyser = audioContext.createAnalyser();
+        audioContext.createMediaStreamSource(micStream).connect(analyser);
+        const samples = new Float32Array(analyser.fftSize);
+        let heardSpeech = false;
+        let lastVoiceAt = Date.now();
+
+        silenceTimer = setInterval(() => {
+            analyser.getFloatTimeDomainData(samples);
+            let sum = 0;
+            for (const sample of samples) {
+                sum += sample * sample;
+            }
+            const now = Date.now();
+            if (Math.sqrt(sum / samples.length) > SILENCE_LEVEL) {
+                heardSpeech = true;
+                lastVoiceAt = now;
+            } else if (heardSpeech && now - lastVoiceAt > SILENCE_MS && mediaRecorder.state === 'recording') {
+                heardSpeech = false;
+                mediaRecorder.stop();
+            }
+        }, 100);
+    }
+
+    function stopSilenceWatch() {
+        if (silenceTimer) {
+            clearInterval(silenceTimer);
+            silenceTimer = null;
+        }
+        if (audioContext) {
+            audioContext.close();
+            audioContext = null;
+        }
+    }
+
+    async function finishStream() {
+        const stream = audioStream;
+        audioStream = null;
+        try {
+            await sendChain;
+            const response = await fetch(stream.finish_url, { method: 'POST' });
+            showResult(await response.json());
+        } catch (err) {
+            fetch(`/process_audio/stream/${stream.stream_id}`, { method: 'DELETE' }).catch(() => {});
+            showError(err);
+        }
+    }
+
     function stopRecording() {
         if (mediaRecorder && isRecording) {
-            mediaRecorder.stop();
             isRecording = false;
+            stopSilenceWatch();
+            if (mediaRecorder.state === 'recording') {
+                mediaRecorder.stop();
+            } else if (audioStream) {
+                // Запись между сегментами: последний сегмент уже закрыт
+                finishStream();
+            }
             
             // Останавливаем все треки
-            mediaRecorder.stream.getTracks().forEach(track => track.stop());
+            micStream.getTracks().forEach(track => track.stop());
             
             // Обновляем UI
             startBtn.disabled = false;
@@ -60,50 +249,81 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function sendAudioToServer(audioBlob) {
+    function waitForJob(job) {
+        return new Promise((resolve, reject) => {
+            const events = new EventSource(job.events_url);
+            events.addEventListener('result', (event) => {
+                events.close();
+                const data = JSON.parse(event.data);
+                // У задания, завершенного ответом с ошибкой, есть result с текстом для пользователя
+                if (data.status === 'done' || data.result) {
+                    resolve(data.result);
+                } else {
+                    reject(new Error(data.error));
+                }
+            });
+            events.onerror = () => {
+                events.close();
+                reject(new Error('Соединение с сервером прервано'));
+            };
+        });
+    }
+
+    async function sendAudioToServer(audioBlob, filename) {
         try {
             const formData = new FormData();
-            formData.append('audio', audioBlob);
+            formData.append('audio', audioBlob, filename);
 
-            const response = await fetch('/process_audio', {
+            const url = USE_ASYNC_PROCESSING ? '/process_audio?async=1' : '/process_audio';
+            const response = await fetch(url, {
                 method: 'POST',
                 body: formData
             });
 
-            const result = await response.json();
-            
-            // Обновляем UI в зависимости от результата
-            status.textContent = 'Готово';
-            status.style.color = 'var(--bs-success)';
-            
-            // Создаем и добавляем новый результат
-            const resultElement = document.createElement('div');
-            resultElement.className = 'result-item mb-3 p-3 border rounded';
-            
-            if (result.status === 'success') {
-                resultElement.innerHTML = `
-                    <div class="command-type text-muted small">Тип команды: ${result.command_type}</div>
-                    <div class="command-result">${result.result}</div>
-                `;
-            } else {
-                resultElement.innerHTML = `
-                    <div class="text-danger">${result.result}</div>
-                `;
+            let result = await response.json();
+            if (response.status === 202) {
+                result = await waitForJob(result);
             }
-            
-            resultContainer.insertBefore(resultElement, resultContainer.firstChild);
+            showResult(result);
             
         } catch (err) {
-            console.error('Ошибка при отправке аудио:', err);
-            status.textContent = 'Ошибка при обработке';
-            status.style.color = 'var(--bs-danger)';
-            
-            const errorElement = document.createElement('div');
-            errorElement.className = 'result-item mb-3 p-3 border rounded';
-            errorElement.innerHTML = `
-                <div class="text-danger">Произошла ошибка при обработке аудио</div>
+            showError(err);
+        }
+    }
+
+    function showResult(result) {
+        // Обновляем UI в зависимости от результата
+        status.textContent = 'Готово';
+        status.style.color = 'var(--bs-success)';
+        
+        // Создаем и добавляем новый результат
+        const resultElement = document.createElement('div');
+        resultElement.className = 'result-item mb-3 p-3 border rounded';
+        
+        if (result.status === 'success') {
+            resultElement.innerHTML = `
+                <div class="command-type text-muted small">Тип команды: ${result.command_type}</div>
+                <div class="command-result">${result.result}</div>
+            `;
+        } else {
+            resultElement.innerHTML = `
+                <div class="text-danger">${result.result}</div>
             `;
-            resultContainer.insertBefore(errorElement, resultContainer.firstChild);
         }
+        
+        resultContainer.insertBefore(resultElement, resultContainer.firstChild);
+    }
+
+    function showError(err) {
+        console.error('Ошибка при отправке аудио:', err);
+        status.textContent = 'Ошибка при обработке';
+        status.style.color = 'var(--bs-danger)';
+        
+        const errorElement = document.createElement('div');
+        errorElement.className = 'result-item mb-3 p-3 border rounded';
+        errorElement.innerHTML = `
+            <div class="text-danger">Произошла ошибка при обработке аудио</div>
+        `;
+        resultContainer.insertBefore(errorElement, resultContainer.firstChild);
     }
 });
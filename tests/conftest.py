@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from utils.stt import StubBackend
+
+
+class GatedBackend(StubBackend):
+    """Заглушка распознавания, которая ждет разрешения теста перед ответом"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Semaphore(0)
+        self.error = None
+
+    def transcribe(self, upload, timeout=None):
+        self.started.release()
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return super().transcribe(upload, timeout)
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Фабрика приложения со стабом распознавания и отдельной базой в tmp_path"""
+    apps = []
+
+    def factory(**config):
+        monkeypatch.setenv('STT_BACKEND', 'stub')
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "terra.db"}')
+        monkeypatch.setenv('WARM_UP', '0')
+        for key, value in config.items():
+            monkeypatch.setenv(key, str(value))
+        from app import create_app
+
+        app = create_app()
+        app.config['TESTING'] = True
+        app.stt = GatedBackend()
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        app.stt.gate.set()
+        app.jobs.shutdown()
+        app.write_behind.close()
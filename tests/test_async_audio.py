@@ -0,0 +1,94 @@
+import io
+import json
+
+from utils.stt import STTUnavailableError
+
+
+def submit(client, text='терра привет'):
+    # Заглушка распознавания возвращает содержимое файла как текст
+    audio = (io.BytesIO(text.encode('utf-8')), 'audio.webm')
+    return client.post('/process_audio?async=1', data={'audio': audio})
+
+
+def test_accepted_then_polled(make_app):
+    app = make_app()
+    client = app.test_client()
+    app.stt.gate.clear()
+
+    response = submit(client)
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['status'] == 'accepted'
+    assert client.get(job['status_url']).get_json()['status'] in ('pending', 'running')
+
+    app.stt.gate.set()
+    assert app.jobs.get(job['job_id']).done.wait(5)
+    data = client.get(job['status_url']).get_json()
+    assert data['status'] == 'done'
+    assert data['result']['command_type'] == 'greeting'
+
+
+def test_job_is_private_to_its_session(make_app):
+    app = make_app()
+    job = submit(app.test_client()).get_json()
+    assert app.test_client().get(job['status_url']).status_code == 404
+
+
+def test_events_stream_result(make_app):
+    app = make_app()
+    client = app.test_client()
+    job = submit(client, 'терра создать задачу отчет').get_json()
+
+    body = client.get(job['events_url']).get_data(as_text=True)
+    event, data = body.strip().split('\n')[-2:]
+    assert event == 'event: result'
+    payload = json.loads(data[len('data: '):])
+    assert payload['status'] == 'done'
+    assert payload['result']['command_type'] == 'task_creation'
+
+
+def test_session_limit_429(make_app):
+    app = make_app(JOB_MAX_PER_SESSION=1)
+    client = app.test_client()
+    app.stt.gate.clear()
+
+    assert submit(client).status_code == 202
+    assert submit(client).status_code == 429
+
+
+def test_queue_full_503(make_app):
+    app = make_app(JOB_WORKERS=1, JOB_QUEUE_SIZE=1)
+    app.stt.gate.clear()
+
+    assert submit(app.test_client()).status_code == 202
+    assert app.stt.started.acquire(timeout=5)
+    assert submit(app.test_client()).status_code == 202
+    response = submit(app.test_client())
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+
+
+def test_stt_error_fails_job(make_app):
+    app = make_app()
+    client = app.test_client()
+    app.stt.error = RuntimeError('whisper down')
+
+    job = submit(client).get_json()
+    assert app.jobs.get(job['job_id']).done.wait(5)
+    data = client.get(job['status_url']).get_json()
+    assert data['status'] == 'failed'
+    assert data['status_code'] == 500
+    assert data['result']['status'] == 'error'
+
+
+def test_stt_unavailable_fails_job_with_503(make_app):
+    app = make_app()
+    client = app.test_client()
+    app.stt.error = STTUnavailableError('breaker open', retry_after=3)
+
+    job = submit(client).get_json()
+    assert app.jobs.get(job['job_id']).done.wait(5)
+    data = client.get(job['status_url']).get_json()
+    assert data['status'] == 'failed'
+    assert data['status_code'] == 503
+    assert data['result']['retry_after'] == 3
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from models import BusinessEntity, db
+from utils.bulk import import_entities
+
+_table = BusinessEntity.__table__
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "bulk.db"}')
+    db.metadata.create_all(engine, tables=[_table])
+    yield engine
+    engine.dispose()
+
+
+def rows(count, offset=0):
+    return [{'name': f'Компания {offset + i}', 'entity_type': 'Client'} for i in range(count)]
+
+
+def count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(_table)).scalar()
+
+
+def test_duplicates_are_skipped(engine):
+    report = import_entities(engine, rows(10) + rows(3) + [{'name': 'без типа'}], chunk_size=4)
+    assert (report.inserted, report.duplicates, report.invalid) == (10, 3, 1)
+
+    report = import_entities(engine, rows(12), chunk_size=5)
+    assert (report.inserted, report.duplicates) == (2, 10)
+    assert count(engine) == 12
+
+
+def test_concurrent_imports_do_not_duplicate(engine):
+    reports = []
+    threads = [threading.Thread(target=lambda: reports.append(import_entities(engine, rows(300), chunk_size=50)))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert count(engine) == 300
+    assert sum(report.inserted for report in reports) == 300
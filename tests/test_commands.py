@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from utils.command_processor import process_command
+from utils.commands import CommandRegistry, CommandSpec, registry
+
+NOT_RECOGNIZED = "Извините, я не распознал команду. Пожалуйста, попробуйте переформулировать."
+
+
+def test_server_recognizes_only_its_table():
+    assert list(registry.patterns()) == ['greeting', 'task_creation', 'finance', 'project', 'search']
+
+
+@pytest.mark.parametrize('command_type', ['finance', 'sales', 'meeting', 'document_analysis', 'unknown'])
+def test_commands_without_handler_are_not_recognized(command_type):
+    assert process_command(command_type, {'description': 'отчет'}) == NOT_RECOGNIZED
+
+
+def test_business_command_asks_for_description():
+    assert process_command('marketing', {}) == 'Пожалуйста, укажите описание для команды типа marketing'
+    assert process_command('document', {'description': 'договор'}).startswith('📝 Выполняю команду:')
+
+
+def test_catalog_keeps_client_order_and_shared_phrases():
+    catalog = json.loads(registry.catalog())
+    names = [command['name'] for command in catalog['commands']]
+    assert names[0] == 'task_creation' and names[-1] == 'greeting'
+    assert 'document_analysis' in names and 'document' not in names
+    phrases = {command['name']: command['phrases'] for command in catalog['commands']}
+    # Общая фраза остается у обеих команд; клиент выбирает первую по порядку
+    assert 'обратная связь' in phrases['marketing'] and 'обратная связь' in phrases['client']
+    assert catalog['greetings'] == list(registry.get('greeting').phrases)
+    assert catalog['version'] == registry.version
+
+
+def test_duplicate_server_phrase_fails():
+    commands = CommandRegistry([CommandSpec('one', 'Один', ('отчет',))])
+    with pytest.raises(ValueError):
+        commands.register(CommandSpec('two', 'Два', ('отчет',)))
+    commands.register(CommandSpec('three', 'Три', client_phrases=('отчет',)))
+
+
+def test_catalog_etag(make_app):
+    client = make_app().test_client()
+    response = client.get('/api/commands/catalog')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag'].strip('"')
+    assert client.get('/api/commands/catalog', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    cached = client.get(f'/api/commands/catalog?v={etag}')
+    assert 'immutable' in cached.headers['Cache-Control']
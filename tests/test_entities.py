@@ -0,0 +1,32 @@
+import pytest
+
+from utils.command_processor import format_task_creation, process_command
+from utils.entities import EntityRecord, extract_entities
+
+
+@pytest.mark.parametrize('text, priority', [
+    ('создать задачу срочно отчет', 'high'),
+    ('создать задачу важный отчет', 'high'),
+    ('создать задачу критичный отчет', 'high'),
+    # Маркер вне описания задачи тоже повышает приоритет
+    ('это важно создать задачу отчет', 'high'),
+    ('создать задачу отчет', 'normal'),
+])
+def test_task_priority_markers_anywhere(text, priority):
+    entities = extract_entities('task', text)
+    assert entities.priority == priority
+    shown = 'Высокий' if priority == 'high' else 'Обычный'
+    assert f'Приоритет: {shown}' in process_command('task_creation', entities)
+
+
+def test_format_task_creation_uses_same_priority_rule():
+    assert 'Приоритет: Высокий' in format_task_creation('срочно подготовить отчет')
+    assert 'Приоритет: Высокий' in format_task_creation('важно подготовить отчет')
+    assert 'Приоритет: Высокий' in format_task_creation('КРИТИЧНО исправить ошибку')
+    assert 'Приоритет: Обычный' in format_task_creation('подготовить отчет')
+
+
+@pytest.mark.parametrize('text', ['создать задачу срочно отчет', 'это важно создать задачу отчет',
+                                  'создать задачу отчет'])
+def test_both_task_paths_agree(text):
+    assert EntityRecord.for_task_description(text).priority == extract_entities('task', text).priority
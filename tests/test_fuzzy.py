@@ -0,0 +1,24 @@
+import pytest
+
+from utils.fuzzy import strip_wake_words
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('терра привет', 'привет'),
+    ('Терра, создать задачу', 'создать задачу'),
+    ('терро, запланироват встречу', 'запланироват встречу'),
+    ('tерра поставит задачу', 'поставит задачу'),
+    ('эра создать задачу', 'создать задачу'),
+    ('создать задачу терра отчет', 'создать задачу отчет'),
+])
+def test_wake_word_is_removed(text, expected):
+    assert strip_wake_words(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'новая эра в маркетинге',
+    'купить терка и тетра пак',
+    'заказать терку',
+])
+def test_ordinary_words_are_kept(text):
+    assert strip_wake_words(text) == text
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from utils.jobs import Job, JobError, JobQueue, QueueFullError, SessionLimitError
+
+
+@pytest.fixture
+def jobs():
+    queue = JobQueue(workers=1, max_queue=1, max_per_session=1, result_ttl=60)
+    yield queue
+    queue.shutdown()
+
+
+def test_result_and_failure(jobs):
+    done = jobs.submit(lambda: {'status': 'success'})
+    assert done.done.wait(1)
+    assert done.to_dict() == {'job_id': done.id, 'status': 'done', 'result': {'status': 'success'}}
+
+    def reject():
+        raise JobError({'status': 'error', 'result': 'недоступно'}, 503)
+
+    failed = jobs.submit(reject)
+    assert failed.done.wait(1)
+    assert failed.to_dict() == {'job_id': failed.id, 'status': 'failed', 'error': 'недоступно',
+                                'status_code': 503, 'result': {'status': 'error', 'result': 'недоступно'}}
+
+
+def test_limits(jobs):
+    import threading
+
+    gate = threading.Event()
+    running = jobs.submit(gate.wait, 5)
+    while running.status == Job.PENDING:
+        time.sleep(0.01)
+    jobs.submit(gate.wait, 5, session_id='a')
+    with pytest.raises(SessionLimitError):
+        jobs.submit(gate.wait, 5, session_id='a')
+    with pytest.raises(QueueFullError):
+        jobs.submit(gate.wait, 5, session_id='b')
+    gate.set()
+
+
+def test_stale_results_expire_on_read(jobs, monkeypatch):
+    job = jobs.submit(lambda: 1)
+    assert job.done.wait(1)
+    assert jobs.get(job.id) is job
+
+    later = time.time() + jobs.result_ttl + 1
+    monkeypatch.setattr(time, 'time', lambda: later)
+    assert jobs.get(job.id) is None
+    assert job.id not in jobs._jobs
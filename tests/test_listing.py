@@ -0,0 +1,64 @@
+import time
+
+from utils.listing import VERSIONED_TABLES
+
+CSV = 'name,entity_type\nРомашка,client\nЛютик,supplier\n'
+
+
+def import_csv(client, body=CSV):
+    return client.post('/api/entities/import?format=csv', data=body.encode('utf-8'),
+                       content_type='text/csv').get_json()
+
+
+def create_task(app, client):
+    written = app.write_behind.written
+    client.post('/process_text', json={'text': 'терра создать задачу отчет'})
+    deadline = time.monotonic() + 5
+    # Команда и задача пишутся одной пачкой
+    while app.write_behind.written < written + 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_import_bumps_version_once_per_batch(make_app):
+    client = make_app().test_client()
+    first = client.get('/api/entities')
+    assert first.get_json()['version'] == 0
+
+    assert import_csv(client)['inserted'] == 2
+    second = client.get('/api/entities', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['version'] == 1
+
+    # Только дубли: версия и ETag не меняются
+    assert import_csv(client)['inserted'] == 0
+    assert client.get('/api/entities', headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+
+def test_write_behind_flush_bumps_version(make_app):
+    app = make_app()
+    client = app.test_client()
+    create_task(app, client)
+    assert client.get('/api/tasks').get_json()['version'] == 1
+
+
+def test_if_none_match_overrides_if_modified_since(make_app):
+    app = make_app()
+    client = app.test_client()
+    first = client.get('/api/tasks')
+    create_task(app, client)
+    # Запись в ту же секунду: дата не изменилась, а ETag уже другой
+    response = client.get('/api/tasks', headers={
+        'If-None-Match': first.headers['ETag'],
+        'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT',
+    })
+    assert response.status_code == 200
+    assert response.get_json()['items']
+
+
+def test_no_per_row_triggers(make_app):
+    from models import db
+
+    app = make_app()
+    with db.get_engine(app).connect() as conn:
+        triggers = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+    assert not [name for name, in triggers if name.startswith(tuple(f'{table}_version' for table in VERSIONED_TABLES))]
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+
+from utils.logs import JsonFormatter, LazyQueueHandler
+
+
+def make_logger(name):
+    handler = LazyQueueHandler(queue.Queue())
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [handler]
+    return logger, handler.queue
+
+
+def test_immutable_args_are_formatted_later():
+    logger, records = make_logger('test_logs.lazy')
+    logger.debug("Команда %s: %d", 'task', 3)
+    record = records.get_nowait()
+    assert record.args == ('task', 3)
+    assert record.getMessage() == 'Команда task: 3'
+
+
+def test_mutable_args_are_snapshot():
+    logger, records = make_logger('test_logs.mutable')
+    entities = {'description': 'отчет'}
+    logger.debug("Сущности: %s", entities)
+    entities['description'] = 'изменено'
+    record = records.get_nowait()
+    assert record.args is None
+    assert record.getMessage() == "Сущности: {'description': 'отчет'}"
+
+
+def test_exception_is_rendered_by_the_caller():
+    logger, records = make_logger('test_logs.exc')
+    try:
+        raise ValueError('сбой')
+    except ValueError:
+        logger.error("Ошибка", exc_info=True)
+    record = records.get_nowait()
+    assert record.exc_info is None
+    assert 'ValueError: сбой' in record.exc_text
+    assert 'ValueError: сбой' in json.loads(JsonFormatter().format(record))['exc']
+    assert 'ValueError: сбой' in logging.Formatter().format(record)
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from models import Command, db
+from utils.persistence import WriteBehindQueue
+
+_table = Command.__table__
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "commands.db"}', connect_args={'timeout': 30})
+    db.metadata.create_all(engine, tables=[_table])
+    yield engine
+    engine.dispose()
+
+
+def count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(_table)).scalar()
+
+
+def test_rows_enqueued_during_close_are_written(engine):
+    queue = WriteBehindQueue(lambda: engine, batch_size=50, flush_interval=0.01)
+    started = threading.Barrier(5)
+
+    def producer():
+        started.wait()
+        for i in range(200):
+            queue.enqueue(_table, text=f'команда {i}', command_type='unknown')
+
+    threads = [threading.Thread(target=producer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    queue.close(timeout=None)
+    for thread in threads:
+        thread.join()
+
+    assert queue.dropped == 0 and queue.failed == 0
+    assert queue.written == count(engine) == 800
+
+
+def test_enqueue_after_close_writes_synchronously(engine):
+    queue = WriteBehindQueue(lambda: engine)
+    queue.close()
+    assert queue.enqueue(_table, text='после остановки', command_type='unknown')
+    assert count(engine) == 1
+    assert queue.stats()['written'] == 1
+
+
+def test_full_queue_does_not_serialize_producers(engine):
+    import time
+
+    release = threading.Event()
+
+    def blocked_engine():
+        release.wait(5)
+        return engine
+
+    queue = WriteBehindQueue(blocked_engine, batch_size=1, max_queue=1)
+    queue.enqueue(_table, text='первая', command_type='unknown')
+    deadline = time.monotonic() + 1
+    while queue.depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.enqueue(_table, text='вторая', command_type='unknown')
+
+    results = []
+    producers = [threading.Thread(target=lambda: results.append(
+        queue.enqueue(_table, timeout=0.2, text='лишняя', command_type='unknown'))) for _ in range(8)]
+    started = time.monotonic()
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    release.set()
+    queue.close(timeout=None)
+    assert results == [False] * 8
+    # Ожидания идут параллельно, а не по очереди (8 x 0.2 с)
+    assert elapsed < 0.8
+    assert queue.written == count(engine) == 2
@@ -0,0 +1,60 @@
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from utils.audio import AudioUpload
+from utils.preprocessing import preprocess_audio, write_wav
+
+RATE = 48000
+
+
+def tone_wav(seconds_silence=0.5, seconds_tone=0.5):
+    silence = np.zeros(int(RATE * seconds_silence), dtype=np.float32)
+    tone = 0.5 * np.sin(np.arange(int(RATE * seconds_tone), dtype=np.float32) * 0.05)
+    return write_wav(np.concatenate([silence, tone, silence]), RATE)
+
+
+def test_trims_silence_and_resamples():
+    result = preprocess_audio(AudioUpload.from_bytes(tone_wav(), 'audio.wav'))
+    with wave.open(result.upload.stream, 'rb') as wav:
+        assert wav.getframerate() == 16000
+    assert result.seconds_before == pytest.approx(1.5)
+    assert result.seconds_after < 1.0
+
+
+def corrupted_headers():
+    data = tone_wav()
+    return {
+        'truncated': data[:30],
+        'zero_rate': data[:24] + struct.pack('<I', 0) + data[28:],
+        'zero_channels': data[:22] + struct.pack('<H', 0) + data[24:],
+        'short_fmt': data[:16] + struct.pack('<I', 2) + data[20:22] + data[36:],
+    }
+
+
+@pytest.mark.parametrize('name', sorted(corrupted_headers()))
+def test_corrupted_header_falls_back_to_original(name):
+    data = corrupted_headers()[name]
+    upload = AudioUpload.from_bytes(data, 'audio.wav')
+    assert preprocess_audio(upload) is None
+    assert upload.stream.tell() == 0
+    assert upload.stream.read() == data
+
+
+def test_oversized_data_chunk_reads_available_frames():
+    data = tone_wav()
+    corrupted = data[:40] + struct.pack('<I', 0xffffffff) + data[44:]
+    result = preprocess_audio(AudioUpload.from_bytes(corrupted, 'audio.wav'))
+    assert result.seconds_before == pytest.approx(1.5)
+
+
+def test_decoder_errors_fall_back(monkeypatch):
+    def fail(self, count):
+        raise MemoryError
+    monkeypatch.setattr(wave.Wave_read, 'readframes', fail)
+    data = tone_wav()
+    upload = AudioUpload.from_bytes(data, 'audio.wav')
+    assert preprocess_audio(upload) is None
+    assert upload.stream.read() == data
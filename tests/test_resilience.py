@@ -0,0 +1,208 @@
+import io
+import threading
+import time
+
+import pytest
+
+from utils.audio import AudioUpload
+from utils.resilience import CircuitBreaker
+from utils.stt import ResilientBackend, STTBackend, STTTimeoutError, STTUnavailableError, StubBackend, \
+    create_stt_backend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ServiceError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+
+class ScriptedBackend(STTBackend):
+    """Отвечает по сценарию: текст, исключение или Event, которого нужно дождаться"""
+    name = 'scripted'
+
+    def __init__(self, *script):
+        super().__init__()
+        self.script = list(script)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def transcribe(self, upload, timeout=None):
+        with self._lock:
+            self.calls.append(time.monotonic())
+            step = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(step, threading.Event):
+            step.wait(5)
+            return 'поздний ответ'
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+
+def upload():
+    return AudioUpload.from_bytes(b'audio', 'audio.webm')
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    # Пауза перед повтором случайна; в тестах повтор идет сразу
+    monkeypatch.setattr('utils.stt.random.uniform', lambda low, high: 0.0)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=4, failure_ratio=0.5, min_calls=2, cooldown=10, clock=clock)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.advance(4)
+    assert breaker.retry_after == 6
+
+    clock.advance(6)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # Пробный вызов только один
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+    assert breaker.stats() == {'open': 0, 'trips': 1, 'window_failures': 0}
+
+
+def test_breaker_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=4, min_calls=1, cooldown=10, clock=clock)
+    breaker.record(False)
+    clock.advance(10)
+    assert breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after == 10
+    assert breaker.stats()['trips'] == 2
+
+
+def test_open_breaker_short_circuits():
+    primary = ScriptedBackend('текст')
+    breaker = CircuitBreaker(min_calls=1, cooldown=30, clock=FakeClock())
+    breaker.record(False)
+    backend = ResilientBackend(primary, breaker=breaker)
+
+    with pytest.raises(STTUnavailableError) as info:
+        backend.transcribe(upload())
+    assert info.value.retry_after == 30
+    assert primary.calls == []
+
+
+def test_retryable_errors_are_retried():
+    primary = ScriptedBackend(ServiceError(503), ServiceError(429), 'текст')
+    backend = ResilientBackend(primary, retries=2)
+
+    assert backend.transcribe(upload()) == 'текст'
+    assert len(primary.calls) == 3
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_request_errors_are_not_retried():
+    error = ServiceError(400)
+    primary = ScriptedBackend(error, 'текст')
+    backend = ResilientBackend(primary, retries=2)
+
+    with pytest.raises(ServiceError) as info:
+        backend.transcribe(upload())
+    assert info.value is error
+    assert len(primary.calls) == 1
+    # Ошибка запроса не размыкает предохранитель
+    assert backend.breaker.stats()['window_failures'] == 0
+
+
+def test_exhausted_retries_raise_unavailable():
+    primary = ScriptedBackend(ServiceError(503))
+    backend = ResilientBackend(primary, retries=2)
+
+    with pytest.raises(STTUnavailableError) as info:
+        backend.transcribe(upload())
+    assert not isinstance(info.value, STTTimeoutError)
+    assert isinstance(info.value.__cause__, ServiceError)
+    assert len(primary.calls) == 3
+
+
+def test_hedge_fires_after_p95_and_first_answer_wins():
+    slow = threading.Event()
+    primary = ScriptedBackend(slow, 'быстрый ответ')
+    backend = ResilientBackend(primary, timeout_base=2.0, timeout_per_second=0.0, hedge=True, hedge_min_delay=0.0)
+    for _ in range(backend.latencies.min_samples):
+        backend.latencies.add(0.05)
+    # p95 - 5% срока в 2 с
+    assert backend.hedge_delay(2.0) == pytest.approx(0.1)
+
+    try:
+        assert backend.transcribe(upload()) == 'быстрый ответ'
+    finally:
+        slow.set()
+    first, second = primary.calls
+    assert second - first >= 0.1
+
+
+def test_no_hedge_without_latency_samples():
+    primary = ScriptedBackend('текст')
+    backend = ResilientBackend(primary, hedge=True)
+    assert backend.hedge_delay(5.0) is None
+    assert backend.transcribe(upload()) == 'текст'
+    assert len(primary.calls) == 1
+
+
+def test_deadline_raises_timeout_instead_of_hanging():
+    hang = threading.Event()
+    primary = ScriptedBackend(hang)
+    backend = ResilientBackend(primary, timeout_base=0.3, timeout_per_second=0.0, min_attempt_timeout=0.1)
+
+    started = time.monotonic()
+    try:
+        with pytest.raises(STTTimeoutError):
+            backend.transcribe(upload())
+    finally:
+        hang.set()
+    assert time.monotonic() - started < 1.0
+
+
+def test_deadline_returns_504(make_app):
+    app = make_app()
+    gated = app.stt
+    gated.gate.clear()
+    app.stt = ResilientBackend(gated, timeout_base=0.3, timeout_per_second=0.0, min_attempt_timeout=0.1)
+    try:
+        audio = (io.BytesIO('терра привет'.encode('utf-8')), 'audio.webm')
+        response = app.test_client().post('/process_audio', data={'audio': audio})
+    finally:
+        app.stt = gated
+    assert response.status_code == 504
+
+
+def test_fallback_is_off_by_default(make_app):
+    app = make_app(STT_BACKEND='whisper', OPENAI_API_KEY='test')
+    backend = create_stt_backend(app.config)
+    assert isinstance(backend, ResilientBackend)
+    assert backend.fallback is None
+
+    backend.primary = ScriptedBackend(ServiceError(503))
+    with pytest.raises(STTUnavailableError):
+        backend.transcribe(AudioUpload.from_bytes('терра привет'.encode('utf-8')))
+
+
+def test_fallback_answers_when_enabled():
+    backend = ResilientBackend(ScriptedBackend(ServiceError(503)), fallback=StubBackend(), retries=0)
+    assert backend.transcribe(AudioUpload.from_bytes('терра привет'.encode('utf-8'))) == 'терра привет'
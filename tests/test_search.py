@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from models import BusinessEntity, Task, db
+from utils.search import SearchIndex
+from utils.storage import _apply_sqlite_pragmas
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "search.db"}')
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    db.metadata.create_all(engine, tables=[Task.__table__, BusinessEntity.__table__])
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(Task.__table__.insert(), [
+            {'title': 'Отчет по продажам', 'description': 'квартальный', 'created_at': now},
+            {'title': 'Позвонить поставщику', 'description': None, 'created_at': now},
+        ])
+        conn.execute(BusinessEntity.__table__.insert(), [
+            {'name': 'Ромашка', 'entity_type': 'client', 'description': 'ОТЧЕТЫ по договору', 'created_at': now},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def index_without_fts(engine):
+    # Как при DB_CREATE_SCHEMA=0 до создания FTS-таблиц или после ошибки ensure_schema
+    index = SearchIndex()
+    index.engine_getter = lambda: engine
+    index.fts_enabled = False
+    return index
+
+
+def test_like_fallback_on_sqlite(engine):
+    hits = index_without_fts(engine).search('отчеты')
+    assert sorted((hit.kind, hit.title) for hit in hits) == [('entity', 'Ромашка'), ('task', 'Отчет по продажам')]
+
+
+def test_like_fallback_respects_kinds_and_all_terms(engine):
+    index = index_without_fts(engine)
+    assert [hit.title for hit in index.search('отчет', kinds=('task',))] == ['Отчет по продажам']
+    assert index.search('отчет поставщику') == []
+
+
+def test_fts_and_fallback_agree(engine):
+    fts = SearchIndex()
+    fts.engine_getter = lambda: engine
+    fts.fts_enabled = fts.ensure_schema(engine)
+    assert fts.fts_enabled
+    assert ({hit.title for hit in fts.search('отчеты')}
+            == {hit.title for hit in index_without_fts(engine).search('отчеты')})
+
+
+def test_search_command_without_fts(make_app, monkeypatch):
+    from utils.search import search_index
+
+    app = make_app()
+    monkeypatch.setattr(search_index, 'fts_enabled', False)
+    payload = app.test_client().post('/process_text', json={'text': 'найди задачу отчет'}).get_json()
+    assert payload['command_type'] == 'search'
+    assert 'ошибка' not in payload['result']
@@ -0,0 +1,69 @@
+from utils.session_store import DialogContextStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_max_sessions_is_global():
+    store = DialogContextStore(max_sessions=10, shards=4, clock=FakeClock())
+    for index in range(100):
+        store.get(f'session-{index}')
+        assert len(store) <= 10
+    assert store.stats()['sessions'] == 10
+    assert store.evicted == 90
+
+
+def test_least_recently_used_session_is_evicted():
+    clock = FakeClock()
+    store = DialogContextStore(max_sessions=3, shards=8, clock=clock)
+    for session_id in ('a', 'b', 'c'):
+        store.get(session_id)
+    store.get('a')
+    store.get('d')
+
+    remaining = {session_id for shard in store._shards for session_id in shard.entries}
+    assert remaining == {'a', 'c', 'd'}
+
+
+def test_expired_session_starts_over():
+    clock = FakeClock()
+    store = DialogContextStore(max_sessions=3, ttl=10, clock=clock)
+    context = store.get('a')
+    clock.now = 11
+    assert store.get('a') is not context
+    assert store.expired == 1
+
+
+def test_body_session_id_is_ignored(make_app):
+    app = make_app()
+    client = app.test_client()
+    client.post('/process_text', json={'text': 'терра привет', 'session_id': 'victim'},
+                headers={'X-Session-Id': 'attacker'})
+    assert app.dialog_contexts.get('attacker').context_history
+    assert not app.dialog_contexts.get('victim').context_history
+
+
+def test_sqlite_conflict_appends_only_new_records(tmp_path):
+    from utils.session_store import SQLiteDialogContextStore
+
+    store = SQLiteDialogContextStore(str(tmp_path / 'sessions.db'))
+    with store.session('s') as context:
+        for index in range(context.max_context_length):
+            context.update_context(f'old-{index}', {})
+
+    with store.session('s') as context:
+        # Другой воркер успевает записать сессию, пока этот запрос ее разбирает
+        other = SQLiteDialogContextStore(store.path)
+        with other.session('s') as concurrent:
+            concurrent.update_context('other', {})
+        # История полна: новая запись вытесняет самую старую загруженную
+        context.update_context('mine', {})
+
+    history = [record.command_type for record in store.get('s').context_history]
+    assert history == ['old-2', 'old-3', 'old-4', 'other', 'mine']
+    assert store.conflicts == 1
@@ -0,0 +1,74 @@
+import io
+import logging
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+from flask import Request, current_app
+from werkzeug.datastructures import FileStorage
+
+logger = logging.getLogger(__name__)
+
+# Загрузки меньше порога держим в памяти, больше - сбрасываем на диск
+DEFAULT_SPOOL_THRESHOLD = 4 * 1024 * 1024
+
+
+class AudioRequest(Request):
+    """Request that keeps uploaded files in memory up to AUDIO_SPOOL_THRESHOLD.
+
+    Werkzeug по умолчанию пишет на диск каждую загрузку больше 500KB;
+    SpooledTemporaryFile остается в памяти до порога из конфигурации.
+    """
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None, content_length: Optional[int] = None) -> BinaryIO:
+        threshold = current_app.config.get('AUDIO_SPOOL_THRESHOLD', DEFAULT_SPOOL_THRESHOLD)
+        return tempfile.SpooledTemporaryFile(max_size=threshold, mode='w+b')
+
+
+class AudioUpload:
+    """Загруженное аудио, передаваемое в распознавание без промежуточных файлов"""
+    __slots__ = ('filename', 'stream')
+
+    def __init__(self, filename: str, stream: BinaryIO):
+        self.filename = filename
+        self.stream = stream
+
+    @classmethod
+    def from_bytes(cls, data: bytes, filename: str = 'audio.webm') -> 'AudioUpload':
+        return cls(filename, io.BytesIO(data))
+
+    @classmethod
+    def detach(cls, file_storage: FileStorage) -> 'AudioUpload':
+        """Takes ownership of the upload stream so it outlives the request.
+
+        Flask закрывает файлы запроса после ответа; подменяем поток пустым,
+        чтобы фоновое задание могло дочитать исходный без копирования.
+        """
+        stream = file_storage.stream
+        file_storage.stream = io.BytesIO()
+        return cls(file_storage.filename or 'audio.webm', stream)
+
+    @property
+    def is_in_memory(self) -> bool:
+        if isinstance(self.stream, tempfile.SpooledTemporaryFile):
+            return not self.stream._rolled
+        return isinstance(self.stream, io.BytesIO)
+
+    @property
+    def is_wav(self) -> bool:
+        """RIFF/WAVE по заголовку, без учета расширения файла"""
+        self.stream.seek(0)
+        header = self.stream.read(12)
+        self.stream.seek(0)
+        return header[:4] == b'RIFF' and header[8:12] == b'WAVE'
+
+    def as_file(self) -> Tuple[str, BinaryIO]:
+        """Returns a (filename, stream) pair rewound to the beginning"""
+        self.stream.seek(0)
+        return self.filename, self.stream
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        except Exception as e:
+            logger.error(f"Error closing audio stream: {str(e)}")
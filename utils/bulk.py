@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Insert
+
+from models import BusinessEntity, db
+from utils.listing import bump_table_versions
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+# Поля, которые принимаются при импорте и выгружаются при экспорте
+IMPORT_FIELDS = ('name', 'entity_type', 'description', 'contact_info', 'status')
+EXPORT_FIELDS = ('id',) + IMPORT_FIELDS + ('created_at',)
+
+DEFAULT_CHUNK_SIZE = 5000
+# Ключи для проверки дублей и строки INSERT передаются порциями:
+# SQLite ограничивает число параметров в одном запросе
+_LOOKUP_BATCH = 500
+_MAX_REPORTED_ERRORS = 100
+
+_table = BusinessEntity.__table__
+_LIMITS = {column.name: column.type.length for column in _table.columns
+           if getattr(column.type, 'length', None)}
+
+
+class ImportReport:
+    """Итоги импорта; ошибки хранятся только для первых строк"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': self.rows_per_sec,
+        }
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Читает строки CSV (с заголовком) или JSONL по одной.
+
+    Нераспознанная строка JSONL передается дальше как исключение, чтобы
+    импорт учел ее как ошибочную и продолжил работу.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield ValueError(f'invalid JSON: {str(e)}')
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def validate_row(row: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Возвращает очищенную строку или текст ошибки"""
+    if isinstance(row, Exception):
+        return None, str(row)
+    if not isinstance(row, dict):
+        return None, 'row is not an object'
+    values = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if value is not None:
+            value = str(value).strip() or None
+        if value is not None and field in _LIMITS and len(value) > _LIMITS[field]:
+            return None, f'{field} is longer than {_LIMITS[field]} characters'
+        values[field] = value
+    if not values['name']:
+        return None, 'name is required'
+    if not values['entity_type']:
+        return None, 'entity_type is required'
+    values['entity_type'] = values['entity_type'].lower()
+    values['status'] = values['status'] or 'active'
+    return values, None
+
+
+def _existing_keys(conn, keys: List[Tuple[str, str]]) -> set:
+    found = set()
+    for offset in range(0, len(keys), _LOOKUP_BATCH):
+        batch = keys[offset:offset + _LOOKUP_BATCH]
+        query = select(_table.c.name, _table.c.entity_type).where(
+            tuple_(_table.c.name, _table.c.entity_type).in_(batch)
+        )
+        found.update(tuple(row) for row in conn.execute(query))
+    return found
+
+
+def _insert_ignoring_duplicates(dialect_name: str) -> Optional[Insert]:
+    """INSERT, который пропускает строки с уже занятым (name, entity_type)"""
+    # Без указания индекса: если уникальный индекс не создан из-за старых
+    # дублей, вставка все равно выполняется
+    if dialect_name == 'postgresql':
+        return postgresql.insert(_table).on_conflict_do_nothing()
+    if dialect_name == 'sqlite':
+        return sqlite.insert(_table).on_conflict_do_nothing()
+    return None
+
+
+def _insert_rows(conn, statement: Insert, rows: List[Dict[str, Any]]) -> int:
+    """Вставляет строки и возвращает число действительно вставленных"""
+    if not rows:
+        return 0
+    if conn.dialect.supports_sane_multi_rowcount:
+        return conn.execute(statement, rows).rowcount
+    # executemany в psycopg2 не сообщает точный rowcount, а многострочный
+    # INSERT ... VALUES сообщает
+    inserted = 0
+    for offset in range(0, len(rows), _LOOKUP_BATCH):
+        inserted += conn.execute(statement.values(rows[offset:offset + _LOOKUP_BATCH])).rowcount
+    return inserted
+
+
+def _chunks(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_entities(engine: Engine, rows: Iterable[Any], chunk_size: int = DEFAULT_CHUNK_SIZE) -> ImportReport:
+    """Импортирует сущности порциями; дубли по (name, entity_type) пропускаются.
+
+    Каждая порция проверяется, очищается от дублей внутри себя и
+    вставляется в отдельной транзакции, поэтому память ограничена размером
+    порции, а сбой не откатывает уже записанные порции. Дубли в базе
+    отсекает уникальный индекс через ON CONFLICT DO NOTHING, поэтому
+    параллельный импорт тех же строк не создает повторов; для других СУБД
+    ключи проверяются запросом перед вставкой.
+    """
+    report = ImportReport()
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            valid: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            for row in chunk:
+                report.rows += 1
+                values, error = validate_row(row)
+                if error:
+                    report.invalid += 1
+                    if len(report.errors) < _MAX_REPORTED_ERRORS:
+                        report.errors.append({'row': report.rows, 'error': error})
+                    continue
+                key = (values['name'], values['entity_type'])
+                if key in valid:
+                    report.duplicates += 1
+                else:
+                    valid[key] = values
+            if not valid:
+                continue
+
+            now = datetime.utcnow()
+            with engine.begin() as conn:
+                statement = _insert_ignoring_duplicates(conn.dialect.name)
+                if statement is None:
+                    existing = _existing_keys(conn, list(valid))
+                    statement = _table.insert()
+                else:
+                    existing = set()
+                new_rows = [dict(values, created_at=now) for key, values in valid.items() if key not in existing]
+                inserted = _insert_rows(conn, statement, new_rows)
+                if inserted:
+                    bump_table_versions(conn, [_table.name])
+            report.duplicates += len(valid) - inserted
+            report.inserted += inserted
+            logger.debug(f"Imported chunk: {inserted} inserted, {len(valid) - inserted} already present")
+    finally:
+        report.seconds = time.perf_counter() - report.started
+    logger.info(f"Business entity import: {report.inserted} inserted, {report.duplicates} duplicates, "
+                f"{report.invalid} invalid, {report.rows_per_sec} rows/sec")
+    return report
+
+
+def export_entities(engine: Engine, fmt: str, entity_type: Optional[str] = None,
+                    batch_size: int = 1000, stats: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Выгружает сущности частями через серверный курсор; итоги пишутся в stats"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+    query = select(*[_table.c[field] for field in EXPORT_FIELDS]).order_by(_table.c.id)
+    if entity_type:
+        query = query.where(_table.c.entity_type == entity_type)
+
+    started = time.perf_counter()
+    count = 0
+    if fmt == 'csv':
+        yield ','.join(EXPORT_FIELDS) + '\r\n'
+    with engine.connect() as conn:
+        # stream_results включает именованный курсор в psycopg2;
+        # SQLite и так читает строки по мере обхода
+        result = conn.execution_options(stream_results=True).execute(query)
+        for partition in result.partitions(batch_size):
+            buffer = io.StringIO()
+            if fmt == 'csv':
+                writer = csv.writer(buffer)
+                for row in partition:
+                    writer.writerow(row)
+            else:
+                for row in partition:
+                    buffer.write(json.dumps(dict(row._mapping), ensure_ascii=False, default=str) + '\n')
+            count += len(partition)
+            yield buffer.getvalue()
+
+    seconds = time.perf_counter() - started
+    rows_per_sec = round(count / seconds, 1) if seconds else 0.0
+    if stats is not None:
+        stats.update(rows=count, seconds=round(seconds, 3), rows_per_sec=rows_per_sec)
+    logger.info(f"Business entity export: {count} rows, {rows_per_sec} rows/sec")
+
+
+def _format_for(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+entities_cli = AppGroup('entities', help='Bulk import and export of business entities.')
+
+
+@entities_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='По умолчанию определяется по расширению')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+def import_command(path: str, fmt: Optional[str], chunk_size: int) -> None:
+    """Import business entities from a CSV or JSONL file"""
+    with open(path, encoding='utf-8', newline='') as stream:
+        report = import_entities(db.get_engine(current_app), read_rows(stream, _format_for(path, fmt)), chunk_size)
+    click.echo(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+
+
+@entities_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='По умолчанию определяется по расширению')
+@click.option('--type', 'entity_type', help='Только сущности этого типа')
+def export_command(path: str, fmt: Optional[str], entity_type: Optional[str]) -> None:
+    """Export business entities to a CSV or JSONL file"""
+    stats: Dict[str, Any] = {}
+    with open(path, 'w', encoding='utf-8', newline='') as stream:
+        for part in export_entities(db.get_engine(current_app), _format_for(path, fmt), entity_type, stats=stats):
+            stream.write(part)
+    click.echo(json.dumps(stats, indent=2))
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import random
+from collections import Counter
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = 'unknown'
+DEFAULT_N_FEATURES = 2 ** 16
+DEFAULT_NGRAM_RANGE = (2, 4)
+
+# Нейтральные слова для обучающих примеров: ими фразы команд обрастают
+# в живой речи, из них же составлены примеры класса unknown
+_NEUTRAL_WORDS = (
+    'пожалуйста', 'нужно', 'надо', 'сегодня', 'вечером', 'утром', 'потом', 'быстро', 'очень',
+    'мне', 'нам', 'для', 'отдела', 'команды', 'новый', 'наш', 'этот', 'все', 'еще', 'уже',
+    'как', 'что', 'где', 'когда', 'почему', 'да', 'нет', 'хорошо', 'ладно', 'спасибо',
+    'погода', 'дела', 'время', 'день', 'неделя', 'вопрос', 'идея', 'музыка', 'кофе', 'обед',
+    'можно', 'будет', 'было', 'есть', 'сказать', 'думаю', 'кажется', 'наверное', 'просто', 'так',
+    'ну', 'вот', 'это', 'там', 'тут', 'про', 'после', 'перед', 'вместе', 'сразу',
+)
+_PREFIXES = ('', 'терра ', 'пожалуйста ', 'нужно ', 'давай ', 'терра пожалуйста ')
+
+
+def patterns_fingerprint(patterns: Mapping[str, Iterable[str]], n_features: int,
+                         ngram_range: Tuple[int, int]) -> str:
+    """Хэш таблицы фраз и параметров признаков: изменился - модель переобучается"""
+    payload = json.dumps({
+        'patterns': {intent: sorted(phrases) for intent, phrases in sorted(patterns.items())},
+        'n_features': n_features,
+        'ngram_range': list(ngram_range),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def training_samples(patterns: Mapping[str, Iterable[str]], per_phrase: int = 12,
+                     seed: int = 0) -> Tuple[List[str], List[str]]:
+    """Обучающие примеры: фразы команд в окружении нейтральных слов и класс unknown"""
+    rng = random.Random(seed)
+    texts: List[str] = []
+    labels: List[str] = []
+
+    def filler(count: int) -> str:
+        return ' '.join(rng.choice(_NEUTRAL_WORDS) for _ in range(count))
+
+    for intent, phrases in patterns.items():
+        for phrase in phrases:
+            texts.append(phrase)
+            labels.append(intent)
+            for _ in range(per_phrase):
+                text = f'{rng.choice(_PREFIXES)}{filler(rng.randint(0, 2))} {phrase} {filler(rng.randint(0, 6))}'
+                texts.append(' '.join(text.split()))
+                labels.append(intent)
+
+    total = len(texts)
+    for _ in range(max(200, total // len(patterns))):
+        texts.append(f'{rng.choice(_PREFIXES)}{filler(rng.randint(1, 8))}'.strip())
+        labels.append(UNKNOWN)
+    return texts, labels
+
+
+class IntentClassifier:
+    """Linear intent model over hashed character n-grams.
+
+    Признаки не требуют словаря (HashingVectorizer), поэтому модель - это
+    только матрица весов: она хранится в .npy и загружается через mmap,
+    а описание классов и параметров лежит рядом в .json.
+    """
+
+    def __init__(self, classes: Sequence[str], coef: np.ndarray, intercept: np.ndarray,
+                 n_features: int = DEFAULT_N_FEATURES, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE,
+                 threshold: float = 0.5, fingerprint: Optional[str] = None):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.classes = [str(name) for name in classes]
+        self.coef = coef
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.threshold = threshold
+        self.fingerprint = fingerprint
+        self.vectorizer = HashingVectorizer(
+            analyzer='char_wb', ngram_range=self.ngram_range, n_features=n_features,
+            alternate_sign=False, norm='l2', dtype=np.float32
+        )
+        self._analyzer = self.vectorizer.build_analyzer()
+
+    @classmethod
+    def train(cls, patterns: Mapping[str, Iterable[str]], n_features: int = DEFAULT_N_FEATURES,
+              ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE, threshold: float = 0.5) -> 'IntentClassifier':
+        """Обучает логистическую регрессию (SGD) на фразах из таблицы шаблонов"""
+        from sklearn.linear_model import SGDClassifier
+
+        texts, labels = training_samples(patterns)
+        model = cls([], np.zeros((0, n_features), dtype=np.float32), np.zeros(0), n_features, ngram_range)
+        features = model.vectorizer.transform(texts)
+        # SGD обучается за десятки миллисекунд, поэтому модель можно
+        # переобучить при запуске, если таблица фраз изменилась
+        regression = SGDClassifier(loss='log_loss', alpha=1e-5, max_iter=50, tol=1e-4, random_state=0)
+        regression.fit(features, labels)
+
+        logger.info(f"Intent classifier trained on {len(texts)} samples, {len(regression.classes_)} classes")
+        return cls(regression.classes_, regression.coef_.astype(np.float32), regression.intercept_,
+                   n_features, ngram_range, threshold, patterns_fingerprint(patterns, n_features, ngram_range))
+
+    def save(self, path: str) -> None:
+        """Пишет веса в path.npy и параметры в path.json"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(f'{path}.npy', np.ascontiguousarray(self.coef, dtype=np.float32))
+        with open(f'{path}.json', 'w', encoding='utf-8') as fh:
+            json.dump({
+                'classes': self.classes,
+                'intercept': self.intercept.tolist(),
+                'n_features': self.n_features,
+                'ngram_range': list(self.ngram_range),
+                'fingerprint': self.fingerprint,
+            }, fh, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.5) -> 'IntentClassifier':
+        """Загружает модель; веса отображаются в память, а не читаются целиком"""
+        with open(f'{path}.json', encoding='utf-8') as fh:
+            meta = json.load(fh)
+        coef = np.load(f'{path}.npy', mmap_mode='r')
+        return cls(meta['classes'], coef, meta['intercept'], meta['n_features'],
+                   tuple(meta['ngram_range']), threshold, meta.get('fingerprint'))
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Вероятности классов для всех текстов одним матричным умножением"""
+        features = self.vectorizer.transform(texts)
+        scores = features @ self.coef.T + self.intercept
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """(intent, вероятность) для каждого текста; неуверенные ответы - unknown"""
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        results = []
+        for row, index in enumerate(best):
+            probability = float(probabilities[row, index])
+            intent = self.classes[index] if probability >= self.threshold else UNKNOWN
+            results.append((intent, probability))
+        return results
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Один текст без накладных расходов HashingVectorizer.transform.
+
+        Признаки считаются так же, как в transform (murmurhash n-грамм,
+        L2-нормировка), но умножаются только нужные столбцы весов.
+        """
+        from sklearn.utils import murmurhash3_32
+
+        counts = Counter(abs(murmurhash3_32(gram, seed=0)) % self.n_features for gram in self._analyzer(text))
+        if counts:
+            columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            values /= np.sqrt(np.dot(values, values))
+            scores = self.coef[:, columns] @ values + self.intercept
+        else:
+            scores = self.intercept.copy()
+        scores = np.exp(scores - scores.max())
+        index = int(scores.argmax())
+        probability = float(scores[index] / scores.sum())
+        return (self.classes[index] if probability >= self.threshold else UNKNOWN), probability
+
+
+def load_or_train(path: str, patterns: Mapping[str, Iterable[str]], threshold: float = 0.5) -> IntentClassifier:
+    """Загружает сохраненную модель или обучает новую, если таблица фраз изменилась"""
+    fingerprint = patterns_fingerprint(patterns, DEFAULT_N_FEATURES, DEFAULT_NGRAM_RANGE)
+    if os.path.exists(f'{path}.json') and os.path.exists(f'{path}.npy'):
+        try:
+            classifier = IntentClassifier.load(path, threshold)
+            if classifier.fingerprint == fingerprint:
+                logger.info(f"Intent classifier loaded from {path}")
+                return classifier
+            logger.info("Command patterns changed, retraining intent classifier")
+        except Exception as e:
+            logger.warning(f"Failed to load intent classifier from {path}: {str(e)}")
+
+    classifier = IntentClassifier.train(patterns, threshold=threshold)
+    try:
+        classifier.save(path)
+    except OSError as e:
+        logger.warning(f"Failed to save intent classifier to {path}: {str(e)}")
+    return classifier
@@ -1,53 +1,76 @@
 import logging
-import re
-from datetime import datetime, timedelta
-from typing import Dict
+from datetime import datetime
+from typing import Callable, Dict, Mapping, Tuple
+
+from utils.commands import CommandRegistry, CommandSpec, registry
+from utils.entities import EntityRecord
+from utils.metrics import COMMAND_ERRORS, COMMANDS
+from utils.search import search_index
 
 logger = logging.getLogger(__name__)
 
 class CommandProcessor:
-    def __init__(self):
+    def __init__(self, commands: CommandRegistry = registry):
         self.context = {}
+        # Таблица обработчиков строится один раз: тип команды -> (обработчик, описание)
+        handlers = {
+            'greeting': self._greeting,
+            'task': self._task,
+            'search': self._search,
+            'business': self._business,
+        }
+        # Команды без обработчика в таблицу не попадают и получают ответ "не распознал"
+        self.dispatch: Dict[str, Tuple[Callable[[CommandSpec, Mapping], str], CommandSpec]] = {
+            spec.name: (handlers[spec.handler], spec) for spec in commands if spec.handler is not None
+        }
     
-    def process_command(self, command_type: str, entities: Dict) -> str:
+    def process_command(self, command_type: str, entities: Mapping) -> str:
         """Process the command based on its type and context"""
-        logger.info(f"Processing command of type: {command_type} with entities: {entities}")
+        logger.debug("Processing command of type: %s with entities: %s", command_type, entities)
+        COMMANDS.inc(command_type)
         
-        try:
-            # Приветствие с учетом времени суток
-            if command_type == 'greeting':
-                hour = datetime.now().hour
-                greeting = (
-                    "Доброе утро" if 5 <= hour < 12
-                    else "Добрый день" if 12 <= hour < 17
-                    else "Добрый вечер" if 17 <= hour < 23
-                    else "Доброй ночи"
-                )
-                return f"{greeting}! Я - ваш бизнес-ассистент ТЕРРА. Чем могу помочь?"
-            
-            elif command_type == 'task_creation':
-                return format_task_creation(entities.get('description', ''))
-            
-            # Обработка бизнес-команд
-            business_commands = [
-                'marketing', 'client', 'supplier', 'contract',
-                'quality', 'risk', 'strategy', 'compliance',
-                'innovation', 'document', 'search', 'contact',
-                'project', 'analytics', 'employee'
-            ]
-            
-            if command_type in business_commands:
-                return format_business_command(command_type, entities.get('description', ''))
-            
+        entry = self.dispatch.get(command_type)
+        if entry is None:
             return "Извините, я не распознал команду. Пожалуйста, попробуйте переформулировать."
-            
+        
+        try:
+            handler, spec = entry
+            return handler(spec, entities)
         except Exception as e:
             logger.error(f"Error processing command: {str(e)}", exc_info=True)
+            COMMAND_ERRORS.inc(command_type)
             return f"Произошла ошибка при обработке команды: {str(e)}"
 
+    def _greeting(self, spec: CommandSpec, entities: Mapping) -> str:
+        # Приветствие с учетом времени суток
+        hour = datetime.now().hour
+        greeting = (
+            "Доброе утро" if 5 <= hour < 12
+            else "Добрый день" if 12 <= hour < 17
+            else "Добрый вечер" if 17 <= hour < 23
+            else "Доброй ночи"
+        )
+        return f"{greeting}! Я - ваш бизнес-ассистент ТЕРРА. Чем могу помочь?"
+
+    def _task(self, spec: CommandSpec, entities: Mapping) -> str:
+        # Сущности уже извлечены в DialogContext; повторно разбираем
+        # описание только для вызовов со старым словарем
+        if isinstance(entities, EntityRecord):
+            return format_task(entities)
+        return format_task_creation(entities.get('description', ''))
+
+    def _search(self, spec: CommandSpec, entities: Mapping) -> str:
+        # Без поискового индекса поиск обрабатывается как обычная бизнес-команда
+        if search_index.ready:
+            return format_search(entities.get('query') or '', entities.get('scope'))
+        return self._business(spec, entities)
+
+    def _business(self, spec: CommandSpec, entities: Mapping) -> str:
+        return _render_business(spec, entities.get('description') or '')
+
 command_processor = CommandProcessor()
 
-def process_command(command_type: str, entities: Dict) -> str:
+def process_command(command_type: str, entities: Mapping) -> str:
     """Global function to process commands"""
     return command_processor.process_command(command_type, entities)
 
@@ -56,71 +79,22 @@ def format_task_creation(description: str) -> str:
     if not description:
         return "Пожалуйста, укажите описание задачи"
 
-    logger.info(f"Исходный текст задачи: '{description}'")
-    
-    priority = 'высокий' if 'срочн' in description.lower() else 'обычный'
-    logger.info(f"Определен приоритет: {priority}")
-    
-    cleaners = [
-        r't?[еэ]рр?а?[,]?\s*',
-        r'создай(?:те)?\s+',
-        r'создать\s+',
-        r'добавь(?:те)?\s+',
-        r'добавить\s+',
-        r'постав(?:ь|ите)?\s+',
-        r'срочную?\s+',
-        r'важную?\s+',
-        r'критичную?\s+',
-        r'задачу\s*',
-        r'поручение\s*',
-        r'^[\s,\-–]+',
-        r'[\s,\-–]+$'
-    ]
-    
-    for pattern in cleaners:
-        old_text = description
-        description = re.sub(pattern, '', description, flags=re.IGNORECASE)
-        if old_text != description:
-            logger.info(f"Применен паттерн очистки: '{pattern}' -> '{description}'")
-    
-    task_date = None
-    date_words = {
-        'завтра': timedelta(days=1),
-        'послезавтра': timedelta(days=2),
-        'через день': timedelta(days=1),
-        'через неделю': timedelta(weeks=1),
-        'через месяц': timedelta(days=30)
-    }
-    
-    for word, delta in date_words.items():
-        if word in description.lower():
-            task_date = datetime.now() + delta
-            description = description.replace(word, '').strip()
-            logger.info(f"Найдена дата по слову '{word}': {task_date}")
-            break
-    
-    time_match = re.search(r'в\s+(\d{1,2})(?:[:.:](\d{2}))?\s*(?:час[оа]в?|час|ч)?', description)
-    if time_match:
-        hours = int(time_match.group(1))
-        minutes = int(time_match.group(2)) if time_match.group(2) else 0
-        
-        if 0 <= hours <= 23 and 0 <= minutes <= 59:
-            if task_date:
-                task_date = task_date.replace(hour=hours, minute=minutes)
-            else:
-                task_date = datetime.now().replace(hour=hours, minute=minutes)
-                if task_date < datetime.now():
-                    task_date += timedelta(days=1)
-            
-            description = re.sub(r'в\s+\d{1,2}(?:[:.:]?\d{2})?\s*(?:час[оа]в?|час|ч)?\s*', '', description)
-            logger.info(f"Найдено время: {hours}:{minutes:02d}")
-    
-    description = ' '.join(word for word in description.split() if word)
-    description = description.rstrip('.')
+    logger.debug("Исходный текст задачи: %r", description)
+    return _render_task(EntityRecord.for_task_description(description))
+
+def format_task(entities: EntityRecord) -> str:
+    """Format task creation response from already extracted entities"""
+    if not entities.description:
+        return "Пожалуйста, укажите описание задачи"
+    return _render_task(entities)
+
+def _render_task(entities: EntityRecord) -> str:
+    priority = 'высокий' if entities.priority == 'high' else 'обычный'
+    task_date = entities.due
     
     response_parts = [
         "✅ Создаю новую задачу:",
-        f"\n📝 Описание: {description.capitalize()}"
+        f"\n📝 Описание: {(entities.description or '').capitalize()}"
     ]
     
     if task_date:
@@ -134,47 +108,32 @@ def format_task_creation(description: str) -> str:
     
     return ''.join(response_parts)
 
+def format_search(query: str, scope: str = None, limit: int = 5) -> str:
+    """Search stored tasks and business entities and format the hits"""
+    if not query:
+        return "Пожалуйста, уточните, что нужно найти"
+
+    hits = search_index.search(query, limit=limit, kinds=(scope,) if scope else None)
+    logger.debug("Поиск %r: найдено %d", query, len(hits))
+    if not hits:
+        return f"🔍 По запросу «{query}» ничего не найдено"
+
+    lines = [f"🔍 Найдено по запросу «{query}»:"]
+    for hit in hits:
+        icon = '📝' if hit.kind == 'task' else '👥'
+        lines.append(f"\n{icon} {hit.title}")
+    return ''.join(lines)
+
 def format_business_command(command_type: str, description: str) -> str:
     """Format business command response"""
-    logger.info(f"Форматирование бизнес-команды типа: {command_type}")
-    logger.debug(f"Исходное описание: '{description}'")
+    spec = registry.get(command_type) or CommandSpec(command_type, command_type, ())
+    return _render_business(spec, description)
+
+def _render_business(spec: CommandSpec, description: str) -> str:
+    logger.debug("Форматирование бизнес-команды типа: %s, описание: %r", spec.name, description)
     
     if not description:
         logger.warning("Пустое описание команды")
-        return f"Пожалуйста, укажите описание для команды типа {command_type}"
-    
-    responses = {
-        'finance': {
-            'icon': '💰',
-            'action': 'Финансовая операция',
-            'category': 'Финансы'
-        },
-        'marketing': {
-            'icon': '📢',
-            'action': 'Маркетинговая задача',
-            'category': 'Маркетинг'
-        },
-        'project': {
-            'icon': '📊',
-            'action': 'Проектная задача',
-            'category': 'Управление проектами'
-        },
-        'client': {
-            'icon': '👥',
-            'action': 'Работа с клиентом',
-            'category': 'Клиенты'
-        }
-    }
-    
-    response_info = responses.get(command_type, {
-        'icon': '📝',
-        'action': 'Выполняю команду',
-        'category': command_type.capitalize()
-    })
+        return spec.empty
     
-    return (
-        f"{response_info['icon']} {response_info['action']}:\n"
-        f"📝 Описание: {description.capitalize()}\n"
-        f"📁 Категория: {response_info['category']}\n"
-        "✨ Задача успешно добавлена в систему."
-    )
\ No newline at end of file
+    return spec.render(description)
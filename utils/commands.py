@@ -0,0 +1,275 @@
+import hashlib
+import json
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from utils.entities import ENTITY_EXTRACTORS
+
+logger = logging.getLogger(__name__)
+
+# Обработчики, которые CommandProcessor связывает с командами по имени
+HANDLERS = ('greeting', 'task', 'search', 'business')
+
+
+class CommandSpec:
+    """Описание одной команды: фразы, извлекатель сущностей, обработчик и шаблон ответа.
+
+    phrases распознает сервер, client_phrases получает клиент в каталоге
+    (None - команды в каталоге нет). Команда без обработчика (handler=None)
+    распознается, но сервер ее не выполняет и отвечает, что не распознал.
+    Шаблон ответа бизнес-команды собирается один раз при регистрации:
+    при обработке остается только вставить описание между head и tail.
+    """
+    __slots__ = ('name', 'title', 'phrases', 'client_phrases', 'extractor', 'handler',
+                 'icon', 'action', 'category', 'head', 'tail', 'empty')
+
+    def __init__(self, name: str, title: str, phrases: Sequence[str] = (),
+                 client_phrases: Optional[Sequence[str]] = None, extractor: Optional[str] = None,
+                 handler: Optional[str] = 'business', icon: str = '📝', action: str = 'Выполняю команду',
+                 category: Optional[str] = None):
+        self.name = name
+        self.title = title
+        self.phrases = tuple(phrases)
+        self.client_phrases = tuple(client_phrases) if client_phrases is not None else None
+        self.extractor = extractor
+        self.handler = handler
+        self.icon = icon
+        self.action = action
+        self.category = category or name.capitalize()
+        self.head = f"{icon} {action}:\n📝 Описание: "
+        self.tail = f"\n📁 Категория: {self.category}\n✨ Задача успешно добавлена в систему."
+        self.empty = f"Пожалуйста, укажите описание для команды типа {name}"
+
+    def render(self, description: str) -> str:
+        return f"{self.head}{description.capitalize()}{self.tail}"
+
+    def __repr__(self):
+        return f'<CommandSpec {self.name} ({len(self.phrases)} phrases, {self.handler})>'
+
+
+class CommandRegistry:
+    """Единый каталог команд для распознавания, обработки и клиента.
+
+    Фраза сервера принадлежит ровно одной команде: повтор фразы в двух
+    командах делает распознавание неоднозначным и считается ошибкой
+    таблицы. Клиент проверяет команды каталога по порядку catalog_order
+    и берет первое совпадение, поэтому его фразы могут повторяться.
+    Каталог для клиента сериализуется один раз, его версия - хэш
+    содержимого.
+    """
+
+    def __init__(self, specs: Sequence[CommandSpec] = (), catalog_order: Sequence[str] = ()):
+        self._specs: Dict[str, CommandSpec] = {}
+        self._owners: Dict[str, str] = {}
+        self._catalog_order = tuple(catalog_order)
+        self._catalog: Optional[bytes] = None
+        self._version: Optional[str] = None
+        for spec in specs:
+            self.register(spec)
+
+    def register(self, spec: CommandSpec) -> CommandSpec:
+        if spec.name in self._specs:
+            raise ValueError(f'Command {spec.name} is already registered')
+        if spec.handler is not None and spec.handler not in HANDLERS:
+            raise ValueError(f'Unknown handler {spec.handler!r} for command {spec.name}')
+        if spec.extractor is not None and spec.extractor not in ENTITY_EXTRACTORS:
+            raise ValueError(f'Unknown entity extractor {spec.extractor!r} for command {spec.name}')
+        for phrase in spec.phrases:
+            owner = self._owners.get(phrase)
+            if owner is not None:
+                raise ValueError(f'Phrase {phrase!r} of command {spec.name} is already used by {owner}')
+        self._owners.update((phrase, spec.name) for phrase in spec.phrases)
+        self._specs[spec.name] = spec
+        self._catalog = self._version = None
+        return spec
+
+    def get(self, name: str) -> Optional[CommandSpec]:
+        return self._specs.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __iter__(self) -> Iterator[CommandSpec]:
+        return iter(self._specs.values())
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def patterns(self) -> Dict[str, List[str]]:
+        """Таблица фраз сервера {тип команды: [фразы]} для автомата, исправления опечаток и классификатора"""
+        return {spec.name: list(spec.phrases) for spec in self._specs.values() if spec.phrases}
+
+    def client_patterns(self) -> Dict[str, List[str]]:
+        """Таблица фраз клиента в порядке проверки"""
+        rank = {name: index for index, name in enumerate(self._catalog_order)}
+        specs = sorted((spec for spec in self._specs.values() if spec.client_phrases is not None),
+                       key=lambda spec: rank.get(spec.name, len(rank)))
+        return {spec.name: list(spec.client_phrases) for spec in specs}
+
+    def _serialize(self) -> None:
+        greeting = self._specs.get('greeting')
+        catalog = {
+            # Приветствие клиент узнает по началу фразы, как и сервер
+            'greetings': list(greeting.phrases) if greeting else [],
+            'commands': [
+                {'name': name, 'title': self._specs[name].title, 'phrases': phrases}
+                for name, phrases in self.client_patterns().items()
+            ],
+        }
+        body = json.dumps(catalog, ensure_ascii=False, separators=(',', ':'))
+        self._version = hashlib.sha256(body.encode('utf-8')).hexdigest()[:16]
+        self._catalog = f'{{"version":"{self._version}",{body[1:]}'.encode('utf-8')
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._serialize()
+        return self._version
+
+    def catalog(self) -> bytes:
+        """JSON каталога для клиента: {"version": ..., "greetings": [...], "commands": [...]}"""
+        if self._catalog is None:
+            self._serialize()
+        return self._catalog
+
+
+# Порядок важен: при равной уверенности сервер выбирает команду, объявленную раньше.
+# Без фраз сервера команда распознается только клиентом; бизнес-команды
+# сервер выполняет по типу, описание при этом нужно передать явно
+registry = CommandRegistry([
+    CommandSpec('greeting', 'Приветствие', (
+        'привет', 'здравствуй', 'добр', 'хай', 'hello',
+    ), client_phrases=(
+        'привет', 'здравствуй', 'добрый день', 'доброе утро', 'добрый вечер', 'приветствую',
+    ), extractor='greeting', handler='greeting'),
+    CommandSpec('task_creation', 'Создание задачи', (
+        'создать задачу', 'новая задача', 'добавить задачу', 'запланировать', 'поставить задачу',
+    ), client_phrases=(
+        'создать задачу', 'новая задача', 'добавить заявку', 'запланировать', 'поставить задачу',
+        'назначить задание',
+    ), extractor='task', handler='task'),
+    # Финансы сервер распознает, но не выполняет
+    CommandSpec('finance', 'Финансы', (
+        'финансы', 'бюджет', 'расходы', 'доходы', 'платеж', 'счет', 'транзакция',
+    ), client_phrases=(
+        'финансы', 'баланс', 'бюджет', 'расходы', 'доходы', 'платеж', 'счет', 'транзакция',
+        'оплата', 'выставить счет',
+    ), handler=None, icon='💰', action='Финансовая операция', category='Финансы'),
+    CommandSpec('project', 'Проекты', (
+        'проект', 'создать проект', 'статус проекта', 'обновить проект', 'завершить проект',
+    ), client_phrases=(
+        'проект', 'создать проект', 'статус проекта', 'обновить проект', 'завершить проект',
+        'команда проекта', 'план проекта',
+    ), extractor='project', icon='📊', action='Проектная задача', category='Управление проектами'),
+    CommandSpec('search', 'Поиск', (
+        'найти', 'найди', 'поиск', 'искать', 'поищи', 'где находится',
+        'покажи информацию', 'найди данные', 'найди задачу', 'найди задачи',
+        'найди клиента', 'найди контакт', 'найти задачу', 'найти клиента',
+    ), client_phrases=(
+        'найти', 'поиск', 'искать', 'где находится', 'покажи информацию', 'найди данные', 'поищи',
+    ), extractor='search', handler='search'),
+    CommandSpec('marketing', 'Маркетинг', client_phrases=(
+        # Общий маркетинг
+        'маркетинг', 'маркетинговый план', 'маркетинговая стратегия', 'маркетинговый бюджет',
+        'маркетинговый отчет', 'маркетинговые показатели',
+        # Реклама и продвижение
+        'рекламная кампания', 'запустить рекламу', 'остановить рекламу', 'рекламный бюджет',
+        'эффективность рекламы', 'таргетированная реклама', 'контекстная реклама', 'медийная реклама',
+        # Социальные сети и контент
+        'социальные сети', 'контент план', 'публикация', 'пост', 'создать контент',
+        'расписание постов', 'истории', 'прямой эфир',
+        # Email-маркетинг
+        'email рассылка', 'создать рассылку', 'шаблон письма', 'база подписчиков',
+        'открываемость писем', 'конверсия рассылки',
+        # Аналитика и исследования
+        'анализ рынка', 'исследование конкурентов', 'анализ конкурентов', 'маркетинговое исследование',
+        'аналитика сайта', 'веб-аналитика', 'отчет по конверсии', 'воронка продаж',
+        # Целевая аудитория
+        'целевая аудитория', 'сегмент аудитории', 'портрет клиента', 'анализ аудитории',
+        'поведение пользователей', 'предпочтения клиентов',
+        # Бренд и PR
+        'бренд', 'фирменный стиль', 'брендинг', 'репутация бренда', 'пресс-релиз',
+        'PR кампания', 'медиа план',
+        # Мероприятия
+        'маркетинговое мероприятие', 'организовать событие', 'промо-акция', 'презентация продукта',
+        'выставка', 'конференция',
+        # SEO
+        'seo оптимизация', 'поисковое продвижение', 'ключевые слова', 'позиции в поиске',
+        'meta теги', 'оптимизация контента',
+        # Лояльность
+        'программа лояльности', 'акции для клиентов', 'бонусная программа', 'удержание клиентов',
+        'обратная связь', 'отзывы клиентов',
+    ), icon='📢', action='Маркетинговая задача', category='Маркетинг'),
+    CommandSpec('client', 'Клиенты', client_phrases=(
+        'клиентская база', 'клиенты', 'работа с клиентами', 'обслуживание клиентов',
+        'лояльность клиентов', 'обратная связь', 'клиентский опыт',
+    ), icon='👥', action='Работа с клиентом', category='Клиенты'),
+    CommandSpec('supplier', 'Поставщики', client_phrases=(
+        'поставщики', 'управление поставками', 'закупки', 'оценка поставщиков',
+        'договор поставки', 'логистика', 'цепочка поставок',
+    )),
+    CommandSpec('contract', 'Договоры', client_phrases=(
+        'договор', 'контракт', 'соглашение', 'условия договора', 'подписание договора',
+        'расторжение договора', 'дополнительное соглашение',
+    )),
+    CommandSpec('quality', 'Качество', client_phrases=(
+        'качество', 'контроль качества', 'управление качеством', 'стандарты качества',
+        'улучшение качества', 'оценка качества', 'система качества',
+    )),
+    CommandSpec('risk', 'Риски', client_phrases=(
+        'риски', 'управление рисками', 'оценка рисков', 'минимизация рисков', 'анализ рисков',
+        'риск-менеджмент', 'страхование рисков',
+    )),
+    CommandSpec('strategy', 'Стратегия', client_phrases=(
+        'стратегия', 'стратегическое планирование', 'развитие бизнеса', 'долгосрочные цели',
+        'бизнес-план', 'конкурентная стратегия', 'стратегические инициативы',
+    )),
+    CommandSpec('compliance', 'Соответствие требованиям', client_phrases=(
+        'соответствие', 'нормативы', 'регуляторные требования', 'compliance', 'аудит соответствия',
+        'правовые требования', 'стандарты compliance',
+    )),
+    CommandSpec('innovation', 'Инновации', client_phrases=(
+        'инновации', 'инновационные проекты', 'технологическое развитие', 'цифровая трансформация',
+        'новые технологии', 'модернизация', 'оптимизация процессов',
+    )),
+    # Анализ документов клиент называет document_analysis, сервер выполняет его как document
+    CommandSpec('document_analysis', 'Анализ документов', client_phrases=(
+        'проверить документ', 'анализ документа', 'проверка договора', 'изучить документ',
+        'просмотреть контракт', 'проанализировать соглашение',
+    ), handler=None),
+    CommandSpec('document', 'Анализ документов'),
+    CommandSpec('calendar', 'Календарь', client_phrases=(
+        'календарь', 'расписание', 'встреча', 'запланировать встречу', 'добавить в календарь',
+    ), handler=None),
+    CommandSpec('contact', 'Контакты', client_phrases=(
+        'контакт', 'добавить контакт', 'найти контакт', 'информация о человеке', 'данные сотрудника',
+        'телефон',
+    )),
+    CommandSpec('reminder', 'Напоминания', client_phrases=(
+        'напомнить', 'установить напоминание', 'поставить будильник', 'не забыть', 'запомнить',
+    ), handler=None),
+    CommandSpec('sales', 'Продажи', client_phrases=(
+        'продажи', 'новая сделка', 'клиент', 'заказ', 'оформить продажу', 'воронка продаж',
+        'выставить счет', 'статус сделки', 'потенциальный клиент',
+    ), handler=None),
+    CommandSpec('inventory', 'Склад', client_phrases=(
+        'склад', 'товары', 'остатки', 'проверить наличие', 'заказать товар', 'инвентаризация',
+        'поставка', 'приход товара', 'отгрузка',
+    ), handler=None),
+    CommandSpec('analytics', 'Аналитика', client_phrases=(
+        'аналитика', 'анализ данных', 'тренды', 'прогноз', 'показатели', 'метрики', 'эффективность',
+        'отчет по продажам', 'статистика', 'динамика продаж',
+    )),
+    CommandSpec('employee', 'Сотрудники', client_phrases=(
+        'сотрудник', 'персонал', 'штат', 'отпуск', 'график работы', 'зарплата', 'оценка работы',
+        'повышение', 'обучение', 'компетенции',
+    )),
+    CommandSpec('meeting', 'Совещания', client_phrases=(
+        'совещание', 'организовать встречу', 'запланировать звонок', 'конференция', 'презентация',
+        'брифинг', 'переговоры',
+    ), handler=None),
+], catalog_order=(
+    'task_creation', 'marketing', 'client', 'supplier', 'contract', 'quality', 'risk', 'strategy',
+    'compliance', 'innovation', 'document_analysis', 'search', 'calendar', 'contact', 'reminder',
+    'finance', 'project', 'sales', 'inventory', 'analytics', 'employee', 'meeting', 'greeting',
+))
@@ -0,0 +1,287 @@
+import logging
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from utils.normalizer import normalize_task_text
+
+logger = logging.getLogger(__name__)
+
+# Поиск времени в формате ЧЧ:ММ
+_TIME_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'в (\d{1,2})[:\.](\d{2})',
+    r'на (\d{1,2})[:\.](\d{2})',
+    r'в (\d{1,2}) (\d{2})',
+))
+
+_DATE_MARKERS = (
+    ('сегодня', 0),
+    ('завтра', 1),
+    ('послезавтра', 2),
+    ('через неделю', 7),
+    ('через месяц', 30),
+)
+
+# Все числовые значения с единицами измерения ищутся одним проходом;
+# для каждой сущности берется первое вхождение
+_NUMERIC_RE = re.compile(
+    r'(?P<amount>\d+)\s*(?:рубл[яейь]|руб)'
+    r'|(?P<duration_hours>\d+)\s*(?:час[ао]в|час)'
+    r'|(?P<duration_minutes>\d+)\s*(?:минут[аы]?|мин)'
+    r'|(?P<quantity>\d+)\s*(?:шт[а-я]*|единиц[а-я]*)'
+)
+
+_TASK_DESCRIPTION_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'задач[ау]?\s+(.+?)(?:\s+на\s+|$)',
+    r'создать\s+(.+?)(?:\s+на\s+|$)',
+    r'запланировать\s+(.+?)(?:\s+на\s+|$)',
+))
+
+_PROJECT_NAME_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'проект[а]?\s+[""]?([^""]+)[""]?',
+    r'создать проект\s+[""]?([^""]+)[""]?',
+))
+
+_PROJECT_STATUS_KEYWORDS = (
+    ('начать', 'new'),
+    ('запустить', 'started'),
+    ('завершить', 'completed'),
+    ('закрыть', 'closed'),
+)
+
+# Высокий приоритет задачи: любой из маркеров в любом месте фразы ("это срочно,
+# создать задачу ..."). Правило одно для записи из фразы и для format_task_creation
+_HIGH_PRIORITY_MARKERS = ('срочн', 'важн', 'критичн')
+
+# Команда поиска: глагол и необязательное уточнение, где искать
+_SEARCH_COMMAND_RE = re.compile(
+    r'^.*?(?:найди|найти|поищи|искать|поиск|покажи информацию|где находится)\s*'
+    r'(?:(?P<scope>задач[уиа]?|клиент[аов]*|контакт[ыа]?|поставщик[аов]*|данные|информацию)\s*)?'
+    r'(?:(?:по|про|об?|с)\s+)?'
+)
+
+_SEARCH_SCOPES = (
+    ('задач', 'task'),
+    ('клиент', 'entity'),
+    ('контакт', 'entity'),
+    ('поставщик', 'entity'),
+)
+
+
+@dataclass(frozen=True)
+class EntityRecord(Mapping):
+    """Immutable, typed entities of one utterance.
+
+    Запись также ведет себя как словарь со старыми ключами ('date' в виде
+    'YYYY-MM-DD', 'time' в виде 'HH:MM'), чтобы код, работавший с dict,
+    продолжал работать без изменений.
+    """
+    description: Optional[str] = None
+    priority: Optional[str] = None
+    due: Optional[datetime] = None
+    has_time: bool = False
+    amount: Optional[int] = None
+    duration_hours: Optional[int] = None
+    duration_minutes: Optional[int] = None
+    quantity: Optional[int] = None
+    project_name: Optional[str] = None
+    status: Optional[str] = None
+    related_to: Optional[str] = None
+    query: Optional[str] = None
+    scope: Optional[str] = None
+    greeting: bool = False
+    time_of_day: Optional[str] = None
+    error: Optional[str] = None
+
+    def _legacy_items(self) -> Iterator:
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if field.name == 'has_time' or value is None or value is False:
+                continue
+            if field.name == 'due':
+                yield 'date', value.strftime('%Y-%m-%d')
+                if self.has_time:
+                    yield 'time', value.strftime('%H:%M')
+            else:
+                yield field.name, value
+
+    def __getitem__(self, key: str) -> Any:
+        for name, value in self._legacy_items():
+            if name == key:
+                return value
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self._legacy_items())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._legacy_items())
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON-friendly dict with the legacy keys"""
+        return dict(self._legacy_items())
+
+    def to_state(self) -> Dict[str, Any]:
+        """Заполненные поля для хранения в JSON (срок в ISO-формате)"""
+        state = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value is None or value is False:
+                continue
+            state[field.name] = value.isoformat() if isinstance(value, datetime) else value
+        return state
+
+    @classmethod
+    def from_state(cls, state: Mapping) -> 'EntityRecord':
+        if state.get('due'):
+            state = dict(state, due=datetime.fromisoformat(state['due']))
+        return cls(**state)
+
+    @classmethod
+    def for_task_description(cls, description: str, now: Optional[datetime] = None) -> 'EntityRecord':
+        """Запись задачи по уже выделенному описанию (прежний вход format_task_creation)"""
+        task = normalize_task_text(description)
+        due = _task_due(task.date_offset, task.hours, task.minutes, now or datetime.now())
+        return cls(description=task.description, priority=task_priority(description), due=due,
+                   has_time=task.hours is not None)
+
+
+def _task_due(date_offset: Optional[timedelta], hours: Optional[int], minutes: Optional[int],
+              now: datetime) -> Optional[datetime]:
+    """Срок задачи: дата по смещению и/или время; прошедшее время переносится на завтра"""
+    due = now + date_offset if date_offset is not None else None
+    if hours is not None:
+        if due:
+            due = due.replace(hour=hours, minute=minutes)
+        else:
+            due = now.replace(hour=hours, minute=minutes)
+            if due < now:
+                due += timedelta(days=1)
+    return due
+
+
+def extract_time(text: str) -> Optional[tuple]:
+    """Время ЧЧ:ММ из текста или None"""
+    for pattern in _TIME_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            hours, minutes = map(int, match.groups())
+            if 0 <= hours <= 23 and 0 <= minutes <= 59:
+                return hours, minutes
+    return None
+
+
+def extract_date_offset(text: str) -> Optional[timedelta]:
+    """Смещение даты по словам "сегодня", "завтра" и т.п."""
+    for marker, days in _DATE_MARKERS:
+        if marker in text:
+            return timedelta(days=days)
+    return None
+
+
+def task_priority(text: str) -> str:
+    """Приоритет задачи: 'high', если в тексте есть маркер срочности"""
+    lowered = text.lower()
+    return 'high' if any(marker in lowered for marker in _HIGH_PRIORITY_MARKERS) else 'normal'
+
+
+def extract_numeric(text: str) -> Dict[str, int]:
+    """Числовые значения с единицами измерения: сумма, длительность, количество"""
+    entities: Dict[str, int] = {}
+    for match in _NUMERIC_RE.finditer(text):
+        if match.lastgroup not in entities:
+            entities[match.lastgroup] = int(match.group(match.lastgroup))
+    return entities
+
+
+def _task_fields(text: str, now: datetime) -> Dict[str, Any]:
+    description = ''
+    for pattern in _TASK_DESCRIPTION_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            description = match.group(1).strip()
+            break
+
+    # Описание нормализуется один раз; дата и время, не попавшие в описание
+    # (например, "... на завтра"), ищутся в полном тексте
+    task = normalize_task_text(description)
+    date_offset = task.date_offset if task.date_offset is not None else extract_date_offset(text)
+    hours, minutes = task.hours, task.minutes
+    if hours is None:
+        hours, minutes = extract_time(text) or (None, None)
+
+    return {
+        'description': task.description,
+        'priority': task_priority(text),
+        'due': _task_due(date_offset, hours, minutes, now),
+        'has_time': hours is not None,
+        **extract_numeric(text),
+    }
+
+
+def _project_fields(text: str, now: datetime) -> Dict[str, Any]:
+    entities: Dict[str, Any] = {}
+    for pattern in _PROJECT_NAME_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            entities['project_name'] = match.group(1).strip()
+            break
+
+    for keyword, status in _PROJECT_STATUS_KEYWORDS:
+        if keyword in text:
+            entities['status'] = status
+            break
+
+    offset = extract_date_offset(text)
+    time_found = extract_time(text)
+    if offset is not None or time_found:
+        hours, minutes = time_found or (None, None)
+        entities['due'] = _task_due(offset, hours, minutes, now)
+        entities['has_time'] = time_found is not None
+    entities.update(extract_numeric(text))
+    return entities
+
+
+def _greeting_fields(text: str, now: datetime) -> Dict[str, Any]:
+    hour = now.hour
+    return {
+        'greeting': True,
+        'time_of_day': (
+            'morning' if 5 <= hour < 12
+            else 'afternoon' if 12 <= hour < 17
+            else 'evening' if 17 <= hour < 23
+            else 'night'
+        ),
+    }
+
+
+def _search_fields(text: str, now: datetime) -> Dict[str, Any]:
+    match = _SEARCH_COMMAND_RE.match(text)
+    query = text[match.end():] if match else text
+    scope = match.group('scope') if match else None
+    entities: Dict[str, Any] = {'query': query.strip(' .,?!')}
+    if scope:
+        for prefix, kind in _SEARCH_SCOPES:
+            if scope.startswith(prefix):
+                entities['scope'] = kind
+                break
+    return entities
+
+
+# Извлекатели сущностей по имени; имя извлекателя для команды задает реестр команд
+ENTITY_EXTRACTORS: Dict[str, Callable[[str, datetime], Dict[str, Any]]] = {
+    'task': _task_fields,
+    'project': _project_fields,
+    'greeting': _greeting_fields,
+    'search': _search_fields,
+}
+
+
+def extract_entities(extractor_name: Optional[str], text: str, related_to: Optional[str] = None,
+                     now: Optional[datetime] = None) -> EntityRecord:
+    """Извлекает все сущности очищенного текста один раз за запрос"""
+    extractor = ENTITY_EXTRACTORS.get(extractor_name)
+    values = extractor(text, now or datetime.now()) if extractor else {}
+    return EntityRecord(related_to=related_to, **values)
@@ -0,0 +1,152 @@
+import logging
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Варианты слова активации, которые выдает распознавание речи
+WAKE_WORDS = ('терра', 'тера', 'тэра', 'тэрра', 'terra', 'tera', 'эра')
+# Варианты, совпадающие с обычными словами ("новая эра"), удаляются только в начале фразы
+AMBIGUOUS_WAKE_WORDS = frozenset({'эра'})
+# Искажения ("терро") ищутся только в начале фразы и только у слов не короче этой длины:
+# иначе пропадают обычные слова на расстоянии 1 ("терка", "тетра")
+MIN_FUZZY_WAKE_LENGTH = 5
+
+_EXACT_WAKE_WORDS = frozenset(WAKE_WORDS) - AMBIGUOUS_WAKE_WORDS
+
+_TOKEN_RE = re.compile(r'\S+')
+_PUNCTUATION = ',.!?;:«»"\'()-–'
+
+
+def allowed_distance(length: int) -> int:
+    """Допустимое расстояние правки для слова данной длины.
+
+    Короткие слова не исправляются: на них почти любая ошибка дает
+    другое настоящее слово.
+    """
+    if length <= 4:
+        return 0
+    if length <= 7:
+        return 1
+    return 2
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """Все варианты слова без 1..distance символов"""
+    result: Set[str] = set()
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Расстояние Дамерау-Левенштейна (OSA); при превышении limit возвращает limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+class FuzzyIndex:
+    """SymSpell-style deletion index over a fixed vocabulary.
+
+    words может содержать повторы: частые слова выигрывают ничьи.
+    Для каждого слова словаря заранее сохранены все варианты с удаленными
+    1-2 символами. Поиск строит такие же варианты для входного слова и
+    проверяет только кандидатов с общими вариантами, поэтому время поиска
+    не зависит от размера словаря.
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = 2):
+        # Частота слова решает ничьи между кандидатами на одном расстоянии
+        self.frequencies: Counter = Counter(word for word in words if word)
+        self.words: Set[str] = set(self.frequencies)
+        self.max_distance = max_distance
+        self._deletes: Dict[str, Set[str]] = defaultdict(set)
+        for word in self.words:
+            # Слово может оказаться целью для более длинного входного слова,
+            # поэтому варианты строятся на полное max_distance
+            for variant in _deletes(word, max_distance):
+                self._deletes[variant].add(word)
+        # Результаты поиска повторяются от фразы к фразе
+        self.lookup = lru_cache(maxsize=65536)(self._lookup)
+        logger.debug(f"FuzzyIndex built: {len(self.words)} words, {len(self._deletes)} deletes")
+
+    def _lookup(self, token: str) -> Optional[str]:
+        """Ближайшее слово словаря в допустимом расстоянии или None"""
+        if token in self.words:
+            return token
+        distance = min(self.max_distance, allowed_distance(len(token)))
+        if distance == 0:
+            return None
+
+        candidates = set(self._deletes.get(token, ()))
+        for variant in _deletes(token, distance):
+            if variant in self.words:
+                candidates.add(variant)
+            candidates |= self._deletes.get(variant, set())
+
+        best = None
+        best_key = None
+        for candidate in candidates:
+            found = edit_distance(token, candidate, distance)
+            if found <= distance:
+                key = (found, -self.frequencies[candidate], abs(len(candidate) - len(token)), candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+    def correct(self, text: str) -> str:
+        """Заменяет слова с ошибками на ближайшие слова словаря"""
+        return ' '.join(self.lookup(token) or token for token in text.split())
+
+
+def vocabulary(patterns: Mapping[str, Iterable[str]]) -> List[str]:
+    """Слова всех фраз таблицы шаблонов, с повторами"""
+    return [word for phrases in patterns.values() for phrase in phrases for word in phrase.split()]
+
+
+_wake_index = FuzzyIndex(WAKE_WORDS, max_distance=1)
+
+
+def is_wake_word(token: str, leading: bool = True) -> bool:
+    """Слово активации; leading=False - слово не в начале фразы, искажения не учитываются"""
+    word = token.strip(_PUNCTUATION).lower()
+    if word in _EXACT_WAKE_WORDS:
+        return True
+    if not leading:
+        return False
+    return word in AMBIGUOUS_WAKE_WORDS or (
+        len(word) >= MIN_FUZZY_WAKE_LENGTH and _wake_index.lookup(word) is not None
+    )
+
+
+def strip_wake_words(text: str) -> str:
+    """Удаляет слово активации ("терра", "тера").
+
+    Искажения ("терро", "tерра,") и неоднозначные варианты ("эра")
+    удаляются только в начале фразы, где стоит обращение к ассистенту.
+    """
+    tokens = _TOKEN_RE.findall(text)
+    start = 0
+    while start < len(tokens) and is_wake_word(tokens[start]):
+        start += 1
+    return ' '.join(token for token in tokens[start:] if not is_wake_word(token, leading=False))
@@ -0,0 +1,166 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Очередь заданий переполнена"""
+
+
+class SessionLimitError(Exception):
+    """У сессии слишком много незавершенных заданий"""
+
+
+class JobError(Exception):
+    """Задание завершилось ответом с ошибкой: payload и HTTP-статус сохраняются в задании"""
+
+    def __init__(self, payload: Any, status_code: int):
+        super().__init__(f'status {status_code}')
+        self.payload = payload
+        self.status_code = status_code
+
+
+class Job:
+    """Состояние одного фонового задания"""
+    __slots__ = ('id', 'session_id', 'status', 'result', 'error', 'status_code', 'created_at', 'finished_at', 'done')
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, session_id: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.status = Job.PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        data = {'job_id': self.id, 'status': self.status}
+        if self.status == Job.DONE:
+            data['result'] = self.result
+        elif self.status == Job.FAILED:
+            data['error'] = self.error
+            if self.status_code is not None:
+                data['status_code'] = self.status_code
+                data['result'] = self.result
+        return data
+
+
+class JobQueue:
+    """Bounded worker pool for long-running request processing.
+
+    Задания ставятся в очередь ограниченной длины и выполняются фиксированным
+    числом потоков. При переполнении очереди submit сразу отказывает, чтобы
+    медленный внешний сервис не копил неограниченное число запросов.
+    """
+
+    # Не чаще одного полного обхода результатов в секунду при опросе
+    PURGE_INTERVAL = 1.0
+
+    def __init__(self, workers: int = 4, max_queue: int = 64, max_per_session: int = 4,
+                 result_ttl: float = 300.0, name: str = 'jobs'):
+        self.workers = workers
+        self.max_per_session = max_per_session
+        self.result_ttl = result_ttl
+        self._purged_at = 0.0
+        self._queue: 'queue.Queue[Optional[tuple]]' = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'{name}-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Job queue '{name}' started: {workers} workers, queue depth {max_queue}")
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, func: Callable[..., Any], *args, session_id: Optional[str] = None, **kwargs) -> Job:
+        """Ставит задание в очередь или выбрасывает QueueFullError/SessionLimitError"""
+        self._purge()
+        job = Job(session_id)
+        with self._lock:
+            if session_id is not None and self._in_flight[session_id] >= self.max_per_session:
+                raise SessionLimitError(session_id)
+            try:
+                self._queue.put_nowait((job, func, args, kwargs))
+            except queue.Full:
+                raise QueueFullError()
+            self._jobs[job.id] = job
+            if session_id is not None:
+                self._in_flight[session_id] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Задание по id; результат старше result_ttl считается удаленным"""
+        self._purge()
+        job = self._jobs.get(job_id)
+        if job is not None and job.finished_at is not None and job.finished_at < time.time() - self.result_ttl:
+            return None
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, func, args, kwargs = item
+            job.status = Job.RUNNING
+            try:
+                job.result = func(*args, **kwargs)
+                job.status = Job.DONE
+            except JobError as e:
+                job.result = e.payload
+                job.status_code = e.status_code
+                job.error = str(e.payload.get('result', e)) if isinstance(e.payload, dict) else str(e)
+                job.status = Job.FAILED
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+                job.error = str(e)
+                job.status = Job.FAILED
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    if job.session_id is not None:
+                        self._in_flight[job.session_id] -= 1
+                        if not self._in_flight[job.session_id]:
+                            del self._in_flight[job.session_id]
+                job.done.set()
+                self._queue.task_done()
+
+    def _purge(self) -> None:
+        """Удаляет результаты, которые никто не забрал за result_ttl секунд"""
+        now = time.time()
+        if now - self._purged_at < self.PURGE_INTERVAL:
+            return
+        self._purged_at = now
+        cutoff = now - self.result_ttl
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает потоки после выполнения уже поставленных заданий"""
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
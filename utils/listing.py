@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Table, and_, bindparam, inspect, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Таблицы, изменения которых отслеживает счетчик версий
+VERSIONED_TABLES = ('tasks', 'business_entities')
+
+_BUMP_VERSIONS = text(
+    "UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+    "WHERE table_name IN :names"
+).bindparams(bindparam('names', expanding=True))
+
+# Есть ли таблица версий в базе движка: проверяется один раз на движок
+_tracking: 'WeakKeyDictionary[Engine, bool]' = WeakKeyDictionary()
+
+_POSTGRES_VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_versions SET version = version + 1, updated_at = now() WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def ensure_version_tracking(engine: Engine) -> None:
+    """Создает таблицу версий и триггеры, увеличивающие версию при любом изменении строк.
+
+    В PostgreSQL версию увеличивает триггер уровня оператора. В SQLite
+    таких триггеров нет, а построчный триггер добавлял бы UPDATE на каждую
+    вставленную строку пакета, поэтому в SQLite и других СУБД версию
+    увеличивают сами пакетные записи через bump_table_versions.
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS table_versions ("
+            "table_name VARCHAR(64) PRIMARY KEY, "
+            "version BIGINT NOT NULL DEFAULT 0, "
+            "updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        for table in VERSIONED_TABLES:
+            exists = conn.execute(
+                text("SELECT 1 FROM table_versions WHERE table_name = :name"), {'name': table}
+            ).first()
+            if not exists:
+                conn.execute(text("INSERT INTO table_versions (table_name) VALUES (:name)"), {'name': table})
+
+        if dialect == 'sqlite':
+            # Построчные триггеры прежних версий схемы
+            for table in VERSIONED_TABLES:
+                for event in ('insert', 'update', 'delete'):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_version_{event}"))
+        elif dialect == 'postgresql':
+            conn.execute(text(_POSTGRES_VERSION_FUNCTION))
+            for table in VERSIONED_TABLES:
+                # Триггер уровня оператора: пакетная вставка увеличивает версию один раз
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_version ON {table}"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                    f"FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()"
+                ))
+    _tracking[engine] = True
+
+
+def bump_table_versions(conn: Connection, tables: Iterable[str]) -> None:
+    """Увеличивает версии таблиц один раз на пакет записи, в транзакции самой записи.
+
+    Вызывается всеми, кто пишет в VERSIONED_TABLES. В PostgreSQL это уже
+    сделал триггер уровня оператора; без таблицы версий вызов ничего не делает.
+    """
+    if conn.dialect.name == 'postgresql':
+        return
+    names = sorted(set(tables).intersection(VERSIONED_TABLES))
+    if not names:
+        return
+    engine = conn.engine
+    tracked = _tracking.get(engine)
+    if tracked is None:
+        tracked = _tracking[engine] = inspect(conn).has_table('table_versions')
+    if tracked:
+        conn.execute(_BUMP_VERSIONS, {'names': names})
+
+
+def table_version(conn: Connection, table: str) -> Tuple[int, datetime]:
+    """Версия таблицы и время последнего изменения (UTC, с точностью до секунды)"""
+    row = conn.execute(
+        text("SELECT version, updated_at FROM table_versions WHERE table_name = :name"), {'name': table}
+    ).first()
+    if row is None:
+        return 0, datetime(1970, 1, 1, tzinfo=timezone.utc)
+    updated_at = row[1]
+    if isinstance(updated_at, str):
+        # SQLite хранит CURRENT_TIMESTAMP строкой 'YYYY-MM-DD HH:MM:SS'
+        updated_at = datetime.fromisoformat(updated_at)
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return row[0], updated_at.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def listing_etag(table: str, version: int, query_string: bytes) -> str:
+    """ETag страницы: версия таблицы плюс параметры запроса"""
+    digest = hashlib.blake2s(query_string, digest_size=6).hexdigest()
+    return f'{table}-{version}-{digest}'
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f'{created_at.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбирает курсор; при неверном формате выбрасывает ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def parse_datetime(value: str) -> datetime:
+    """Дата YYYY-MM-DD или дата и время в формате ISO 8601"""
+    return datetime.fromisoformat(value)
+
+
+def fetch_page(conn: Connection, table: Table, conditions: Sequence, cursor: Optional[str],
+               limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Страница строк от новых к старым по ключу (created_at, id).
+
+    Вместо OFFSET следующая страница начинается сразу после последней строки
+    предыдущей, поэтому стоимость запроса не растет с номером страницы.
+    """
+    created_at, row_id = table.c.created_at, table.c.id
+    conditions = list(conditions)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        # Внешнее условие <= дает планировщику границу диапазона по индексу
+        # (created_at, id) и с параметрами запроса, а не только с литералами
+        conditions.append(created_at <= last_created_at)
+        conditions.append(or_(created_at < last_created_at, row_id < last_id))
+
+    query = select(table).order_by(created_at.desc(), row_id.desc()).limit(limit + 1)
+    if conditions:
+        query = query.where(and_(*conditions))
+    rows = [dict(row._mapping) for row in conn.execute(query)]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, datetime):
+                row[key] = value.isoformat()
+    return rows, next_cursor
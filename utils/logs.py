@@ -0,0 +1,186 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from utils.entities import EntityRecord
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_QUEUE_SIZE = 10000
+
+# Атрибуты LogRecord; все остальные пришли через extra и попадают в JSON как поля
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Попал ли текущий запрос в выборку подробного (DEBUG) логирования
+_sampled: ContextVar[Optional[bool]] = ContextVar('terra_log_sampled', default=None)
+
+# Аргументы этих типов не меняются после вызова логгера, и подстановку можно отложить
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None), datetime, EntityRecord)
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+_state: Dict[str, Any] = {'settings': None, 'listener': None, 'handler': None}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; поля из extra добавляются как есть"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Пропускает DEBUG-записи только для доли запросов rate.
+
+    Решение принимается один раз на запрос (sample_request), поэтому
+    выбранный запрос логируется целиком. Вне запроса - по каждой записи.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        sampled = _sampled.get()
+        return sampled if sampled is not None else random.random() < self.rate
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() собирает сообщение сразу; здесь %-подстановка
+    и JSON выполняются в потоке QueueListener, если все аргументы
+    неизменяемы (строки, числа, EntityRecord). С другими аргументами
+    сообщение собирается сразу, иначе поток записи увидел бы их более
+    позднее состояние. Исключение переводится в текст в вызывающем
+    потоке, пока жив его traceback. Значения extra попадают в запись как
+    есть и тоже должны быть неизменяемыми. Переполненная очередь не
+    блокирует запрос: запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        mutable_args = record.args and not (isinstance(record.args, tuple)
+                                            and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in record.args))
+        if not mutable_args and not record.exc_info:
+            return record
+        # Запись могут обрабатывать и другие обработчики, поэтому меняется копия
+        record = copy.copy(record)
+        if mutable_args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            # Traceback держит кадры стека и их локальные переменные
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def sample_request(rate: float) -> None:
+    """Решает, попадет ли текущий запрос в выборку DEBUG-логов"""
+    _sampled.set(rate >= 1 or (rate > 0 and random.random() < rate))
+
+
+def _flag(value: Any) -> bool:
+    return value if isinstance(value, bool) else str(value).lower() not in ('0', 'false', 'no', '')
+
+
+def configure_logging(config: Mapping[str, Any]) -> None:
+    """Настраивает корневой логгер по LOG_* из app.config или os.environ.
+
+    LOG_LEVEL (INFO), LOG_FORMAT (text | json), LOG_FILE (по умолчанию stderr),
+    LOG_QUEUE (1 - запись в отдельном потоке), LOG_DEBUG_SAMPLE (доля
+    запросов с DEBUG-деталями, 0 - выключено). Повторный вызов с теми же
+    настройками ничего не делает.
+    """
+    sample = float(config.get('LOG_DEBUG_SAMPLE') or 0)
+    settings: Tuple = (
+        str(config.get('LOG_LEVEL') or 'INFO').upper(),
+        str(config.get('LOG_FORMAT') or 'text').lower(),
+        config.get('LOG_FILE') or None,
+        _flag(config.get('LOG_QUEUE', True)),
+        sample,
+    )
+    if settings == _state['settings']:
+        return
+    shutdown_logging()
+    level_name, fmt, path, use_queue, sample = settings
+
+    output = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(DEFAULT_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    level = logging.getLevelName(level_name)
+    # Выборка DEBUG включает уровень DEBUG, а лишнее отсекает фильтр
+    root.setLevel(logging.DEBUG if 0 < sample and level > logging.DEBUG else level)
+
+    if use_queue:
+        handler = LazyQueueHandler(queue.Queue(DEFAULT_QUEUE_SIZE))
+        listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        listener.start()
+        _state['listener'] = listener
+    else:
+        handler = output
+    if 0 < sample < 1:
+        handler.addFilter(DebugSampler(sample))
+    root.addHandler(handler)
+    _state.update(settings=settings, handler=handler, output=output)
+
+
+def shutdown_logging() -> None:
+    """Дописывает очередь и закрывает обработчики текущей настройки"""
+    listener = _state.get('listener')
+    if listener is not None:
+        listener.stop()
+    output = _state.get('output')
+    if output is not None:
+        output.close()
+    handler = _state.get('handler')
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    _state.update(settings=None, listener=None, handler=None, output=None)
+
+
+def logging_stats() -> Dict[str, int]:
+    handler = _state.get('handler')
+    if not isinstance(handler, LazyQueueHandler):
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': handler.queue.qsize(), 'dropped': handler.dropped}
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,81 @@
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IntentMatcher:
+    """Aho-Corasick automaton over the phrases of all intents.
+
+    Строится один раз из таблицы шаблонов и находит все вхождения всех
+    фраз за один проход по тексту, поэтому стоимость анализа не зависит
+    от размера словаря.
+    """
+
+    def __init__(self, patterns: Mapping[str, Iterable[str]]):
+        self.intents: List[str] = list(patterns)
+        # Переходы хранятся в словарях: алфавит (кириллица + латиница)
+        # слишком разреженный для плотных таблиц
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Для каждого состояния: (intent, длина фразы) всех фраз,
+        # заканчивающихся в этом состоянии (включая суффиксные ссылки)
+        self._output: List[Tuple[Tuple[str, int], ...]] = [()]
+
+        for intent, phrases in patterns.items():
+            for phrase in phrases:
+                if phrase:
+                    self._add(intent, phrase)
+        self._build()
+        logger.debug(f"IntentMatcher compiled: {len(self._goto)} states, {len(self.intents)} intents")
+
+    def _add(self, intent: str, phrase: str) -> None:
+        state = 0
+        for char in phrase:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = nxt
+        entry = (intent, len(phrase))
+        if entry not in self._output[state]:
+            self._output[state] += (entry,)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] += self._output[self._fail[nxt]]
+
+    def longest_matches(self, text: str) -> Dict[str, int]:
+        """Returns the length of the longest matched phrase for every intent found in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        best: Dict[str, int] = {}
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for intent, length in output[state]:
+                if length > best.get(intent, 0):
+                    best[intent] = length
+        return best
+
+    def confidences(self, text: str) -> Dict[str, float]:
+        """Вычисляет уверенность len(pattern)/len(text) для всех намерений за один проход"""
+        if not text:
+            return {intent: 0.0 for intent in self.intents}
+        best = self.longest_matches(text)
+        text_length = len(text)
+        return {intent: best.get(intent, 0) / text_length for intent in self.intents}
@@ -0,0 +1,330 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Логарифмические границы корзин: от 10 мкс до ~80 с с шагом x2
+DEFAULT_BUCKETS = tuple(10e-6 * 2 ** k for k in range(24))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self):
+        return None
+
+    def restore(self, state) -> None:
+        pass
+
+
+class Counter(_Metric):
+    """Монотонный счетчик с метками"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def restore(self, state: Dict[Tuple[str, ...], float]) -> None:
+        with self._lock:
+            self._values = state
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in values
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Histogram with fixed logarithmic buckets.
+
+    Наблюдение - это поиск корзины и три сложения под блокировкой, поэтому
+    метрики можно не выключать в продакшене. Квантили оцениваются по
+    корзинам так же, как histogram_quantile в Prometheus.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _HistogramSeries(len(self.buckets))
+            series.counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {labels: (list(s.counts), s.total, s.count) for labels, s in self._series.items()}
+
+    def restore(self, state: Dict[Tuple[str, ...], Tuple[List[int], float, int]]) -> None:
+        restored: Dict[Tuple[str, ...], _HistogramSeries] = {}
+        for labels, (counts, total, count) in state.items():
+            series = restored[labels] = _HistogramSeries(len(self.buckets))
+            series.counts, series.total, series.count = counts, total, count
+        with self._lock:
+            self._series = restored
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series.count if series else 0
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None or series.count == 0:
+                return None
+            counts = list(series.counts)
+            total = series.count
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-2]
+
+    def labelsets(self) -> List[Tuple[str, ...]]:
+        with self._lock:
+            return sorted(self._series)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            snapshot = [(labels, list(s.counts), s.total, s.count) for labels, s in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Значение, которое вычисляется при каждом чтении /metrics"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], GaugeValue],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} failed: {str(e)}")
+            return []
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        return self._header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(item)}'
+            for labels, item in sorted(values)
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Повторная регистрация (новое приложение в том же процессе) заменяет метрику
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], GaugeValue],
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, callback, labelnames))
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Измерения внутри блока не попадают в метрики (прогрев, служебные вызовы).
+
+        span() внутри блока не измеряет, а счетчики и гистограммы, которые
+        код обновляет напрямую, после блока возвращаются к прежним значениям.
+        Рассчитано на однопоточные участки до приема запросов.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        states = [(metric, metric.snapshot()) for metric in metrics]
+        enabled, self.enabled = self.enabled, False
+        try:
+            yield
+        finally:
+            for metric, state in states:
+                metric.restore(state)
+            self.enabled = enabled
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        lines.extend(_render_quantiles())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'terra_stage_duration_seconds', 'Duration of a request pipeline stage', ('stage',))
+STAGE_ERRORS = registry.counter(
+    'terra_stage_errors_total', 'Pipeline stages that raised an exception', ('stage',))
+REQUEST_SECONDS = registry.histogram(
+    'terra_http_request_duration_seconds', 'HTTP request duration by endpoint', ('endpoint',))
+COMMANDS = registry.counter(
+    'terra_commands_total', 'Processed commands by type', ('command_type',))
+COMMAND_ERRORS = registry.counter(
+    'terra_command_errors_total', 'Commands that failed during processing', ('command_type',))
+AUDIO_SECONDS = registry.counter(
+    'terra_audio_duration_seconds_total', 'Audio duration received from clients and sent to STT', ('stage',))
+AUDIO_BYTES = registry.counter(
+    'terra_audio_bytes_total', 'Audio bytes received from clients and sent to STT', ('stage',))
+STT_ATTEMPTS = registry.counter(
+    'terra_stt_attempts_total', 'Speech-to-text backend attempts by outcome', ('outcome',))
+STT_EVENTS = registry.counter(
+    'terra_stt_events_total', 'Retries, hedged attempts, deadlines and fallbacks of speech-to-text calls', ('event',))
+
+
+def _render_quantiles() -> List[str]:
+    """p50/p95/p99 этапов, посчитанные в процессе, для просмотра без PromQL"""
+    name = 'terra_stage_duration_quantile_seconds'
+    lines = [f'# HELP {name} Estimated quantiles of pipeline stage duration', f'# TYPE {name} gauge']
+    for labels in STAGE_SECONDS.labelsets():
+        for q in QUANTILES:
+            value = STAGE_SECONDS.quantile(q, *labels)
+            if value is not None:
+                lines.append(f'{name}{_format_labels(("stage",), labels, f"quantile={chr(34)}{q}{chr(34)}")} '
+                             f'{_format_value(value)}')
+    return lines
+
+
+# Этапы текущего запроса: (этап, секунды); None - разбивка не собирается
+_breakdown: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('terra_timing_breakdown', default=None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Замеряет этап: гистограмма, счетчик ошибок и разбивка текущего запроса"""
+    if not registry.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown.append((stage, elapsed))
+
+
+def start_breakdown(collect: bool = True):
+    """Начинает (или отключает) сбор разбивки по этапам в текущем контексте; возвращает токен"""
+    return _breakdown.set([] if collect else None)
+
+
+def finish_breakdown(token) -> List[Tuple[str, float]]:
+    breakdown = _breakdown.get() or []
+    _breakdown.reset(token)
+    return breakdown
+
+
+def server_timing(breakdown: Sequence[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Значение заголовка Server-Timing; повторяющиеся этапы суммируются"""
+    durations: Dict[str, float] = {}
+    for stage, seconds in breakdown:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    if total is not None:
+        durations['total'] = total
+    return ', '.join(f'{stage.replace(".", "-")};dur={seconds * 1000:.2f}' for stage, seconds in durations.items())
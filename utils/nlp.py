@@ -1,62 +1,98 @@
 import logging
 import re
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from collections import Counter, deque
+from itertools import islice
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from utils.commands import registry
+from utils.entities import EntityRecord, extract_entities
+from utils.fuzzy import FuzzyIndex, strip_wake_words, vocabulary
+from utils.matcher import IntentMatcher
+from utils.metrics import STAGE_ERRORS, span
 
 logger = logging.getLogger(__name__)
 
+# Шаблоны команд для распознавания берутся из реестра команд
+COMMAND_PATTERNS = registry.patterns()
+
+# Автомат и индекс исправления опечаток строятся один раз при импорте модуля
+_intent_matcher = IntentMatcher(COMMAND_PATTERNS)
+_fuzzy_index = FuzzyIndex(vocabulary(COMMAND_PATTERNS))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+class ContextRecord:
+    """Одна запись истории диалога"""
+    __slots__ = ('command_type', 'entities', 'timestamp')
+
+    def __init__(self, command_type: str, entities: Mapping, timestamp: datetime):
+        self.command_type = command_type
+        self.entities = entities
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f'<ContextRecord {self.command_type} at {self.timestamp:%H:%M:%S}>'
+
 class DialogContext:
+    # Экземпляр создается на каждую сессию, поэтому общие таблицы
+    # хранятся на уровне класса, а состояние - в слотах
+    __slots__ = ('context_history', 'current_topic')
+
+    confidence_threshold = 0.6
+    max_context_length = 5
+
+    # Шаблоны команд и скомпилированный по ним автомат общие для всех экземпляров
+    command_patterns = COMMAND_PATTERNS
+    matcher = _intent_matcher
+    fuzzy = _fuzzy_index
+    # Необязательный IntentClassifier; без него используется только matcher
+    classifier = None
+
     def __init__(self):
-        self.context_history = []
+        # deque с maxlen сам вытесняет самые старые записи
+        self.context_history = deque(maxlen=self.max_context_length)
         self.current_topic = None
-        self.confidence_threshold = 0.6
-        self.max_context_length = 5
-        
-        # Шаблоны команд для распознавания
-        self.command_patterns = {
-            'greeting': [
-                'привет', 'здравствуй', 'добр', 'хай', 'hello'
-            ],
-            'task_creation': [
-                'создать задачу', 'новая задача', 'добавить задачу',
-                'запланировать', 'поставить задачу'
-            ],
-            'finance': [
-                'финансы', 'бюджет', 'расходы', 'доходы', 'платеж',
-                'счет', 'транзакция'
-            ],
-            'project': [
-                'проект', 'создать проект', 'статус проекта',
-                'обновить проект', 'завершить проект'
-            ]
-        }
 
-        # Регистрация извлекателей сущностей для разных типов команд
-        self.entity_extractors = {
-            'task_creation': self._extract_task_details,
-            'project': self._extract_project_details,
+    def to_state(self) -> Dict:
+        """История и тема диалога в виде, пригодном для JSON"""
+        return {
+            'topic': self.current_topic,
+            'history': [
+                [record.command_type,
+                 record.entities.to_state() if isinstance(record.entities, EntityRecord) else dict(record.entities),
+                 record.timestamp.isoformat()]
+                for record in self.context_history
+            ],
         }
 
-    def update_context(self, command_type: str, entities: Dict) -> None:
+    @classmethod
+    def from_state(cls, state: Mapping) -> 'DialogContext':
+        context = cls()
+        context.current_topic = state.get('topic')
+        for command_type, entities, timestamp in state.get('history', ()):
+            context.context_history.append(
+                ContextRecord(command_type, EntityRecord.from_state(entities), datetime.fromisoformat(timestamp))
+            )
+        return context
+
+    def update_context(self, command_type: str, entities: Mapping) -> None:
         """Обновляет историю контекста"""
-        context = {
-            'command_type': command_type,
-            'entities': entities,
-            'timestamp': datetime.now()
-        }
-        self.context_history.append(context)
-        
-        # Ограничиваем размер истории контекста
-        if len(self.context_history) > self.max_context_length:
-            self.context_history.pop(0)
+        self.context_history.append(ContextRecord(command_type, entities, datetime.now()))
 
     def _clean_text(self, text: str) -> str:
         """Очищает и нормализует входной текст"""
-        text = text.lower()
-        text = text.replace('терра', '').replace('terra', '')
-        text = re.sub(r'\s+', ' ', text)
+        text = strip_wake_words(text.lower())
+        text = _WHITESPACE_RE.sub(' ', text)
         return text.strip()
 
+    def _matching_text(self, cleaned_text: str) -> str:
+        """Текст для распознавания команды: слова с ошибками заменены словами из фраз.
+
+        Сущности извлекаются из исходного очищенного текста.
+        """
+        return self.fuzzy.correct(cleaned_text)
+
     def _calculate_command_confidence(self, text: str, patterns: List[str]) -> float:
         """Вычисляет уверенность в распознавании команды"""
         max_confidence = 0.0
@@ -66,66 +102,67 @@ class DialogContext:
                 max_confidence = max(max_confidence, confidence)
         return max_confidence
 
-    def analyze_text(self, text: str) -> Tuple[str, Dict]:
-        """Анализирует текст и возвращает тип команды и извлеченные сущности"""
+    def _detect_intent(self, cleaned_text: str,
+                       prediction: Optional[Tuple[str, float]] = None) -> Tuple[str, Dict[str, float]]:
+        """Тип команды по классификатору, а если он не уверен - по фразам"""
+        if prediction is None and self.classifier is not None:
+            prediction = self.classifier.predict(cleaned_text)
+        if prediction is not None and prediction[0] != 'unknown':
+            return prediction[0], {prediction[0]: prediction[1]}
+
+        # Все фразы ищутся за один проход
+        confidence_scores = self.matcher.confidences(cleaned_text)
+        command_type = 'unknown'
+        max_confidence = 0
+        for intent, confidence in confidence_scores.items():
+            if confidence > max_confidence:
+                max_confidence = confidence
+                if confidence > self.confidence_threshold:
+                    command_type = intent
+        return command_type, confidence_scores
+
+    def analyze_text(self, text: str, verbose: bool = True,
+                     prediction: Optional[Tuple[str, float]] = None) -> Tuple[str, EntityRecord]:
+        """Анализирует текст и возвращает тип команды и извлеченные сущности.
+
+        verbose=False отключает построчное логирование (используется пакетной обработкой).
+        prediction - уже вычисленный ответ классификатора для этого текста.
+        """
         try:
             cleaned_text = self._clean_text(text)
             if not cleaned_text:
-                return 'unknown', {}
+                return 'unknown', EntityRecord()
 
-            command_type = 'unknown'
-            entities: Dict = {}
-            confidence_scores = {}
+            related_to = None
             
             # Проверяем связь с предыдущим контекстом
             if self.context_history and self.current_topic:
                 context_confidence = self._calculate_context_relevance(cleaned_text)
                 if context_confidence > 0.5:  # Порог связанности контекста
-                    entities['related_to'] = self.current_topic
-
-            # Распознаем основной тип команды
-            max_confidence = 0
-            for intent, patterns in self.command_patterns.items():
-                confidence = self._calculate_command_confidence(cleaned_text, patterns)
-                confidence_scores[intent] = confidence
-                if confidence > max_confidence:
-                    max_confidence = confidence
-                    if confidence > self.confidence_threshold:
-                        command_type = intent
-
-            # Извлекаем сущности на основе типа команды
-            if command_type in self.entity_extractors:
-                extracted_entities = self.entity_extractors[command_type](cleaned_text)
-                entities.update(extracted_entities)
-                
-                # Дополнительное извлечение временных и числовых параметров
-                time_entities = self._extract_time_entities(cleaned_text)
-                numeric_entities = self._extract_numeric_entities(cleaned_text)
-                entities.update(time_entities)
-                entities.update(numeric_entities)
-                
-            elif command_type == 'greeting':
-                entities['greeting'] = True
-                hour = datetime.now().hour
-                entities['time_of_day'] = (
-                    'morning' if 5 <= hour < 12
-                    else 'afternoon' if 12 <= hour < 17
-                    else 'evening' if 17 <= hour < 23
-                    else 'night'
-                )
+                    related_to = self.current_topic
+
+            with span('nlp.intent'):
+                command_type, confidence_scores = self._detect_intent(self._matching_text(cleaned_text), prediction)
+
+            # Все сущности извлекаются один раз и дальше передаются как неизменяемая запись
+            with span('nlp.entities'):
+                spec = registry.get(command_type)
+                entities = extract_entities(spec.extractor if spec else None, cleaned_text, related_to=related_to)
 
             # Обновляем контекст с новой информацией
             self.current_topic = command_type
             self.update_context(command_type, entities)
             
-            logger.info(f"Recognized command type: {command_type}, Entities: {entities}")
-            logger.debug(f"Confidence scores: {confidence_scores}")
+            if verbose:
+                logger.debug("Recognized command type: %s, Entities: %s", command_type, entities)
+                logger.debug("Confidence scores: %s", confidence_scores)
             
             return command_type, entities
 
         except Exception as e:
             logger.error(f"Error analyzing text: {str(e)}", exc_info=True)
-            return 'unknown', {'error': str(e)}
+            STAGE_ERRORS.inc('nlp')
+            return 'unknown', EntityRecord(error=str(e))
 
     def _calculate_context_relevance(self, text: str) -> float:
         """Вычисляет релевантность текста текущему контексту."""
@@ -133,12 +170,12 @@ class DialogContext:
             return 0.0
             
         last_context = self.context_history[-1]
-        if 'entities' not in last_context:
+        if not last_context.entities:
             return 0.0
             
         # Проверяем связь с предыдущими сущностями
         relevant_words = set()
-        for entity_value in last_context['entities'].values():
+        for entity_value in last_context.entities.values():
             if isinstance(entity_value, str):
                 relevant_words.update(entity_value.lower().split())
             elif isinstance(entity_value, (list, tuple)):
@@ -154,113 +191,30 @@ class DialogContext:
             
         return len(common_words) / len(relevant_words)
 
-    def _extract_time_entities(self, text: str) -> Dict:
-        """Извлекает временные параметры из текста."""
-        entities = {}
-        
-        # Поиск времени в формате ЧЧ:ММ
-        time_patterns = [
-            r'в (\d{1,2})[:\.](\d{2})',
-            r'на (\d{1,2})[:\.](\d{2})',
-            r'в (\d{1,2}) (\d{2})',
-        ]
-        
-        for pattern in time_patterns:
-            match = re.search(pattern, text)
-            if match:
-                hours, minutes = map(int, match.groups())
-                if 0 <= hours <= 23 and 0 <= minutes <= 59:
-                    entities['time'] = f"{hours:02d}:{minutes:02d}"
-                    break
-        
-        # Поиск дат
-        date_markers = {
-            'сегодня': 0,
-            'завтра': 1,
-            'послезавтра': 2,
-            'через неделю': 7,
-            'через месяц': 30
-        }
-        
-        for marker, days in date_markers.items():
-            if marker in text:
-                target_date = datetime.now() + timedelta(days=days)
-                entities['date'] = target_date.strftime('%Y-%m-%d')
-                break
-                
-        return entities
-
-    def _extract_numeric_entities(self, text: str) -> Dict:
-        """Извлекает числовые параметры из текста."""
-        entities = {}
-        
-        # Поиск числовых значений с единицами измерения
-        numeric_patterns = [
-            (r'(\d+)\s*(рубл[яейь]|руб)', 'amount'),
-            (r'(\d+)\s*(час[ао]в|час)', 'duration_hours'),
-            (r'(\d+)\s*(минут[аы]?|мин)', 'duration_minutes'),
-            (r'(\d+)\s*(шт[а-я]*|единиц[а-я]*)', 'quantity')
-        ]
-        
-        for pattern, entity_name in numeric_patterns:
-            match = re.search(pattern, text)
-            if match:
-                entities[entity_name] = int(match.group(1))
-                
-        return entities
-
-    def _extract_task_details(self, text: str) -> Dict:
-        """Извлекает детали задачи из текста."""
-        entities = {}
-        
-        # Поиск описания задачи
-        description_patterns = [
-            r'задач[ау]?\s+(.+?)(?:\s+на\s+|$)',
-            r'создать\s+(.+?)(?:\s+на\s+|$)',
-            r'запланировать\s+(.+?)(?:\s+на\s+|$)'
-        ]
-        
-        for pattern in description_patterns:
-            match = re.search(pattern, text)
-            if match:
-                entities['description'] = match.group(1).strip()
-                break
-                
-        # Определение приоритета
-        if any(word in text.lower() for word in ['срочн', 'важн', 'критичн']):
-            entities['priority'] = 'high'
-        else:
-            entities['priority'] = 'normal'
-            
-        return entities
 
-    def _extract_project_details(self, text: str) -> Dict:
-        """Извлекает детали проекта из текста."""
-        entities = {}
-        
-        # Поиск названия проекта
-        name_patterns = [
-            r'проект[а]?\s+[""]?([^""]+)[""]?',
-            r'создать проект\s+[""]?([^""]+)[""]?',
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, text)
-            if match:
-                entities['project_name'] = match.group(1).strip()
-                break
-                
-        # Определение статуса проекта
-        status_keywords = {
-            'начать': 'new',
-            'запустить': 'started',
-            'завершить': 'completed',
-            'закрыть': 'closed'
-        }
-        
-        for keyword, status in status_keywords.items():
-            if keyword in text.lower():
-                entities['status'] = status
-                break
-                
-        return entities
+def analyze_batch(items: Iterable[Tuple[DialogContext, str]],
+                  chunk_size: int = 256) -> Iterator[Tuple[str, EntityRecord]]:
+    """Анализирует поток пар (контекст, текст) с одной итоговой записью в лог.
+
+    Шаблоны уже скомпилированы на уровне модуля, поэтому пакет платит
+    только за сам разбор каждого текста. С классификатором тексты читаются
+    порциями по chunk_size и классифицируются одним векторным вызовом.
+    """
+    counts: Counter = Counter()
+    classifier = DialogContext.classifier
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size if classifier is not None else 1))
+        if not chunk:
+            break
+        predictions = None
+        if classifier is not None:
+            predictions = classifier.predict_batch(
+                [context._matching_text(context._clean_text(text)) for context, text in chunk]
+            )
+        for index, (context, text) in enumerate(chunk):
+            prediction = predictions[index] if predictions else None
+            command_type, entities = context.analyze_text(text, verbose=False, prediction=prediction)
+            counts[command_type] += 1
+            yield command_type, entities
+    logger.info(f"Batch analyzed: {sum(counts.values())} utterances, by type: {dict(counts)}")
@@ -0,0 +1,74 @@
+import logging
+import re
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from utils.fuzzy import strip_wake_words
+
+logger = logging.getLogger(__name__)
+
+# Служебные слова команды удаляются одним проходом: альтернативы
+# перечислены в том же порядке, в котором раньше применялись отдельные
+# регулярные выражения. Слово активации удаляется раньше, целыми словами
+_FILLER_RE = re.compile(
+    r'создай(?:те)?\s+'
+    r'|создать\s+'
+    r'|добавь(?:те)?\s+'
+    r'|добавить\s+'
+    r'|постав(?:ь|ите)?\s+'
+    r'|срочную?\s+'
+    r'|важную?\s+'
+    r'|критичную?\s+'
+    r'|задачу\s*'
+    r'|поручение\s*',
+    re.IGNORECASE
+)
+
+_EDGES_RE = re.compile(r'^[\s,\-–]+|[\s,\-–]+$')
+
+# Порядок важен: проверяется первое слово из списка, найденное в тексте
+DATE_WORDS = (
+    ('завтра', timedelta(days=1)),
+    ('послезавтра', timedelta(days=2)),
+    ('через день', timedelta(days=1)),
+    ('через неделю', timedelta(weeks=1)),
+    ('через месяц', timedelta(days=30)),
+)
+
+_TIME_RE = re.compile(r'в\s+(\d{1,2})(?:[:.:](\d{2}))?\s*(?:час[оа]в?|час|ч)?')
+_TIME_STRIP_RE = re.compile(r'в\s+\d{1,2}(?:[:.:]?\d{2})?\s*(?:час[оа]в?|час|ч)?\s*')
+
+
+class NormalizedTask(NamedTuple):
+    """Результат нормализации текста задачи"""
+    description: str
+    date_offset: Optional[timedelta] = None
+    hours: Optional[int] = None
+    minutes: Optional[int] = None
+
+
+def normalize_task_text(description: str) -> NormalizedTask:
+    """Strips command words and extracts relative date and time from a task description"""
+    description = _EDGES_RE.sub('', _FILLER_RE.sub('', strip_wake_words(description)))
+
+    date_offset = None
+    lowered = description.lower()
+    for word, delta in DATE_WORDS:
+        if word in lowered:
+            date_offset = delta
+            description = description.replace(word, '').strip()
+            break
+
+    hours = minutes = None
+    time_match = _TIME_RE.search(description)
+    if time_match:
+        found_hours = int(time_match.group(1))
+        found_minutes = int(time_match.group(2)) if time_match.group(2) else 0
+        if 0 <= found_hours <= 23 and 0 <= found_minutes <= 59:
+            hours, minutes = found_hours, found_minutes
+            description = _TIME_STRIP_RE.sub('', description)
+
+    description = ' '.join(description.split()).rstrip('.')
+    logger.debug("Normalized task text: %r, date_offset=%s, time=%s:%s",
+                 description, date_offset, hours, minutes)
+    return NormalizedTask(description, date_offset, hours, minutes)
@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+
+from utils.listing import bump_table_versions
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers inserts and writes them in batched transactions from a background thread.
+
+    Строки сбрасываются, когда в буфере набирается batch_size записей или
+    с момента первой несброшенной записи прошло flush_interval секунд.
+    Запрос не ждет фиксации транзакции, поэтому SQLite не тормозит ответы.
+    После close строки записываются сразу в потоке вызывающего.
+    """
+
+    def __init__(self, engine_getter: Callable[[], Engine], batch_size: int = 100,
+                 flush_interval: float = 0.2, max_queue: int = 10000):
+        self.engine_getter = engine_getter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: 'queue.Queue[Any]' = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        # Под блокировкой только проверка _closed и счетчик строк, которые
+        # сейчас ставятся в очередь; close ждет, пока счетчик обнулится, и
+        # лишь затем кладет _STOP, поэтому строк после _STOP не бывает
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._putting = 0
+        self._stats_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Количество строк, ожидающих записи"""
+        return self._queue.qsize()
+
+    def enqueue(self, table: Table, timeout: float = 0.05, **values) -> bool:
+        """Ставит строку в очередь; при переполнении очереди строка отбрасывается"""
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._putting += 1
+        if closed:
+            # Очередь закрыта (остановка процесса): строка пишется синхронно
+            logger.debug(f"Write-behind queue is closed, writing row for {table.name} synchronously")
+            return self._flush([(table, values)])
+        try:
+            # Ожидание места в очереди идет без блокировки, параллельно с другими потоками
+            self._queue.put((table, values), timeout=timeout)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logger.error(f"Write-behind queue is full, dropping row for {table.name}")
+            return False
+        finally:
+            with self._lock:
+                self._putting -= 1
+                if not self._putting:
+                    self._idle.notify_all()
+
+    def _run(self) -> None:
+        buffer: List[Tuple[Table, Dict]] = []
+        deadline: Optional[float] = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    buffer.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+
+            # Забираем все, что уже лежит в очереди, не дожидаясь таймера
+            while len(buffer) < self.batch_size and not stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    buffer.append(item)
+
+            if buffer and (stopping or len(buffer) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(buffer)
+                buffer = []
+                deadline = None
+
+        # Строки после _STOP не появляются, но очередь все равно выбирается до конца
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                buffer.append(item)
+            if len(buffer) >= self.batch_size:
+                self._flush(buffer)
+                buffer = []
+        if buffer:
+            self._flush(buffer)
+
+    def _flush(self, buffer: List[Tuple[Table, Dict]]) -> bool:
+        rows_by_table: Dict[Table, List[Dict]] = defaultdict(list)
+        for table, values in buffer:
+            rows_by_table[table].append(values)
+        try:
+            # Одна транзакция и один executemany на таблицу
+            with self.engine_getter().begin() as conn:
+                for table, rows in rows_by_table.items():
+                    conn.execute(table.insert(), rows)
+                bump_table_versions(conn, (table.name for table in rows_by_table))
+            with self._stats_lock:
+                self.written += len(buffer)
+                self.batches += 1
+            logger.debug(f"Write-behind flushed {len(buffer)} rows")
+            return True
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += len(buffer)
+            logger.error(f"Write-behind flush of {len(buffer)} rows failed: {str(e)}", exc_info=True)
+            return False
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Записывает все оставшиеся строки и останавливает поток"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Новые строки уже идут мимо очереди; начатые put завершаются за их timeout
+            self._idle.wait_for(lambda: not self._putting)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Write-behind queue not drained in {timeout}s, {self.depth} rows still queued")
+        logger.info(f"Write-behind queue drained: {self.written} rows written, {self.dropped} dropped")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'depth': self.depth,
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
@@ -0,0 +1,137 @@
+import io
+import logging
+import struct
+import wave
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from utils.audio import AudioUpload
+from utils.metrics import AUDIO_BYTES, AUDIO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TARGET_RATE = 16000
+FRAME_MS = 30
+# Порог речи: не тише MIN_LEVEL (около -46 dBFS) и в NOISE_FACTOR раз громче фона
+MIN_LEVEL = 0.005
+NOISE_FACTOR = 3.0
+PAD_MS = 200
+
+# Целочисленные форматы PCM, которые читает модуль wave: ширина отсчета -> (dtype, масштаб)
+_SAMPLE_FORMATS = {1: ('u1', 128.0), 2: ('<i2', 32768.0), 4: ('<i4', 2147483648.0)}
+
+
+class PreprocessResult(NamedTuple):
+    upload: AudioUpload
+    seconds_before: float
+    seconds_after: float
+    bytes_before: int
+    bytes_after: int
+
+
+def read_wav(upload: AudioUpload) -> Optional[Tuple[np.ndarray, int]]:
+    """Моно-сигнал float32 в [-1, 1] и частота; None для неподдерживаемых WAV"""
+    _, stream = upload.as_file()
+    with wave.open(stream, 'rb') as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        if wav.getcomptype() != 'NONE' or width not in _SAMPLE_FORMATS or rate <= 0:
+            return None
+        frames = wav.readframes(wav.getnframes())
+    dtype, scale = _SAMPLE_FORMATS[width]
+    samples = np.frombuffer(frames, dtype=dtype).astype(np.float32)
+    if width == 1:
+        samples -= 128.0
+    samples /= scale
+    # Сведение в моно: среднее по каналам
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def resample(samples: np.ndarray, rate: int, target: int = TARGET_RATE) -> Tuple[np.ndarray, int]:
+    """Понижает частоту до target; более низкая частота не меняется"""
+    if rate <= target:
+        return samples, rate
+    if rate % target == 0:
+        # Кратная частота (48 кГц -> 16 кГц): среднее по блокам фильтрует и прореживает сразу
+        factor = rate // target
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1), target
+    # Скользящее среднее вместо фильтра нижних частот, затем линейная интерполяция
+    width = int(np.ceil(rate / target))
+    smoothed = np.convolve(samples, np.full(width, 1.0 / width, dtype=np.float32), mode='same')
+    positions = np.arange(int(len(samples) * target / rate)) * (rate / target)
+    return np.interp(positions, np.arange(len(samples)), smoothed).astype(np.float32), target
+
+
+def trim_silence(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS, pad_ms: int = PAD_MS,
+                 min_level: float = MIN_LEVEL) -> np.ndarray:
+    """Обрезает тишину в начале и в конце по энергии кадров (VAD).
+
+    Фон оценивается по тихим кадрам записи (10-й перцентиль RMS). Если
+    речи не найдено, сигнал возвращается без изменений, чтобы решение
+    принял движок распознавания.
+    """
+    frame = max(1, rate * frame_ms // 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return samples
+    rms = np.sqrt(np.mean(np.square(samples[:count * frame].reshape(count, frame)), axis=1))
+    threshold = max(min_level, float(np.percentile(rms, 10)) * NOISE_FACTOR)
+    voiced = np.flatnonzero(rms > threshold)
+    if voiced.size == 0:
+        return samples
+    pad = rate * pad_ms // 1000
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+
+def write_wav(samples: np.ndarray, rate: int) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def preprocess_audio(upload: AudioUpload, target_rate: int = TARGET_RATE,
+                     pad_ms: int = PAD_MS) -> Optional[PreprocessResult]:
+    """Обрезка тишины, моно и 16 кГц для PCM WAV перед распознаванием.
+
+    Другие форматы (WebM/Opus из MediaRecorder) и поврежденные WAV не
+    декодируются и возвращается None: загрузка уходит в распознавание как есть.
+    Длительность и размер до и после попадают в счетчики метрик.
+    """
+    if not upload.is_wav:
+        return None
+    try:
+        decoded = read_wav(upload)
+    except (wave.Error, EOFError, ValueError, struct.error, MemoryError) as e:
+        # Поврежденный заголовок (в том числе с огромным числом кадров) не должен
+        # ронять запрос: запись уходит в распознавание без обработки
+        logger.warning("Cannot decode WAV upload %s: %s", upload.filename, e)
+        decoded = None
+    if decoded is None:
+        upload.stream.seek(0)
+        return None
+    samples, rate = decoded
+    bytes_before = upload.stream.seek(0, io.SEEK_END)
+    seconds_before = len(samples) / rate if rate else 0.0
+
+    samples, rate = resample(samples, rate, target_rate)
+    samples = trim_silence(samples, rate, pad_ms=pad_ms)
+    data = write_wav(samples, rate)
+    result = PreprocessResult(AudioUpload.from_bytes(data, upload.filename), seconds_before,
+                              len(samples) / rate if rate else 0.0, bytes_before, len(data))
+
+    AUDIO_SECONDS.inc('received', amount=result.seconds_before)
+    AUDIO_SECONDS.inc('sent', amount=result.seconds_after)
+    AUDIO_BYTES.inc('received', amount=result.bytes_before)
+    AUDIO_BYTES.inc('sent', amount=result.bytes_after)
+    logger.debug("Audio preprocessed: %.2fs/%d bytes -> %.2fs/%d bytes", result.seconds_before,
+                 result.bytes_before, result.seconds_after, result.bytes_after)
+    return result
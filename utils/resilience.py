@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Circuit breaker over a sliding window of call outcomes.
+
+    closed - вызовы проходят; доля ошибок среди последних window вызовов
+    не ниже failure_ratio (при хотя бы min_calls вызовах) размыкает цепь.
+    open - вызовы отклоняются сразу, пока не пройдет cooldown секунд.
+    half_open - пропускается один пробный вызов: успех замыкает цепь,
+    ошибка снова размыкает ее.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int = 20, failure_ratio: float = 0.5, min_calls: Optional[int] = None,
+                 cooldown: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls if min_calls is not None else max(1, window // 2)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe = False
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._probe = False
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Секунды до пробного вызова, пока цепь разомкнута"""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов; в half_open разрешается один пробный"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                self._outcomes.clear()
+                self._failures = 0
+                if success:
+                    self._state = self.CLOSED
+                    logger.info("Circuit breaker closed after a successful probe")
+                else:
+                    self._open()
+                return
+            if state == self.OPEN:
+                # Запоздавший ответ вызова, начатого до размыкания
+                return
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= not self._outcomes[0]
+            self._outcomes.append(success)
+            self._failures += not success
+            if (len(self._outcomes) >= self.min_calls
+                    and self._failures >= self.failure_ratio * len(self._outcomes)):
+                self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._probe = False
+        self._trips += 1
+        self._outcomes.clear()
+        self._failures = 0
+        logger.warning("Circuit breaker opened for %.0fs", self.cooldown)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'open': int(self._current_state() != self.CLOSED),
+                'trips': self._trips,
+                'window_failures': self._failures,
+            }
+
+
+class LatencyWindow:
+    """Последние size задержек успешных вызовов и их квантили"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Квантиль q или None, пока замеров меньше min_samples"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
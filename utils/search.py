@@ -0,0 +1,184 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, column, or_, select, table, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Служебные слова запроса, не несущие смысла для поиска
+STOPWORDS = frozenset((
+    'и', 'в', 'во', 'на', 'по', 'про', 'о', 'об', 'обо', 'для', 'с', 'со', 'к', 'ко', 'у', 'из', 'от',
+    'все', 'всё', 'мне', 'мой', 'мои', 'моих', 'это', 'эти', 'какие', 'какой', 'где', 'есть',
+))
+
+# Индексируемые таблицы: имя FTS-таблицы -> (таблица, столбцы, тип результата, столбец заголовка)
+INDEXED_TABLES = {
+    'tasks_fts': ('tasks', ('title', 'description'), 'task', 'title'),
+    'business_entities_fts': ('business_entities', ('name', 'description', 'contact_info'), 'entity', 'name'),
+}
+
+
+class SearchHit(NamedTuple):
+    """Один найденный объект"""
+    kind: str
+    id: int
+    title: str
+    rank: float
+
+
+@lru_cache(maxsize=1)
+def _stemmer():
+    from nltk.stem.snowball import SnowballStemmer
+    return SnowballStemmer('russian')
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Основа русского слова по алгоритму Snowball"""
+    stemmed = _stemmer().stem(word)
+    # Слишком короткие основы дают шумный префиксный поиск
+    return stemmed if len(stemmed) >= 3 else word
+
+
+def query_terms(query: str) -> List[str]:
+    """Основы значимых слов запроса"""
+    words = _TOKEN_RE.findall(query.lower().replace('ё', 'е'))
+    return [stem(word) for word in words if word not in STOPWORDS and len(word) > 1]
+
+
+def _match_expression(terms: List[str], operator: str) -> str:
+    # Индекс хранит словоформы как есть (unicode61), а запрос ищет
+    # по префиксу основы: "отчет"* находит "отчета", "отчетов"
+    return f' {operator} '.join(f'"{term}"*' for term in terms)
+
+
+class SearchIndex:
+    """Full-text index over tasks and business entities.
+
+    На SQLite используются FTS5-таблицы с внешним содержимым, которые
+    поддерживаются в актуальном состоянии триггерами на вставку, изменение
+    и удаление. На других СУБД и на SQLite без FTS-таблиц поиск
+    выполняется через ILIKE (на SQLite - lower(...) LIKE lower(...)).
+    """
+
+    def __init__(self):
+        self.engine_getter: Optional[Callable[[], Engine]] = None
+        self.fts_enabled = False
+
+    @property
+    def ready(self) -> bool:
+        return self.engine_getter is not None
+
+    def init_app(self, app, engine_getter: Callable[[], Engine], create_schema: bool = True) -> None:
+        self.engine_getter = engine_getter
+        with app.app_context():
+            engine = engine_getter()
+            if engine.dialect.name == 'sqlite':
+                # Без создания схемы только проверяем, что FTS-таблицы уже есть
+                self.fts_enabled = self.ensure_schema(engine) if create_schema else self.schema_exists(engine)
+            else:
+                logger.warning(f"Full-text index is not available for {engine.dialect.name}, using ILIKE search")
+
+    @staticmethod
+    def schema_exists(engine: Engine) -> bool:
+        with engine.connect() as conn:
+            found = conn.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+                    ', '.join(f"'{fts}'" for fts in INDEXED_TABLES))
+            )).scalar()
+        return found == len(INDEXED_TABLES)
+
+    @staticmethod
+    def ensure_schema(engine: Engine) -> bool:
+        """Создает FTS5-таблицы и триггеры синхронизации; при создании заполняет индекс"""
+        try:
+            with engine.begin() as conn:
+                for fts, (table, columns, _, _) in INDEXED_TABLES.items():
+                    exists = conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}
+                    ).first()
+                    column_list = ', '.join(columns)
+                    new_values = ', '.join(f'new.{column}' for column in columns)
+                    old_values = ', '.join(f'old.{column}' for column in columns)
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                        f"{column_list}, content='{table}', content_rowid='id', "
+                        f"tokenize='unicode61 remove_diacritics 2')"
+                    ))
+                    conn.execute(text(
+                        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+                    ))
+                    conn.execute(text(
+                        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+                    ))
+                    conn.execute(text(
+                        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+                        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+                        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+                    ))
+                    if not exists:
+                        # Индекс для уже существующих строк
+                        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                        logger.info(f"Full-text index {fts} built")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to create full-text index: {str(e)}", exc_info=True)
+            return False
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[tuple] = None) -> List[SearchHit]:
+        """Возвращает найденные задачи и сущности, лучшие первыми"""
+        if not self.ready:
+            raise RuntimeError('Search index is not initialized')
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        engine = self.engine_getter()
+        with engine.connect() as conn:
+            if self.fts_enabled:
+                # Сначала ищем все слова, при отсутствии результатов - любое из них
+                hits = self._fts_search(conn, _match_expression(terms, 'AND'), limit, kinds)
+                if not hits and len(terms) > 1:
+                    hits = self._fts_search(conn, _match_expression(terms, 'OR'), limit, kinds)
+                return hits
+            return self._like_search(conn, terms, limit, kinds)
+
+    @staticmethod
+    def _fts_search(conn, match: str, limit: int, kinds: Optional[tuple]) -> List[SearchHit]:
+        hits: List[SearchHit] = []
+        for fts, (table, _, kind, title_column) in INDEXED_TABLES.items():
+            if kinds and kind not in kinds:
+                continue
+            rows = conn.execute(text(
+                f"SELECT t.id, t.{title_column}, bm25({fts}) AS score FROM {fts} "
+                f"JOIN {table} t ON t.id = {fts}.rowid "
+                f"WHERE {fts} MATCH :match ORDER BY score LIMIT :limit"
+            ), {'match': match, 'limit': limit})
+            hits.extend(SearchHit(kind, row[0], row[1], row[2]) for row in rows)
+        # bm25 возвращает отрицательные значения: чем меньше, тем лучше
+        hits.sort(key=lambda hit: hit.rank)
+        return hits[:limit]
+
+    @staticmethod
+    def _like_search(conn, terms: List[str], limit: int, kinds: Optional[tuple]) -> List[SearchHit]:
+        hits: List[SearchHit] = []
+        for name, columns, kind, title_column in INDEXED_TABLES.values():
+            if kinds and kind not in kinds:
+                continue
+            source = table(name, *(column(name) for name in {'id', 'created_at', title_column, *columns}))
+            # ilike дает SQL, подходящий диалекту: ILIKE в PostgreSQL, lower() LIKE lower() в SQLite
+            conditions = [or_(*(source.c[name].ilike(f'%{term}%') for name in columns)) for term in terms]
+            query = (select(source.c.id, source.c[title_column]).where(and_(*conditions))
+                     .order_by(source.c.created_at.desc()).limit(limit))
+            hits.extend(SearchHit(kind, row[0], row[1], 0.0) for row in conn.execute(query))
+        return hits[:limit]
+
+
+search_index = SearchIndex()
@@ -0,0 +1,341 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import count
+from typing import Callable, Dict, Iterator, Mapping, Optional, Tuple
+
+from utils.nlp import DialogContext
+
+logger = logging.getLogger(__name__)
+
+
+# Номер последнего обращения к сессии: задает общий порядок LRU для всех шардов
+_uses = count()
+
+
+class SessionEntry:
+    """Контекст диалога одной сессии и его служебные поля"""
+    __slots__ = ('context', 'lock', 'last_seen', 'last_use')
+
+    def __init__(self, context: DialogContext, now: float):
+        self.context = context
+        # Запросы одной сессии выполняются последовательно,
+        # разные сессии друг друга не блокируют
+        self.lock = threading.Lock()
+        self.touch(now)
+
+    def touch(self, now: float) -> None:
+        self.last_seen = now
+        self.last_use = next(_uses)
+
+
+class _Shard:
+    __slots__ = ('lock', 'entries')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: 'OrderedDict[str, SessionEntry]' = OrderedDict()
+
+
+class DialogContextStore:
+    """Thread-safe per-session DialogContext storage with LRU and idle TTL eviction.
+
+    Сессии распределены по шардам с собственными блокировками, чтобы
+    параллельные запросы разных пользователей не конкурировали за одну
+    блокировку. Лимит max_sessions общий: при его превышении вытесняется
+    сессия, к которой дольше всего не обращались, из любого шарда.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 1800.0, shards: int = 16,
+                 factory: Callable[[], DialogContext] = DialogContext,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.factory = factory
+        self.clock = clock
+        self._shards = tuple(_Shard() for _ in range(max(1, shards)))
+        # Вытеснение по общему лимиту выполняет один поток за раз
+        self._evict_lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
+
+    def _shard(self, session_id: str) -> _Shard:
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def acquire(self, session_id: str) -> SessionEntry:
+        """Returns the entry for session_id, creating it if needed"""
+        now = self.clock()
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = shard.entries.get(session_id)
+            if entry is not None and now - entry.last_seen > self.ttl:
+                del shard.entries[session_id]
+                self.expired += 1
+                entry = None
+
+            created = entry is None
+            if created:
+                entry = SessionEntry(self.factory(), now)
+                shard.entries[session_id] = entry
+                self._drop_expired(shard, now)
+            else:
+                entry.touch(now)
+                shard.entries.move_to_end(session_id)
+        if created and len(self) > self.max_sessions:
+            self._evict()
+        return entry
+
+    def get(self, session_id: str) -> DialogContext:
+        """Returns the DialogContext of the session"""
+        return self.acquire(session_id).context
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[DialogContext]:
+        """Контекст сессии на время обработки одного запроса"""
+        entry = self.acquire(session_id)
+        with entry.lock:
+            yield entry.context
+
+    def _drop_expired(self, shard: _Shard, now: float) -> None:
+        # Самые старые записи шарда в начале, просроченные удаляются до первой живой
+        entries = shard.entries
+        while entries and now - next(iter(entries.values())).last_seen > self.ttl:
+            entries.popitem(last=False)
+            self.expired += 1
+
+    def _evict(self) -> None:
+        # В начале каждого шарда его самая давняя сессия; из них вытесняется
+        # самая давняя по общему счетчику обращений
+        with self._evict_lock:
+            while len(self) > self.max_sessions:
+                oldest: Optional[Tuple[_Shard, str, SessionEntry]] = None
+                for shard in self._shards:
+                    with shard.lock:
+                        if shard.entries:
+                            session_id, entry = next(iter(shard.entries.items()))
+                            if oldest is None or entry.last_use < oldest[2].last_use:
+                                oldest = (shard, session_id, entry)
+                if oldest is None:
+                    return
+                shard, session_id, entry = oldest
+                with shard.lock:
+                    # Пока шарды просматривались, к сессии могли обратиться снова
+                    if shard.entries.get(session_id) is entry and next(iter(shard.entries)) == session_id:
+                        del shard.entries[session_id]
+                        self.evicted += 1
+                        logger.debug("Evicted dialog context for session %s", session_id)
+
+    def discard(self, session_id: str) -> None:
+        shard = self._shard(session_id)
+        with shard.lock:
+            shard.entries.pop(session_id, None)
+
+    def purge_expired(self) -> int:
+        """Удаляет все просроченные сессии и возвращает их количество"""
+        now = self.clock()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                stale = [sid for sid, entry in shard.entries.items() if now - entry.last_seen > self.ttl]
+                for sid in stale:
+                    del shard.entries[sid]
+                removed += len(stale)
+        self.expired += removed
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sessions': len(self),
+            'max_sessions': self.max_sessions,
+            'evicted': self.evicted,
+            'expired': self.expired,
+        }
+
+
+class SQLiteDialogContextStore:
+    """DialogContext storage in a SQLite file shared by all worker processes.
+
+    Запросы одной сессии могут попасть на разные воркеры, поэтому контекст
+    читается из базы перед разбором и записывается после. Разбор идет без
+    блокировки базы; если другой процесс успел записать ту же сессию,
+    новые записи истории добавляются к сохраненным (оптимистичная запись
+    по номеру версии).
+    """
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl: float = 1800.0, lock_stripes: int = 64,
+                 factory: Callable[[], DialogContext] = DialogContext):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.factory = factory
+        self._local = threading.local()
+        # Запросы одной сессии внутри процесса выполняются последовательно
+        self._locks = tuple(threading.Lock() for _ in range(max(1, lock_stripes)))
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.conflicts = 0
+        self.expired = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS dialog_contexts ('
+                'session_id TEXT PRIMARY KEY, state TEXT NOT NULL, '
+                'version INTEGER NOT NULL, updated_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_dialog_contexts_updated_at '
+                         'ON dialog_contexts (updated_at)')
+
+    @staticmethod
+    def new_session_id() -> str:
+        return DialogContextStore.new_session_id()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3-соединение нельзя делить между потоками
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _load(self, session_id: str) -> Tuple[DialogContext, int]:
+        row = self._connection().execute(
+            'SELECT state, version, updated_at FROM dialog_contexts WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        if row is None:
+            return self.factory(), 0
+        state, version, updated_at = row
+        if time.time() - updated_at > self.ttl:
+            self.expired += 1
+            return self.factory(), version
+        return DialogContext.from_state(json.loads(state)), version
+
+    def _save(self, session_id: str, context: DialogContext, version: int, loaded: Tuple) -> None:
+        state = context.to_state()
+        conn = self._connection()
+        now = time.time()
+        # Обычный случай - одна инструкция без явной транзакции:
+        # запись проходит, только если версия не изменилась после чтения
+        if version:
+            saved = conn.execute(
+                'UPDATE dialog_contexts SET state = ?, version = version + 1, updated_at = ? '
+                'WHERE session_id = ? AND version = ?',
+                (json.dumps(state, ensure_ascii=False), now, session_id, version)
+            ).rowcount == 1
+        else:
+            saved = conn.execute(
+                'INSERT OR IGNORE INTO dialog_contexts (session_id, state, version, updated_at) VALUES (?, ?, 1, ?)',
+                (session_id, json.dumps(state, ensure_ascii=False), now)
+            ).rowcount == 1
+        if not saved:
+            self._save_conflict(conn, session_id, state, context, loaded, now)
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % 1000 == 0
+        if purge:
+            self.purge_expired()
+
+    def _save_conflict(self, conn: sqlite3.Connection, session_id: str, state: Dict, context: DialogContext,
+                       loaded: Tuple, now: float) -> None:
+        # Сессию изменил другой процесс: добавляем к ее истории только свои записи
+        self.conflicts += 1
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT state FROM dialog_contexts WHERE session_id = ?', (session_id,)).fetchone()
+            if row is not None:
+                state = self._merge(json.loads(row[0]), state, context, loaded)
+            conn.execute(
+                'INSERT INTO dialog_contexts (session_id, state, version, updated_at) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, '
+                'version = dialog_contexts.version + 1, updated_at = excluded.updated_at',
+                (session_id, json.dumps(state, ensure_ascii=False), now)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _merge(stored: Mapping, state: Dict, context: DialogContext, loaded: Tuple) -> Dict:
+        # Свои записи - те, которых не было при загрузке. По позиции последней
+        # загруженной их не найти: полная deque вытесняет ее при добавлении
+        loaded_ids = {id(record) for record in loaded}
+        appended = sum(1 for record in context.context_history if id(record) not in loaded_ids)
+        merged = list(stored.get('history', ())) + (state['history'][-appended:] if appended else [])
+        return {'topic': state['topic'], 'history': merged[-context.max_context_length:]}
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[DialogContext]:
+        """Загружает контекст сессии и сохраняет его после обработки запроса"""
+        with self._locks[hash(session_id) % len(self._locks)]:
+            context, version = self._load(session_id)
+            # Загруженные записи держатся до сохранения, поэтому их id не переиспользуются
+            loaded = tuple(context.context_history)
+            yield context
+            self._save(session_id, context, version, loaded)
+
+    def get(self, session_id: str) -> DialogContext:
+        """Сохраненный DialogContext сессии (копия, изменения не записываются)"""
+        return self._load(session_id)[0]
+
+    def discard(self, session_id: str) -> None:
+        self._connection().execute('DELETE FROM dialog_contexts WHERE session_id = ?', (session_id,))
+
+    def purge_expired(self) -> int:
+        """Удаляет просроченные сессии и самые старые сверх лимита"""
+        conn = self._connection()
+        removed = conn.execute('DELETE FROM dialog_contexts WHERE updated_at < ?', (time.time() - self.ttl,)).rowcount
+        conn.execute(
+            'DELETE FROM dialog_contexts WHERE session_id IN ('
+            'SELECT session_id FROM dialog_contexts ORDER BY updated_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_sessions,)
+        )
+        self.expired += removed
+        return removed
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM dialog_contexts').fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sessions': len(self),
+            'max_sessions': self.max_sessions,
+            'conflicts': self.conflicts,
+            'expired': self.expired,
+        }
+
+
+def create_session_store(config: Mapping):
+    """Хранилище контекстов по SESSION_STORE: memory (процесс) или sqlite (общее для воркеров)"""
+    backend = config.get('SESSION_STORE', 'memory')
+    if backend == 'memory':
+        return DialogContextStore(max_sessions=config.get('SESSION_MAX_COUNT', 10000),
+                                  ttl=config.get('SESSION_TTL', 1800))
+    if backend == 'sqlite':
+        return SQLiteDialogContextStore(config.get('SESSION_STORE_PATH', 'instance/sessions.db'),
+                                        max_sessions=config.get('SESSION_MAX_COUNT', 10000),
+                                        ttl=config.get('SESSION_TTL', 1800))
+    raise ValueError(f'Unknown SESSION_STORE: {backend}')
+
+
+def resolve_session_id(headers, cookies, header_name: str, cookie_name: str) -> Tuple[str, bool]:
+    """Возвращает id сессии из заголовка или cookie и признак того, что он новый"""
+    session_id: Optional[str] = headers.get(header_name) or cookies.get(cookie_name)
+    if session_id and 0 < len(session_id) <= 64:
+        return session_id, False
+    return DialogContextStore.new_session_id(), True
@@ -0,0 +1,86 @@
+import logging
+import os
+import sqlite3
+from typing import Dict, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATABASE_URL = 'sqlite:///instance/terra.db'
+
+# Настройки SQLite, применяемые к каждому новому соединению
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),        # читатели не блокируют писателя
+    ('synchronous', 'NORMAL'),      # в режиме WAL безопасно и без fsync на каждую транзакцию
+    ('busy_timeout', '5000'),
+    ('cache_size', '-20000'),       # 20MB страничного кэша
+    ('temp_store', 'MEMORY'),
+    ('mmap_size', '268435456'),
+    ('foreign_keys', 'ON'),
+)
+
+_pragmas_registered = False
+
+
+def database_url(env: Mapping[str, str] = os.environ) -> str:
+    """URL базы из DATABASE_URL; поддерживается устаревшая схема postgres://"""
+    url = env.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url: str, env: Mapping[str, str] = os.environ) -> Dict:
+    """Параметры пула соединений для выбранной СУБД"""
+    pool_size = int(env.get('DB_POOL_SIZE', 10))
+    max_overflow = int(env.get('DB_MAX_OVERFLOW', 20))
+    if url.startswith('sqlite'):
+        # Flask-SQLAlchemy по умолчанию отключает пул для SQLite-файлов;
+        # соединения переиспользуются разными потоками сервера
+        return {
+            'poolclass': QueuePool,
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'connect_args': {'check_same_thread': False, 'timeout': 5},
+        }
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_pre_ping': True,
+        'pool_recycle': int(env.get('DB_POOL_RECYCLE', 1800)),
+    }
+
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    # Встроенная lower() в SQLite меняет регистр только у ASCII; ILIKE
+    # SQLAlchemy на SQLite - это lower(x) LIKE lower(y), и кириллице нужна
+    # полная версия
+    dbapi_connection.create_function('lower', 1, _unicode_lower, deterministic=True)
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def configure_storage(app) -> None:
+    """Sets the database URL, pool options and SQLite pragmas from the environment"""
+    global _pragmas_registered
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+
+    if url.startswith('sqlite') and not _pragmas_registered:
+        event.listen(Engine, 'connect', _apply_sqlite_pragmas)
+        _pragmas_registered = True
+    logger.info(f"Storage profile: {url.split('://', 1)[0]}, pool size {app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size']}")
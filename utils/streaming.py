@@ -0,0 +1,394 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StreamLimitError(Exception):
+    """Слишком много открытых потоков или байт в буферах"""
+
+
+class ChunkOrderError(Exception):
+    """Фрагмент пришел не по порядку"""
+
+
+class Segment:
+    """Часть записи, которую можно распознать отдельно (самостоятельный файл)"""
+    __slots__ = ('index', 'buffer', 'closed', 'job')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.buffer = bytearray()
+        self.closed = False
+        # Фоновое распознавание закрытого сегмента (Job) или None
+        self.job: Any = None
+
+
+class AudioStream:
+    """Запись, которая загружается фрагментами во время речи.
+
+    Фрагменты одного сегмента склеиваются в один файл: у WebM из
+    MediaRecorder только первый фрагмент содержит заголовок. Клиент
+    закрывает сегмент (segment_end), когда перезапускает запись после
+    паузы, и такой сегмент распознается сразу, пока пользователь говорит.
+    """
+    __slots__ = ('id', 'session_id', 'filename', 'segments', 'size', 'next_index', 'updated_at', 'lock', 'closed')
+
+    def __init__(self, session_id: str, filename: str, now: float):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.filename = filename
+        self.segments: List[Segment] = [Segment(0)]
+        self.size = 0
+        self.next_index = 0
+        self.updated_at = now
+        self.lock = threading.Lock()
+        # Поток завершен, отменен или удален по ttl; новые фрагменты не принимаются
+        self.closed = False
+
+    @property
+    def current(self) -> Segment:
+        return self.segments[-1]
+
+    @property
+    def closed_segments(self) -> int:
+        return self.current.index
+
+
+class StreamStore:
+    """Open chunked uploads with per-stream, per-session and global byte limits.
+
+    Потоки без новых фрагментов дольше ttl секунд удаляются. Лимит общего
+    объема буферов ограничивает память при множестве одновременных записей.
+    """
+
+    def __init__(self, max_streams: int = 1000, max_per_session: int = 2, max_stream_bytes: int = 16 * 1024 * 1024,
+                 max_total_bytes: int = 256 * 1024 * 1024, ttl: float = 120.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_streams = max_streams
+        self.max_per_session = max_per_session
+        self.max_stream_bytes = max_stream_bytes
+        self.max_total_bytes = max_total_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._streams: 'OrderedDict[str, AudioStream]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.expired = 0
+
+    def start(self, session_id: str, filename: str = 'audio.webm') -> AudioStream:
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            if len(self._streams) >= self.max_streams:
+                raise StreamLimitError('too many open streams')
+            if sum(1 for stream in self._streams.values() if stream.session_id == session_id) >= self.max_per_session:
+                raise StreamLimitError(f'too many open streams for session {session_id}')
+            stream = AudioStream(session_id, filename, now)
+            self._streams[stream.id] = stream
+            return stream
+
+    def get(self, stream_id: str, session_id: str) -> Optional[AudioStream]:
+        """Поток этой сессии или None"""
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.session_id != session_id:
+            return None
+        return stream
+
+    def append(self, stream: AudioStream, index: int, data: bytes, segment_end: bool = False) -> Optional[Segment]:
+        """Добавляет фрагмент; возвращает сегмент, если фрагмент его закрыл.
+
+        Повтор уже принятого фрагмента (клиент повторил запрос) игнорируется.
+        """
+        with stream.lock:
+            if index < stream.next_index:
+                return None
+            if index > stream.next_index:
+                raise ChunkOrderError(f'expected chunk {stream.next_index}, got {index}')
+            if stream.size + len(data) > self.max_stream_bytes:
+                raise StreamLimitError('stream is too large')
+            with self._lock:
+                # Фрагмент, пришедший после finish, DELETE или истечения ttl
+                if stream.closed or self._streams.get(stream.id) is not stream:
+                    raise ChunkOrderError('stream is closed')
+                if self.total_bytes + len(data) > self.max_total_bytes:
+                    raise StreamLimitError('stream buffers are full')
+                self._streams.move_to_end(stream.id)
+                # Размер потока и общий счетчик меняются вместе, чтобы discard вычел точный объем
+                self.total_bytes += len(data)
+                stream.size += len(data)
+            stream.current.buffer += data
+            stream.next_index += 1
+            stream.updated_at = self.clock()
+            if segment_end and stream.current.buffer:
+                return self._close_segment(stream)
+            return None
+
+    @staticmethod
+    def _close_segment(stream: AudioStream) -> Segment:
+        segment = stream.current
+        segment.closed = True
+        stream.segments.append(Segment(segment.index + 1))
+        return segment
+
+    def finish(self, stream: AudioStream) -> List[Segment]:
+        """Закрывает поток и возвращает его непустые сегменты по порядку"""
+        with stream.lock:
+            if stream.current.buffer:
+                self._close_segment(stream)
+            segments = [segment for segment in stream.segments if segment.closed]
+        self.discard(stream)
+        return segments
+
+    def discard(self, stream: AudioStream) -> None:
+        with self._lock:
+            stream.closed = True
+            if self._streams.pop(stream.id, None) is not None:
+                self.total_bytes -= stream.size
+
+    def _expire(self, now: float) -> None:
+        # Самые давно обновленные потоки в начале
+        while self._streams:
+            stream = next(iter(self._streams.values()))
+            if now - stream.updated_at <= self.ttl:
+                break
+            self._streams.popitem(last=False)
+            stream.closed = True
+            self.total_bytes -= stream.size
+            self.expired += 1
+            logger.debug("Expired audio stream %s", stream.id)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'streams': len(self._streams),
+            'buffered_bytes': self.total_bytes,
+            'expired': self.expired,
+        }
+
+
+class SQLiteStreamStore:
+    """Chunked uploads in a SQLite file shared by worker processes.
+
+    Фрагменты одной записи могут попасть на разные воркеры. Сегмент
+    распознает тот воркер, который его закрыл; воркер, получивший /finish,
+    берет текст из общего кэша распознавания, а если сегмент закрыт им
+    самим - дожидается своего задания (оно хранится в памяти процесса).
+    """
+
+    def __init__(self, path: str, max_streams: int = 1000, max_per_session: int = 2,
+                 max_stream_bytes: int = 16 * 1024 * 1024, max_total_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 120.0, max_local_segments: int = 1024):
+        self.path = path
+        self.max_streams = max_streams
+        self.max_per_session = max_per_session
+        self.max_stream_bytes = max_stream_bytes
+        self.max_total_bytes = max_total_bytes
+        self.ttl = ttl
+        self.max_local_segments = max_local_segments
+        self._local = threading.local()
+        # Сегменты, закрытые этим процессом, вместе с заданиями распознавания
+        self._segments: 'OrderedDict[tuple, Segment]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS audio_streams ('
+            'id TEXT PRIMARY KEY, session_id TEXT NOT NULL, filename TEXT NOT NULL, '
+            'next_index INTEGER NOT NULL, segment INTEGER NOT NULL, size INTEGER NOT NULL, '
+            'updated_at REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS audio_chunks ('
+            'stream_id TEXT NOT NULL, chunk INTEGER NOT NULL, segment INTEGER NOT NULL, data BLOB NOT NULL, '
+            'PRIMARY KEY (stream_id, chunk))'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3-соединение нельзя делить между потоками
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    @staticmethod
+    def _snapshot(row) -> AudioStream:
+        stream_id, session_id, filename, next_index, segment, size, updated_at = row
+        stream = AudioStream(session_id, filename, updated_at)
+        stream.id = stream_id
+        stream.next_index = next_index
+        stream.size = size
+        stream.segments = [Segment(segment)]
+        return stream
+
+    def start(self, session_id: str, filename: str = 'audio.webm') -> AudioStream:
+        now = time.time()
+        conn = self._transaction()
+        try:
+            self._expire(conn, now)
+            total, own = conn.execute('SELECT COUNT(*), COALESCE(SUM(session_id = ?), 0) FROM audio_streams',
+                                      (session_id,)).fetchone()
+            if total >= self.max_streams:
+                raise StreamLimitError('too many open streams')
+            if own >= self.max_per_session:
+                raise StreamLimitError(f'too many open streams for session {session_id}')
+            stream = AudioStream(session_id, filename, now)
+            conn.execute('INSERT INTO audio_streams VALUES (?, ?, ?, 0, 0, 0, ?)',
+                         (stream.id, session_id, filename, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return stream
+
+    def get(self, stream_id: str, session_id: str) -> Optional[AudioStream]:
+        """Снимок потока этой сессии или None"""
+        row = self._connection().execute('SELECT * FROM audio_streams WHERE id = ?', (stream_id,)).fetchone()
+        if row is None or row[1] != session_id or time.time() - row[6] > self.ttl:
+            return None
+        return self._snapshot(row)
+
+    def append(self, stream: AudioStream, index: int, data: bytes, segment_end: bool = False) -> Optional[Segment]:
+        """Добавляет фрагмент; возвращает сегмент, если фрагмент его закрыл"""
+        conn = self._transaction()
+        try:
+            row = conn.execute('SELECT * FROM audio_streams WHERE id = ?', (stream.id,)).fetchone()
+            if row is None:
+                raise ChunkOrderError('stream is closed')
+            current = self._snapshot(row)
+            if index < current.next_index:
+                conn.execute('COMMIT')
+                return None
+            if index > current.next_index:
+                raise ChunkOrderError(f'expected chunk {current.next_index}, got {index}')
+            if current.size + len(data) > self.max_stream_bytes:
+                raise StreamLimitError('stream is too large')
+            if conn.execute('SELECT COALESCE(SUM(size), 0) FROM audio_streams').fetchone()[0] + len(data) \
+                    > self.max_total_bytes:
+                raise StreamLimitError('stream buffers are full')
+
+            segment_index = current.current.index
+            conn.execute('INSERT INTO audio_chunks VALUES (?, ?, ?, ?)', (stream.id, index, segment_index, data))
+            closed = None
+            if segment_end:
+                chunks = conn.execute('SELECT data FROM audio_chunks WHERE stream_id = ? AND segment = ? '
+                                      'ORDER BY chunk', (stream.id, segment_index)).fetchall()
+                buffer = b''.join(chunk for chunk, in chunks)
+                if buffer:
+                    closed = Segment(segment_index)
+                    closed.buffer = bytearray(buffer)
+                    closed.closed = True
+                    segment_index += 1
+            conn.execute('UPDATE audio_streams SET next_index = ?, segment = ?, size = size + ?, updated_at = ? '
+                         'WHERE id = ?', (index + 1, segment_index, len(data), time.time(), stream.id))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        stream.next_index = index + 1
+        stream.size = current.size + len(data)
+        stream.segments = [Segment(segment_index)]
+        if closed is not None:
+            self._remember(stream.id, closed)
+        return closed
+
+    def _remember(self, stream_id: str, segment: Segment) -> None:
+        with self._lock:
+            self._segments[(stream_id, segment.index)] = segment
+            while len(self._segments) > self.max_local_segments:
+                self._segments.popitem(last=False)
+
+    def finish(self, stream: AudioStream) -> List[Segment]:
+        """Закрывает поток и возвращает его непустые сегменты по порядку"""
+        conn = self._transaction()
+        try:
+            rows = conn.execute('SELECT segment, data FROM audio_chunks WHERE stream_id = ? ORDER BY chunk',
+                                (stream.id,)).fetchall()
+            conn.execute('DELETE FROM audio_chunks WHERE stream_id = ?', (stream.id,))
+            conn.execute('DELETE FROM audio_streams WHERE id = ?', (stream.id,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        buffers: 'OrderedDict[int, bytearray]' = OrderedDict()
+        for index, data in rows:
+            buffers.setdefault(index, bytearray()).extend(data)
+        segments = []
+        with self._lock:
+            for index, buffer in buffers.items():
+                if not buffer:
+                    continue
+                segment = self._segments.pop((stream.id, index), None)
+                if segment is None:
+                    segment = Segment(index)
+                    segment.buffer = buffer
+                    segment.closed = True
+                segments.append(segment)
+        return segments
+
+    def discard(self, stream: AudioStream) -> None:
+        conn = self._transaction()
+        try:
+            conn.execute('DELETE FROM audio_chunks WHERE stream_id = ?', (stream.id,))
+            conn.execute('DELETE FROM audio_streams WHERE id = ?', (stream.id,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> None:
+        stale = [row[0] for row in conn.execute('SELECT id FROM audio_streams WHERE updated_at < ?',
+                                                 (now - self.ttl,))]
+        for stream_id in stale:
+            conn.execute('DELETE FROM audio_chunks WHERE stream_id = ?', (stream_id,))
+            conn.execute('DELETE FROM audio_streams WHERE id = ?', (stream_id,))
+        self.expired += len(stale)
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM audio_streams').fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        streams, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM audio_streams').fetchone()
+        return {
+            'streams': streams,
+            'buffered_bytes': size,
+            'expired': self.expired,
+        }
+
+
+def create_stream_store(config: Mapping):
+    """Буферы потоковой загрузки по STREAM_STORE: memory (процесс) или sqlite (общие для воркеров)"""
+    backend = config.get('STREAM_STORE', 'memory')
+    limits = dict(
+        max_streams=config.get('STREAM_MAX_COUNT', 1000),
+        max_per_session=config.get('STREAM_MAX_PER_SESSION', 2),
+        max_stream_bytes=config.get('STREAM_MAX_BYTES', 16 * 1024 * 1024),
+        max_total_bytes=config.get('STREAM_MAX_TOTAL_BYTES', 256 * 1024 * 1024),
+        ttl=config.get('STREAM_TTL', 120),
+    )
+    if backend == 'memory':
+        return StreamStore(**limits)
+    if backend == 'sqlite':
+        return SQLiteStreamStore(config.get('STREAM_STORE_PATH', 'instance/streams.db'), **limits)
+    raise ValueError(f'Unknown STREAM_STORE: {backend}')
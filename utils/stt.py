@@ -0,0 +1,464 @@
+import io
+import json
+import logging
+import random
+import threading
+import time
+import wave
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Mapping, Optional
+
+from utils.audio import AudioUpload
+from utils.metrics import STT_ATTEMPTS, STT_EVENTS
+from utils.resilience import CircuitBreaker, LatencyWindow
+from utils.transcription_cache import hash_stream
+
+logger = logging.getLogger(__name__)
+
+# Оценка длительности сжатого аудио (WebM/Opus около 32 кбит/с) для срока распознавания
+COMPRESSED_BYTES_PER_SECOND = 4000
+# Дублирующий запрос отправляется, если ответа нет дольше этого квантиля задержек
+HEDGE_QUANTILE = 0.95
+# Попытка без ответа дольше ATTEMPT_TIMEOUT_FACTOR * p95 считается зависшей и повторяется
+ATTEMPT_TIMEOUT_FACTOR = 2.0
+# HTTP-статусы, после которых повтор может помочь
+RETRYABLE_STATUSES = frozenset((408, 409, 429))
+
+
+class STTUnavailableError(Exception):
+    """Распознавание недоступно: предохранитель разомкнут или попытки исчерпаны"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class STTTimeoutError(STTUnavailableError):
+    """Распознавание не уложилось в срок, рассчитанный по длительности аудио"""
+
+
+class FallbackTranscript(str):
+    """Текст от резервного движка: в кэш распознавания не записывается"""
+
+
+class STTBackend:
+    """Base class for speech-to-text engines"""
+    name = 'base'
+
+    def __init__(self, model: str = '', language: str = 'ru'):
+        self.model = model
+        self.language = language
+
+    @property
+    def cache_namespace(self) -> str:
+        """Часть ключа кэша: результаты разных движков не смешиваются"""
+        return f'{self.name}:{self.model}'
+
+    def transcribe(self, upload: AudioUpload, timeout: Optional[float] = None) -> str:
+        """Returns the recognized text of the uploaded audio.
+
+        timeout - срок ответа в секундах; локальные движки его не учитывают.
+        """
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """Загружает клиент или модель заранее, чтобы первый запрос не ждал импорта"""
+
+    def can_decode(self, data: bytes) -> bool:
+        """Может ли движок распознать запись в таком формате"""
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class WhisperAPIBackend(STTBackend):
+    """OpenAI Whisper API; the client is created on first use"""
+    name = 'whisper'
+
+    def __init__(self, api_key: Optional[str] = None, model: str = 'whisper-1', language: str = 'ru',
+                 base_url: Optional[str] = None, timeout: float = 60.0, max_retries: int = 2):
+        super().__init__(model, language)
+        self.api_key = api_key
+        self.base_url = base_url
+        # Без явного срока клиент ждет ответа до 10 минут
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=self.max_retries)
+        return self._client
+
+    def warm_up(self) -> None:
+        # Импорт openai и создание клиента без обращения к сети
+        self.client
+
+    def transcribe(self, upload: AudioUpload, timeout: Optional[float] = None) -> str:
+        logger.info("Sending audio to Whisper API")
+        transcript = self.client.audio.transcriptions.create(
+            file=upload.as_file(),
+            model=self.model,
+            language=self.language,
+            timeout=timeout if timeout is not None else self.timeout
+        )
+        return transcript.text
+
+
+class LocalSpeechRecognitionBackend(STTBackend):
+    """Offline recognition through the speechrecognition package.
+
+    Движок выбирается по имени метода Recognizer.recognize_<engine>
+    (sphinx, vosk, whisper). AudioFile читает только WAV/AIFF/FLAC.
+    """
+    name = 'local'
+
+    def __init__(self, engine: str = 'sphinx', language: str = 'ru-RU'):
+        super().__init__(engine, language)
+        self.engine = engine
+
+    def warm_up(self) -> None:
+        import speech_recognition
+
+    def can_decode(self, data: bytes) -> bool:
+        # AudioFile читает WAV, AIFF и FLAC; WebM/Opus из браузера ему недоступен
+        return data[:4] == b'fLaC' or (data[:4] == b'RIFF' and data[8:12] == b'WAVE') or (
+            data[:4] == b'FORM' and data[8:12] in (b'AIFF', b'AIFC'))
+
+    def transcribe(self, upload: AudioUpload, timeout: Optional[float] = None) -> str:
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        _, stream = upload.as_file()
+        with sr.AudioFile(stream) as source:
+            audio = recognizer.record(source)
+
+        recognize = getattr(recognizer, f'recognize_{self.engine}')
+        try:
+            if self.engine == 'vosk':
+                # vosk берет язык из загруженной модели
+                result = recognize(audio)
+                return json.loads(result).get('text', '')
+            return recognize(audio, language=self.language)
+        except sr.UnknownValueError:
+            logger.info("Local recognizer could not understand audio")
+            return ''
+
+
+class StubBackend(STTBackend):
+    """Deterministic backend for load tests and offline development.
+
+    Текст ищется в фикстурах по SHA-256 аудио, затем по имени файла;
+    если совпадений нет, содержимое, декодируемое как UTF-8, считается
+    уже готовым текстом. Задержка latency имитирует время ответа сервиса.
+    """
+    name = 'stub'
+
+    def __init__(self, fixtures: Optional[Dict[str, str]] = None, fixtures_path: Optional[str] = None,
+                 default_text: str = '', latency: float = 0.0, language: str = 'ru'):
+        super().__init__('fixtures', language)
+        self.fixtures = dict(fixtures or {})
+        if fixtures_path:
+            with open(fixtures_path, encoding='utf-8') as fh:
+                self.fixtures.update(json.load(fh))
+        self.default_text = default_text
+        self.latency = latency
+
+    def transcribe(self, upload: AudioUpload, timeout: Optional[float] = None) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+
+        digest = hash_stream(upload.stream)
+        if digest in self.fixtures:
+            return self.fixtures[digest]
+        if upload.filename in self.fixtures:
+            return self.fixtures[upload.filename]
+
+        _, stream = upload.as_file()
+        try:
+            return stream.read().decode('utf-8')
+        except UnicodeDecodeError:
+            return self.default_text
+
+
+def audio_seconds(data: bytes) -> float:
+    """Длительность аудио: по заголовку для WAV, по размеру для сжатых форматов"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+        try:
+            with wave.open(io.BytesIO(data), 'rb') as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            pass
+    return len(data) / COMPRESSED_BYTES_PER_SECOND
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Тайм-ауты, сетевые ошибки, 408/409/429 и 5xx; ошибки запроса (4xx) не повторяются"""
+    status = getattr(error, 'status_code', None)
+    return status is None or status in RETRYABLE_STATUSES or status >= 500
+
+
+class ResilientBackend(STTBackend):
+    """Внешний движок с ограниченным временем ответа.
+
+    * Срок вызова растет с длительностью аудио: timeout_base +
+      timeout_per_second * секунды, но не больше timeout_max.
+    * Попытка, которая не ответила за ATTEMPT_TIMEOUT_FACTOR * p95
+      недавних задержек, считается зависшей, поэтому повтор умещается в срок.
+    * Временные ошибки и зависшие попытки повторяются до retries раз с
+      паузой со случайной составляющей (full jitter), пока позволяет срок.
+    * С hedge=True, если ответа нет дольше p95 недавних задержек,
+      параллельно отправляется вторая попытка; побеждает первый ответ.
+    * Предохранитель (CircuitBreaker) при частых ошибках перестает
+      обращаться к сервису, и запросы сразу уходят в резервный движок
+      (fallback), если он понимает формат записи, или завершаются
+      STTUnavailableError.
+
+    Попытки выполняются в собственном пуле потоков: поток запроса ждет не
+    дольше срока, даже если движок не поддерживает тайм-аут.
+    """
+
+    def __init__(self, primary: STTBackend, fallback: Optional[STTBackend] = None,
+                 timeout_base: float = 5.0, timeout_per_second: float = 1.0, timeout_max: float = 60.0,
+                 retries: int = 2, backoff: float = 0.2, hedge: bool = False, hedge_min_delay: float = 0.1,
+                 min_attempt_timeout: float = 0.5, breaker: Optional[CircuitBreaker] = None, max_workers: int = 32):
+        super().__init__(primary.model, primary.language)
+        self.name = primary.name
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout_base = timeout_base
+        self.timeout_per_second = timeout_per_second
+        self.timeout_max = timeout_max
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.min_attempt_timeout = min_attempt_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stt')
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.primary.cache_namespace
+
+    def warm_up(self) -> None:
+        self.primary.warm_up()
+        if self.fallback is not None:
+            try:
+                self.fallback.warm_up()
+            except Exception as e:
+                logger.warning(f"Fallback STT backend {self.fallback.name} is not available: {str(e)}")
+
+    def deadline_for(self, seconds: float) -> float:
+        return min(self.timeout_max, self.timeout_base + self.timeout_per_second * seconds)
+
+    def _quantile_share(self) -> Optional[float]:
+        # Задержки хранятся долями срока вызова, поэтому p95 годится для записей любой длины
+        return self.latencies.quantile(HEDGE_QUANTILE)
+
+    def attempt_timeout(self, budget: float, remaining: float, last: bool) -> float:
+        """Срок одной попытки: ATTEMPT_TIMEOUT_FACTOR * p95, чтобы после зависшей попытки уместился повтор.
+
+        Пока замеров мало, попытке отдается половина срока; последней - весь остаток.
+        """
+        if last:
+            return remaining
+        share = self._quantile_share()
+        if share is None:
+            return remaining / 2
+        return min(remaining, max(self.min_attempt_timeout, ATTEMPT_TIMEOUT_FACTOR * share * budget))
+
+    def hedge_delay(self, budget: float) -> Optional[float]:
+        """Задержка дублирующей попытки; None, пока замеров недостаточно"""
+        if not self.hedge:
+            return None
+        share = self._quantile_share()
+        return None if share is None else max(self.hedge_min_delay, share * budget)
+
+    def _attempt(self, data: bytes, filename: str, budget: float, timeout: float) -> str:
+        started = time.monotonic()
+        try:
+            text = self.primary.transcribe(AudioUpload.from_bytes(data, filename), timeout=max(0.001, timeout))
+        except Exception as e:
+            retryable = is_retryable(e)
+            STT_ATTEMPTS.inc('error' if retryable else 'rejected')
+            # Ошибка запроса (например, неподдерживаемый формат) не говорит о сбое сервиса
+            self.breaker.record(not retryable)
+            raise
+        self.latencies.add((time.monotonic() - started) / budget)
+        STT_ATTEMPTS.inc('success')
+        self.breaker.record(True)
+        return text
+
+    def transcribe(self, upload: AudioUpload, timeout: Optional[float] = None) -> str:
+        _, stream = upload.as_file()
+        data = stream.read()
+        if not self.breaker.allow():
+            STT_EVENTS.inc('short_circuit')
+            return self._fallback(data, upload.filename, STTUnavailableError(
+                'Speech-to-text circuit is open', self.breaker.retry_after))
+
+        budget = self.deadline_for(audio_seconds(data))
+        if timeout is not None:
+            budget = min(budget, timeout)
+        started = time.monotonic()
+        deadline = started + budget
+        # Попытка -> момент, после которого она считается зависшей
+        pending: Dict[Future, float] = {}
+        attempts = 0
+        timed_out = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            nonlocal attempts
+            attempts += 1
+            now = time.monotonic()
+            limit = self.attempt_timeout(budget, deadline - now, last=attempts > self.retries)
+            pending[self._pool.submit(self._attempt, data, upload.filename, budget, limit)] = now + limit
+
+        launch()
+        delay = self.hedge_delay(budget)
+        hedge_at = started + delay if delay is not None else None
+        retry_at = None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake = min(t for t in (deadline, hedge_at, retry_at, *pending.values()) if t is not None)
+            if pending:
+                done, _ = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(wake - now)
+                done = set()
+            for future in done:
+                del pending[future]
+                try:
+                    text = future.result()
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    last_error = e
+                    continue
+                if attempts > 1:
+                    STT_EVENTS.inc('recovered')
+                return text
+
+            now = time.monotonic()
+            for future, limit in list(pending.items()):
+                if now >= limit:
+                    # Зависшая попытка дорабатывает в пуле, но ответ на нее больше не ждем
+                    del pending[future]
+                    timed_out = True
+                    STT_EVENTS.inc('attempt_timeout')
+            can_launch = attempts <= self.retries
+            if not pending and retry_at is None:
+                # Все отправленные попытки завершились ошибкой или зависли
+                if not can_launch:
+                    break
+                retry_at = now + random.uniform(0, self.backoff * 2 ** (attempts - 1))
+                if retry_at >= deadline:
+                    break
+            if retry_at is not None and now >= retry_at:
+                retry_at = None
+                if not self.breaker.allow():
+                    break
+                STT_EVENTS.inc('retry')
+                launch()
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if pending and can_launch and self.breaker.allow():
+                    STT_EVENTS.inc('hedge')
+                    launch()
+
+        if last_error is None or pending or timed_out:
+            STT_EVENTS.inc('deadline')
+            error: STTUnavailableError = STTTimeoutError(
+                f'Speech-to-text did not answer in {budget:.1f}s ({attempts} attempts)')
+        else:
+            error = STTUnavailableError(f'Speech-to-text failed after {attempts} attempts: {last_error}',
+                                        self.breaker.retry_after)
+        if last_error is not None:
+            error.__cause__ = last_error
+        return self._fallback(data, upload.filename, error)
+
+    def _fallback(self, data: bytes, filename: str, error: STTUnavailableError) -> str:
+        if self.fallback is None:
+            raise error
+        if not self.fallback.can_decode(data):
+            # Например, WebM из MediaRecorder для локального движка
+            logger.warning("Fallback STT backend %s cannot decode %s", self.fallback.name, filename)
+            raise error
+        STT_EVENTS.inc('fallback')
+        logger.warning("Using fallback STT backend %s: %s", self.fallback.name, error)
+        try:
+            return FallbackTranscript(self.fallback.transcribe(AudioUpload.from_bytes(data, filename)))
+        except Exception as e:
+            logger.warning(f"Fallback STT backend {self.fallback.name} failed: {str(e)}")
+            raise error from e
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.breaker.stats()
+        share = self._quantile_share()
+        stats['p95_deadline_pct'] = int(share * 100) if share is not None else 0
+        return stats
+
+
+def _create_engine(backend: str, config: Mapping) -> STTBackend:
+    if backend == 'whisper':
+        return WhisperAPIBackend(
+            api_key=config.get('OPENAI_API_KEY'),
+            model=config.get('WHISPER_MODEL', 'whisper-1'),
+            language=config.get('WHISPER_LANGUAGE', 'ru'),
+            base_url=config.get('OPENAI_BASE_URL'),
+            timeout=float(config.get('STT_TIMEOUT_MAX', 60)),
+            # Повторами управляет ResilientBackend, встроенные повторы клиента их бы умножали
+            max_retries=0 if config.get('STT_RESILIENCE', True) else 2
+        )
+    if backend == 'local':
+        return LocalSpeechRecognitionBackend(
+            engine=config.get('STT_LOCAL_ENGINE', 'sphinx'),
+            language=config.get('STT_LOCAL_LANGUAGE', 'ru-RU')
+        )
+    if backend == 'stub':
+        return StubBackend(
+            fixtures_path=config.get('STT_STUB_FIXTURES'),
+            default_text=config.get('STT_STUB_DEFAULT_TEXT', ''),
+            latency=float(config.get('STT_STUB_LATENCY', 0))
+        )
+    raise ValueError(f"Unknown STT backend: {backend}")
+
+
+def create_stt_backend(config: Mapping) -> STTBackend:
+    """Создает движок распознавания по STT_BACKEND: whisper, local или stub.
+
+    Внешний сервис (whisper) при STT_RESILIENCE оборачивается в
+    ResilientBackend с резервным движком STT_FALLBACK (none, local или stub).
+    """
+    backend = config.get('STT_BACKEND', 'whisper')
+    engine = _create_engine(backend, config)
+    if backend != 'whisper' or not config.get('STT_RESILIENCE', True):
+        return engine
+    fallback_name = config.get('STT_FALLBACK', 'none')
+    return ResilientBackend(
+        engine,
+        fallback=_create_engine(fallback_name, config) if fallback_name != 'none' else None,
+        timeout_base=float(config.get('STT_TIMEOUT_BASE', 5)),
+        timeout_per_second=float(config.get('STT_TIMEOUT_PER_SECOND', 1)),
+        timeout_max=float(config.get('STT_TIMEOUT_MAX', 60)),
+        retries=int(config.get('STT_RETRIES', 2)),
+        backoff=float(config.get('STT_RETRY_BACKOFF', 0.2)),
+        hedge=bool(config.get('STT_HEDGE', False)),
+        breaker=CircuitBreaker(
+            window=int(config.get('STT_BREAKER_WINDOW', 20)),
+            failure_ratio=float(config.get('STT_BREAKER_FAILURE_RATIO', 0.5)),
+            cooldown=float(config.get('STT_BREAKER_COOLDOWN', 30))
+        )
+    )
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_stream(stream: BinaryIO) -> str:
+    """SHA-256 of the stream contents, read in chunks; the stream is rewound afterwards"""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Content-addressed cache of transcriptions.
+
+    Первый уровень - LRU в памяти процесса, второй (необязательный) - SQLite,
+    который переживает перезапуски и общий для процессов одной машины.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400.0, path: Optional[str] = None,
+                 max_persistent_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_persistent_entries = max_persistent_entries
+        self._memory: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connection() as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS transcriptions ('
+                    'key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_transcriptions_created_at '
+                             'ON transcriptions (created_at)')
+
+    @staticmethod
+    def make_key(stream: BinaryIO, model: str, language: str) -> str:
+        """Ключ кэша: хэш аудио плюс модель и язык распознавания"""
+        return f'{model}:{language}:{hash_stream(stream)}'
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3-соединение нельзя делить между потоками
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                text, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return text
+                del self._memory[key]
+
+        if self.path:
+            try:
+                row = self._connection().execute(
+                    'SELECT text, created_at FROM transcriptions WHERE key = ? AND created_at >= ?',
+                    (key, now - self.ttl)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Transcription cache read failed: {str(e)}")
+                row = None
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        now = time.time()
+        self._remember(key, text, now)
+        if not self.path:
+            return
+        try:
+            with self._connection() as conn:
+                conn.execute('INSERT OR REPLACE INTO transcriptions (key, text, created_at) VALUES (?, ?, ?)',
+                             (key, text, now))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 100 == 0
+            if prune:
+                self._prune(now)
+        except sqlite3.Error as e:
+            logger.error(f"Transcription cache write failed: {str(e)}")
+
+    def _remember(self, key: str, text: str, created_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (text, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _prune(self, now: float) -> None:
+        """Удаляет просроченные записи и самые старые сверх лимита"""
+        with self._connection() as conn:
+            conn.execute('DELETE FROM transcriptions WHERE created_at < ?', (now - self.ttl,))
+            conn.execute(
+                'DELETE FROM transcriptions WHERE key IN ('
+                'SELECT key FROM transcriptions ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_persistent_entries,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'entries': len(self._memory),
+            }
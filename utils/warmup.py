@@ -0,0 +1,90 @@
+import logging
+import time
+from typing import Callable, Dict, List
+
+from utils.command_processor import process_command
+from utils.metrics import registry
+from utils.nlp import COMMAND_PATTERNS, DialogContext
+
+logger = logging.getLogger(__name__)
+
+# Фразы, которые проходят все ветви разбора: даты и время задачи,
+# поиск (стеммер и FTS-запрос), исправление ошибок и слово активации
+WARM_UP_UTTERANCES = (
+    'терра привет',
+    'создать задачу срочно подготовить отчет завтра в 10:30',
+    'поставить задачу позвонить клиенту 15 марта в 14 часов',
+    'тера запланироват встречу через 3 дня',
+    'найди задачу отчет по продажам',
+    'найди клиента ромашка',
+    'статус проекта разработка сайта',
+    'покажи расходы за месяц',
+)
+
+
+def _utterances() -> List[str]:
+    # Первая фраза каждого типа команды, чтобы не пропустить новые типы
+    return list(WARM_UP_UTTERANCES) + [phrases[0] for phrases in COMMAND_PATTERNS.values() if phrases]
+
+
+def _warm_nlp(app) -> None:
+    context = DialogContext()
+    for text in _utterances():
+        command_type, entities = context.analyze_text(text, verbose=False)
+        process_command(command_type, entities)
+
+
+def _warm_classifier(app) -> None:
+    classifier = DialogContext.classifier
+    if classifier is not None:
+        # Страницы весов, отображенных через mmap, читаются с диска здесь
+        classifier.predict(WARM_UP_UTTERANCES[1])
+        classifier.predict_batch(list(WARM_UP_UTTERANCES))
+
+
+def _warm_database(app) -> None:
+    from models import db
+
+    engine = db.get_engine(app)
+    # Соединения пула открываются заранее (для SQLite - вместе с PRAGMA)
+    size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+    connections = [engine.connect() for _ in range(max(1, min(size, app.config.get('JOB_WORKERS', 4))))]
+    for conn in connections:
+        conn.exec_driver_sql('SELECT 1')
+        conn.close()
+
+
+def _warm_http(app) -> None:
+    # Шаблон главной страницы и обработка запроса Flask без записи в базу
+    app.jinja_env.get_template('index.html')
+    client = app.test_client()
+    client.get('/status')
+
+
+WARM_UP_STEPS: Dict[str, Callable] = {
+    'database': _warm_database,
+    'nlp': _warm_nlp,
+    'classifier': _warm_classifier,
+    'stt': lambda app: app.stt.warm_up(),
+    'http': _warm_http,
+}
+
+
+def warm_up(app) -> Dict[str, float]:
+    """Прогревает приложение до приема запросов; возвращает время шагов в мс.
+
+    Ошибка шага не мешает запуску: она записывается в лог, а шаг
+    досчитается при первом запросе. Синтетические команды и запросы
+    прогрева не попадают в /metrics.
+    """
+    timings: Dict[str, float] = {}
+    with app.app_context(), registry.paused():
+        for name, step in WARM_UP_STEPS.items():
+            started = time.perf_counter()
+            try:
+                step(app)
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info("Warm-up finished in %.1f ms: %s", sum(timings.values()), timings)
+    return timings
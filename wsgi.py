@@ -0,0 +1,16 @@
+"""WSGI entry point for production servers.
+
+gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+from dotenv import load_dotenv
+from utils.logs import configure_logging
+
+load_dotenv()
+configure_logging(os.environ)
+
+from app import create_app  # noqa: E402 - после настройки логирования
+
+# Каждый воркер создает свое приложение: потоки очередей и пулы
+# соединений не переживают fork, поэтому preload_app не используется
+app = create_app()